@@ -1,56 +1,332 @@
+import time
+
+# Taken before the remaining imports so the startup report includes them
+STARTUP_BEGAN = time.perf_counter()
+
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import sqlite3
+import argparse
+import importlib.util
 import json
-import csv
-from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import numpy as np
-from typing import List, Dict, Tuple
+import math
+import os
+import sys
+import queue
+import threading
+import functools
+from datetime import datetime
+
+from finance_tracker.db import (DATABASE_FILE, CATEGORIES, TRANSACTION_TYPES, BUDGET_PERIODS,
+                                BUDGET_ANCHOR_LIMITS, ConnectionManager)
+from finance_tracker.transactions import (TransactionPager, add_transaction_row,
+                                          update_transaction_row, delete_transaction_row,
+                                          fetch_tag_names)
+from finance_tracker.rollups import (rebuild_rollups, fetch_dashboard_stats,
+                                     fetch_recent_transactions, patch_dashboard_stats)
+from finance_tracker.budgets import BudgetEngine
+from finance_tracker.balances import BalanceIndex, format_balance
+from finance_tracker import perf
+
+# numpy, matplotlib and the import/export modules are loaded on first use
+
+
+class QueryWorker:
+    """Runs read queries on a background thread with its own connection"""
+    
+    def __init__(self, connections, root, poll_ms=16, name='Query worker'):
+        self.connections = connections
+        self.root = root
+        self.poll_ms = poll_ms
+        self.jobs = queue.Queue()
+        self.results = queue.Queue()
+        
+        # Latest generation submitted per job key; anything older is stale
+        self.lock = threading.Lock()
+        self.generations = {}
+        self.running = None
+        self.conn = None
+        
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.thread.start()
+        self.poll_job = self.root.after(self.poll_ms, self._poll)
+    
+    def submit(self, key, func, callback, *args, on_error=None):
+        """Run func(cursor, *args) in the background and pass its result to
+        callback on the Tk thread. Submitting again under the same key
+        cancels the earlier job, interrupting it if it is already running.
+        With recording on, the query, the callback and the whole round
+        trip are timed as '<key>: query', '<key>: show' and '<key>: total'."""
+        with self.lock:
+            generation = self.generations.get(key, 0) + 1
+            self.generations[key] = generation
+            if self.running is not None and self.running[0] == key:
+                self.conn.interrupt()
+        
+        self.jobs.put((key, generation, func, args, callback, on_error, time.perf_counter()))
+    
+    def cancel(self, key):
+        """Drop any pending or running job submitted under key"""
+        with self.lock:
+            self.generations[key] = self.generations.get(key, 0) + 1
+            if self.running is not None and self.running[0] == key:
+                self.conn.interrupt()
+    
+    def _is_current(self, key, generation):
+        """Check whether a job is still the latest one for its key"""
+        with self.lock:
+            return self.generations.get(key) == generation
+    
+    def _run(self):
+        """Worker loop: execute queued jobs on the worker connection"""
+        self.conn = self.connections.reader()
+        
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            
+            key, generation, func, args, callback, on_error, submitted = job
+            with self.lock:
+                if self.generations.get(key) != generation:
+                    continue
+                self.running = (key, generation)
+            
+            result = error = None
+            try:
+                with perf.span(f'{key}: query') as timing:
+                    result = func(self.conn.cursor(), *args)
+                    if isinstance(result, list):
+                        timing.rows = len(result)
+            except Exception as e:
+                error = e
+            finally:
+                with self.lock:
+                    self.running = None
+            
+            if self._is_current(key, generation):
+                self.results.put((key, generation, callback, on_error, result, error, submitted))
+        
+        self.connections.close_reader()
+    
+    def _poll(self):
+        """Deliver finished results to their callbacks on the Tk thread"""
+        while True:
+            try:
+                key, generation, callback, on_error, result, error, submitted = self.results.get_nowait()
+            except queue.Empty:
+                break
+            
+            # A newer job may have been submitted after this one finished
+            if not self._is_current(key, generation):
+                continue
+            
+            # A failing callback must not stop results reaching the others
+            try:
+                if error is None:
+                    with perf.span(f'{key}: show') as timing:
+                        callback(result)
+                        if isinstance(result, list):
+                            timing.rows = len(result)
+                    if perf.recorder is not None:
+                        # A track of its own in traces, as round trips overlap other work
+                        perf.recorder.record(f'{key}: total', submitted,
+                                             time.perf_counter() - submitted,
+                                             thread=f'{key} requests')
+                elif on_error is not None:
+                    on_error(error)
+                else:
+                    messagebox.showerror("Error", f"Failed to run {key} query: {str(error)}")
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to show {key} results: {str(e)}")
+        
+        self.poll_job = self.root.after(self.poll_ms, self._poll)
+    
+    def close(self):
+        """Stop the worker thread and close its connection"""
+        self.root.after_cancel(self.poll_job)
+        self.jobs.put(None)
+        self.thread.join()
+
+
+class BackgroundTask:
+    """Runs a long job on its own thread, relaying progress and the outcome
+    to callbacks on the Tk thread. The job receives a progress callable as
+    its progress keyword argument."""
+    
+    def __init__(self, root, func, *args, on_progress=None, on_done=None,
+                 on_error=None, poll_ms=50):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.on_error = on_error
+        self.messages = queue.Queue()
+        
+        self.thread = threading.Thread(target=self._run, args=(func, args), daemon=True)
+        self.thread.start()
+        self.root.after(self.poll_ms, self._poll)
+    
+    def _run(self, func, args):
+        """Thread body: run the job and queue its outcome"""
+        try:
+            with perf.span(getattr(func, '__name__', 'background task')):
+                result = func(*args, progress=lambda *info: self.messages.put(('progress', info)))
+            self.messages.put(('done', result))
+        except Exception as e:
+            self.messages.put(('error', e))
+    
+    def _poll(self):
+        """Relay queued messages; only the latest progress update is shown"""
+        progress = None
+        while True:
+            try:
+                kind, payload = self.messages.get_nowait()
+            except queue.Empty:
+                break
+            
+            if kind == 'progress':
+                progress = payload
+                continue
+            if kind == 'done' and self.on_done is not None:
+                self.on_done(payload)
+            elif kind == 'error' and self.on_error is not None:
+                self.on_error(payload)
+            return
+        
+        if progress is not None and self.on_progress is not None:
+            self.on_progress(*progress)
+        self.root.after(self.poll_ms, self._poll)
+
+
+class ChartView:
+    """Shows rendered charts as PhotoImages on the Tk thread.
+    
+    Images are kept per chart type against the data version and size
+    they were drawn for, so showing an unchanged chart again needs no
+    rendering. While a chart renders, its last image (if any) stays up
+    under a placeholder message.
+    """
+    
+    # Used before the frame has been laid out
+    DEFAULT_SIZE = (1000, 600)
+    
+    def __init__(self, parent):
+        self.image_label = tk.Label(parent, bg='#34495e')
+        self.image_label.pack(fill='both', expand=True)
+        self.status_label = tk.Label(parent, text="", bg='#34495e', fg='white')
+        # Chart type -> (data version, size, PhotoImage)
+        self.images = {}
+    
+    def size(self):
+        """Pixel size a chart should be rendered at to fill the view"""
+        width = self.image_label.winfo_width()
+        height = self.image_label.winfo_height()
+        if width < 50 or height < 50:
+            return self.DEFAULT_SIZE
+        return (width, height)
+    
+    def is_current(self, chart_type, version, size):
+        """Check whether chart_type has an image for version at size"""
+        cached = self.images.get(chart_type)
+        return cached is not None and cached[:2] == (version, size)
+    
+    def show_cached(self, chart_type):
+        """Show a chart's last image; the caller checked is_current"""
+        self.status_label.place_forget()
+        self.image_label.config(image=self.images[chart_type][2], text='')
+    
+    def show_placeholder(self, chart_type):
+        """Keep the chart's last image, if any, up while it renders"""
+        cached = self.images.get(chart_type)
+        if cached is not None:
+            self.image_label.config(image=cached[2], text='')
+        else:
+            self.image_label.config(image='', text='')
+        self.status_label.config(text=f"Rendering {chart_type}...")
+        self.status_label.place(relx=0.5, rely=0.5, anchor='center')
+    
+    def show_image(self, chart_type, version, size, ppm):
+        """Show and keep a finished rendering"""
+        image = tk.PhotoImage(data=ppm, format='PPM')
+        self.images[chart_type] = (version, size, image)
+        self.show_cached(chart_type)
+    
+    def show_error(self, message):
+        """Replace the placeholder with an error message"""
+        self.status_label.config(text=message)
+
+
+class StartupTimer:
+    """Milliseconds from STARTUP_BEGAN to each startup milestone, reported
+    once every expected milestone has been reached"""
+    
+    def __init__(self, expected, on_complete):
+        self.expected = set(expected)
+        self.on_complete = on_complete
+        self.marks = {}
+    
+    def mark(self, milestone):
+        """Record a milestone the first time it is reached"""
+        if milestone in self.marks:
+            return
+        self.marks[milestone] = round((time.perf_counter() - STARTUP_BEGAN) * 1000, 1)
+        if self.expected <= self.marks.keys():
+            self.expected = set()
+            self.on_complete(dict(self.marks))
+
+
 class FinanceTracker:
-    def __init__(self):
+    # Delay after the last keystroke before the search query runs
+    SEARCH_DEBOUNCE_MS = 250
+    
+    # Rows kept in the transactions treeview at most, and how close (in rows)
+    # the visible area may get to either end before the next page is loaded
+    TRANS_WINDOW_ROWS = 600
+    TRANS_PREFETCH_ROWS = 50
+    
+    # Delay after the chart area stops resizing before it is re-rendered
+    CHART_RESIZE_DEBOUNCE_MS = 200
+    
+    # How often the performance tab updates while it is shown
+    PERF_REFRESH_MS = 1000
+    
+    def __init__(self, startup_report=None, quit_after_startup=False):
+        self.startup_report = startup_report
+        self.quit_after_startup = quit_after_startup
+        self.startup = StartupTimer(['first_paint', 'dashboard_data'], self.finish_startup)
+        self.startup.mark('imports')
+        
         self.root = tk.Tk()
         self.root.title("Personal Finance Tracker Pro")
         self.root.geometry("1200x800")
         self.root.configure(bg='#2c3e50')
+        self.root.bind('<Map>', self.on_first_map)
         
         # Initialize database
         self.init_database()
+        self.startup.mark('database')
         
-        # Create GUI
+        # Create GUI; only the dashboard tab is built now and its data
+        # arrives from the query worker after the window is up
         self.create_widgets()
-        self.load_data()
+        self.startup.mark('widgets')
         
     def init_database(self):
         """Initialize SQLite database"""
-        self.conn = sqlite3.connect('finance_tracker.db')
+        # Opening the manager creates or upgrades tables and indexes
+        self.connections = ConnectionManager(DATABASE_FILE)
+        self.conn = self.connections.writer
         self.cursor = self.conn.cursor()
         
-        # Create transactions table
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS transactions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                date TEXT NOT NULL,
-                category TEXT NOT NULL,
-                description TEXT,
-                amount REAL NOT NULL,
-                type TEXT NOT NULL,
-                tags TEXT
-            )
-        ''')
-        
-        # Create budgets table
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS budgets (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                category TEXT NOT NULL UNIQUE,
-                amount REAL NOT NULL,
-                period TEXT NOT NULL
-            )
-        ''')
-        
-        self.conn.commit()
+        # Reads run off the Tk thread; writes stay on self.conn
+        self.worker = QueryWorker(self.connections, self.root)
+        # Created with the Analytics tab
+        self.chart_worker = None
+        self.columns = None
+        self.trans_pager = TransactionPager()
+        self.budget_engine = BudgetEngine()
+        self.balance_index = BalanceIndex()
     
     def create_widgets(self):
         """Create main GUI widgets"""
@@ -64,17 +340,53 @@ class FinanceTracker:
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(fill='both', expand=True, padx=10, pady=10)
         
-        # Create tabs
-        self.create_dashboard_tab()
-        self.create_transactions_tab()
-        self.create_budget_tab()
-        self.create_analytics_tab()
-        self.create_export_tab()
+        # Tabs get an empty frame now and their widgets when first selected
+        self.tab_builders = {}
+        for text, builder in (('Dashboard', self.create_dashboard_tab),
+                              ('Transactions', self.create_transactions_tab),
+                              ('Budget', self.create_budget_tab),
+                              ('Analytics', self.create_analytics_tab),
+                              ('Export/Import', self.create_export_tab),
+                              ('Performance', self.create_performance_tab)):
+            # Only shown when started with --perf
+            if text == 'Performance' and perf.recorder is None:
+                continue
+            frame = tk.Frame(self.notebook, bg='#34495e')
+            self.notebook.add(frame, text=text)
+            self.tab_builders[str(frame)] = (builder, frame)
+        
+        self.notebook.bind('<<NotebookTabChanged>>', self.on_tab_changed)
+        self.on_tab_changed()
+    
+    def on_tab_changed(self, event=None):
+        """Build the selected tab the first time it is shown"""
+        builder, frame = self.tab_builders.pop(self.notebook.select(), (None, None))
+        if builder is not None:
+            builder(frame)
+    
+    def on_first_map(self, event):
+        """Note when the main window first appears"""
+        if event.widget is self.root:
+            self.root.unbind('<Map>')
+            # Drawing happens in idle callbacks queued by the mapping
+            self.root.after_idle(self.startup.mark, 'first_paint')
+    
+    def finish_startup(self, marks):
+        """Write the startup timing report, if one was requested"""
+        if self.startup_report is not None:
+            line = json.dumps({'startup_ms': marks, 'time': datetime.now().isoformat()})
+            if self.startup_report == '-':
+                print(line, file=sys.stderr)
+            else:
+                with open(self.startup_report, 'a', encoding='utf-8') as report:
+                    report.write(line + '\n')
+        
+        # Deferred: this may be running inside a worker's result callback
+        if self.quit_after_startup:
+            self.root.after_idle(self.close)
     
-    def create_dashboard_tab(self):
+    def create_dashboard_tab(self, dashboard_frame):
         """Create dashboard tab with overview"""
-        dashboard_frame = tk.Frame(self.notebook, bg='#34495e')
-        self.notebook.add(dashboard_frame, text='Dashboard')
         
         # Title
         title_label = tk.Label(dashboard_frame, text="Financial Dashboard", 
@@ -113,6 +425,8 @@ class FinanceTracker:
         
         self.recent_tree.pack(side='left', fill='both', expand=True)
         scrollbar.pack(side='right', fill='y')
+        
+        self.update_dashboard()
     
     def create_balance_card(self, parent, title, value, color, column):
         """Create a balance display card"""
@@ -131,10 +445,8 @@ class FinanceTracker:
         # Store reference for updating
         setattr(self, f"{title.lower().replace(' ', '_')}_label", value_label)
     
-    def create_transactions_tab(self):
+    def create_transactions_tab(self, trans_frame):
         """Create transactions management tab"""
-        trans_frame = tk.Frame(self.notebook, bg='#34495e')
-        self.notebook.add(trans_frame, text='Transactions')
         
         # Input frame
         input_frame = tk.LabelFrame(trans_frame, text="Add Transaction", 
@@ -157,10 +469,9 @@ class FinanceTracker:
             
             if 'combo' in attr_name:
                 if 'category' in attr_name:
-                    values = ['Food', 'Transportation', 'Entertainment', 'Utilities', 
-                             'Healthcare', 'Shopping', 'Income', 'Investment', 'Other']
+                    values = CATEGORIES
                 else:  # type combo
-                    values = ['Income', 'Expense']
+                    values = TRANSACTION_TYPES
                 widget = ttk.Combobox(input_frame, values=values, width=15)
             else:
                 widget = tk.Entry(input_frame, width=18, bg='white')
@@ -194,22 +505,33 @@ class FinanceTracker:
         self.search_entry = tk.Entry(search_frame, width=30)
         self.search_entry.pack(side='left', padx=5)
         self.search_entry.bind('<KeyRelease>', self.search_transactions)
+        self.search_job = None
         
         tk.Label(search_frame, text="Filter by Category:", bg='#34495e', fg='white').pack(side='left', padx=(20, 5))
-        self.filter_combo = ttk.Combobox(search_frame, values=['All'] + 
-                                        ['Food', 'Transportation', 'Entertainment', 'Utilities', 
-                                         'Healthcare', 'Shopping', 'Income', 'Investment', 'Other'],
+        self.filter_combo = ttk.Combobox(search_frame, values=['All'] + CATEGORIES,
                                         width=15)
         self.filter_combo.set('All')
         self.filter_combo.pack(side='left', padx=5)
         self.filter_combo.bind('<<ComboboxSelected>>', self.filter_transactions)
         
+        # Tags change with every write, so the list is read when opened
+        tk.Label(search_frame, text="Tag:", bg='#34495e', fg='white').pack(side='left', padx=(20, 5))
+        self.tag_filter_combo = ttk.Combobox(search_frame, values=['All'], width=15,
+                                             postcommand=self.refresh_tag_filter)
+        self.tag_filter_combo.set('All')
+        self.tag_filter_combo.pack(side='left', padx=5)
+        self.tag_filter_combo.bind('<<ComboboxSelected>>', self.filter_transactions)
+        
         # Transactions treeview
-        columns = ('ID', 'Date', 'Category', 'Description', 'Amount', 'Type', 'Tags')
+        columns = ('ID', 'Date', 'Category', 'Description', 'Amount', 'Type', 'Tags', 'Balance')
         self.trans_tree = ttk.Treeview(list_frame, columns=columns, show='headings')
         
         for col in columns:
-            self.trans_tree.heading(col, text=col)
+            # The running balance follows date order whatever the sort
+            if col == 'Balance':
+                self.trans_tree.heading(col, text=col)
+            else:
+                self.trans_tree.heading(col, text=col, command=lambda c=col: self.sort_transactions(c))
             if col == 'ID':
                 self.trans_tree.column(col, width=50)
             elif col == 'Description':
@@ -220,15 +542,23 @@ class FinanceTracker:
         self.trans_tree.bind('<<TreeviewSelect>>', self.on_transaction_select)
         
         trans_scroll = ttk.Scrollbar(list_frame, orient='vertical', command=self.trans_tree.yview)
-        self.trans_tree.configure(yscrollcommand=trans_scroll.set)
+        self.trans_scroll = trans_scroll
+        self.trans_tree.configure(yscrollcommand=self.on_transactions_scroll)
+        
+        # Loaded window state: sort key per row and whether either end of
+        # the result set has been reached
+        self.trans_keys = {}
+        self.trans_at_start = True
+        self.trans_at_end = True
+        self.trans_paging = False
         
         self.trans_tree.pack(side='left', fill='both', expand=True, padx=10, pady=10)
         trans_scroll.pack(side='right', fill='y', pady=10)
+        
+        self.load_transactions()
     
-    def create_budget_tab(self):
+    def create_budget_tab(self, budget_frame):
         """Create budget management tab"""
-        budget_frame = tk.Frame(self.notebook, bg='#34495e')
-        self.notebook.add(budget_frame, text='Budget')
         
         # Budget input
         input_frame = tk.LabelFrame(budget_frame, text="Set Budget", 
@@ -245,12 +575,18 @@ class FinanceTracker:
         self.budget_amount.grid(row=0, column=3, padx=5, pady=5)
         
         tk.Label(input_frame, text="Period:", bg='#34495e', fg='white').grid(row=0, column=4, padx=5, pady=5)
-        self.budget_period = ttk.Combobox(input_frame, values=['Monthly', 'Weekly', 'Yearly'])
+        self.budget_period = ttk.Combobox(input_frame, values=BUDGET_PERIODS)
         self.budget_period.set('Monthly')
         self.budget_period.grid(row=0, column=5, padx=5, pady=5)
         
+        tk.Label(input_frame, text="Starts On:", bg='#34495e', fg='white').grid(row=1, column=0, padx=5, pady=5)
+        self.budget_anchor = tk.Entry(input_frame, width=15)
+        self.budget_anchor.grid(row=1, column=1, padx=5, pady=5, sticky='w')
+        tk.Label(input_frame, text="Day of month, weekday (1=Mon) or month; blank for default",
+                 bg='#34495e', fg='#bdc3c7').grid(row=1, column=2, columnspan=4, padx=5, pady=5, sticky='w')
+        
         tk.Button(input_frame, text="Set Budget", command=self.set_budget,
-                 bg='#27ae60', fg='white').grid(row=1, column=0, columnspan=6, pady=10)
+                 bg='#27ae60', fg='white').grid(row=2, column=0, columnspan=6, pady=10)
         
         # Budget overview
         overview_frame = tk.LabelFrame(budget_frame, text="Budget Overview", 
@@ -258,31 +594,39 @@ class FinanceTracker:
         overview_frame.pack(fill='both', expand=True, padx=20, pady=10)
         
         # Budget treeview
-        budget_columns = ('Category', 'Budget', 'Spent', 'Remaining', 'Period', 'Status')
+        budget_columns = ('Category', 'Budget', 'Spent', 'Remaining', 'Projected', 'Period', 'Status')
         self.budget_tree = ttk.Treeview(overview_frame, columns=budget_columns, show='headings')
         
         for col in budget_columns:
             self.budget_tree.heading(col, text=col)
             self.budget_tree.column(col, width=120)
+        self.budget_tree.tag_configure('over', foreground='#c0392b')
+        self.budget_tree.tag_configure('projected_over', foreground='#d35400')
         
         budget_scroll = ttk.Scrollbar(overview_frame, orient='vertical', command=self.budget_tree.yview)
         self.budget_tree.configure(yscrollcommand=budget_scroll.set)
         
         self.budget_tree.pack(side='left', fill='both', expand=True, padx=10, pady=10)
         budget_scroll.pack(side='right', fill='y', pady=10)
+        
+        self.load_budgets()
     
-    def create_analytics_tab(self):
+    def create_analytics_tab(self, analytics_frame):
         """Create analytics and charts tab"""
-        analytics_frame = tk.Frame(self.notebook, bg='#34495e')
-        self.notebook.add(analytics_frame, text='Analytics')
+        # numpy and matplotlib are first imported here
+        from finance_tracker.analytics import TransactionColumns
+        from finance_tracker.charts import CHART_TYPES, ChartRenderer
+        
+        self.columns = TransactionColumns()
+        # Charts are queried and rasterized on their own thread
+        self.chart_worker = QueryWorker(self.connections, self.root, name='Chart worker')
         
         # Chart controls
         controls_frame = tk.Frame(analytics_frame, bg='#34495e')
         controls_frame.pack(fill='x', padx=20, pady=10)
         
         tk.Label(controls_frame, text="Chart Type:", bg='#34495e', fg='white').pack(side='left', padx=5)
-        self.chart_type = ttk.Combobox(controls_frame, values=['Expense by Category', 'Income vs Expenses', 
-                                                              'Monthly Trends', 'Budget Analysis'])
+        self.chart_type = ttk.Combobox(controls_frame, values=CHART_TYPES)
         self.chart_type.set('Expense by Category')
         self.chart_type.pack(side='left', padx=5)
         
@@ -292,11 +636,13 @@ class FinanceTracker:
         # Chart canvas
         self.chart_frame = tk.Frame(analytics_frame, bg='#34495e')
         self.chart_frame.pack(fill='both', expand=True, padx=20, pady=10)
+        self.chart_view = ChartView(self.chart_frame)
+        self.chart_renderer = ChartRenderer()
+        self.chart_resize_job = None
+        self.chart_frame.bind('<Configure>', self.on_chart_resize)
     
-    def create_export_tab(self):
+    def create_export_tab(self, export_frame):
         """Create data export/import tab"""
-        export_frame = tk.Frame(self.notebook, bg='#34495e')
-        self.notebook.add(export_frame, text='Export/Import')
         
         # Export section
         export_section = tk.LabelFrame(export_frame, text="Export Data", 
@@ -308,6 +654,12 @@ class FinanceTracker:
         tk.Button(export_section, text="Export to JSON", command=self.export_json,
                  bg='#3498db', fg='white', width=20).pack(side='left', padx=10, pady=10)
         
+        self.export_progress = ttk.Progressbar(export_section, length=200, maximum=100)
+        self.export_progress.pack(side='left', padx=10, pady=10)
+        self.export_status = tk.Label(export_section, text="", bg='#34495e', fg='white')
+        self.export_status.pack(side='left', padx=5)
+        self.export_task = None
+        
         # Import section
         import_section = tk.LabelFrame(export_frame, text="Import Data", 
                                       font=('Arial', 12, 'bold'), bg='#34495e', fg='white')
@@ -318,6 +670,12 @@ class FinanceTracker:
         tk.Button(import_section, text="Import from JSON", command=self.import_json,
                  bg='#9b59b6', fg='white', width=20).pack(side='left', padx=10, pady=10)
         
+        self.import_progress = ttk.Progressbar(import_section, length=200, maximum=100)
+        self.import_progress.pack(side='left', padx=10, pady=10)
+        self.import_status = tk.Label(import_section, text="", bg='#34495e', fg='white')
+        self.import_status.pack(side='left', padx=5)
+        self.import_task = None
+        
         # Backup section
         backup_section = tk.LabelFrame(export_frame, text="Backup & Restore", 
                                       font=('Arial', 12, 'bold'), bg='#34495e', fg='white')
@@ -325,8 +683,111 @@ class FinanceTracker:
         
         tk.Button(backup_section, text="Create Backup", command=self.create_backup,
                  bg='#1abc9c', fg='white', width=20).pack(side='left', padx=10, pady=10)
+        tk.Button(backup_section, text="Differential Backup",
+                 command=self.create_differential_backup,
+                 bg='#16a085', fg='white', width=20).pack(side='left', padx=10, pady=10)
         tk.Button(backup_section, text="Restore Backup", command=self.restore_backup,
                  bg='#e74c3c', fg='white', width=20).pack(side='left', padx=10, pady=10)
+        
+        self.backup_progress = ttk.Progressbar(backup_section, length=200, maximum=100)
+        self.backup_progress.pack(side='left', padx=10, pady=10)
+        self.backup_status = tk.Label(backup_section, text="", bg='#34495e', fg='white')
+        self.backup_status.pack(side='left', padx=5)
+        self.backup_task = None
+        
+        # Maintenance section
+        maintenance_section = tk.LabelFrame(export_frame, text="Maintenance", 
+                                           font=('Arial', 12, 'bold'), bg='#34495e', fg='white')
+        maintenance_section.pack(fill='x', padx=20, pady=10)
+        
+        tk.Button(maintenance_section, text="Rebuild Summaries", command=self.rebuild_summaries,
+                 bg='#7f8c8d', fg='white', width=20).pack(side='left', padx=10, pady=10)
+        tk.Button(maintenance_section, text="Archive Closed Years", command=self.archive_years,
+                 bg='#7f8c8d', fg='white', width=20).pack(side='left', padx=10, pady=10)
+        
+        self.archive_status = tk.Label(maintenance_section, text="", bg='#34495e', fg='white')
+        self.archive_status.pack(side='left', padx=5)
+        self.archive_task = None
+    
+    def create_performance_tab(self, perf_frame):
+        """Create the performance tab, shown when started with --perf"""
+        controls_frame = tk.Frame(perf_frame, bg='#34495e')
+        controls_frame.pack(fill='x', padx=20, pady=10)
+        
+        tk.Button(controls_frame, text="Reset", command=self.reset_performance,
+                 bg='#e67e22', fg='white', width=15).pack(side='left', padx=5)
+        tk.Button(controls_frame, text="Export Trace", command=self.export_trace,
+                 bg='#3498db', fg='white', width=15).pack(side='left', padx=5)
+        self.perf_status = tk.Label(controls_frame, text="", bg='#34495e', fg='white')
+        self.perf_status.pack(side='left', padx=10)
+        
+        # Rolling figures per operation
+        operations_frame = tk.LabelFrame(perf_frame, text=f"Operations (last {perf.ROLLING_WINDOW} runs each)",
+                                        font=('Arial', 12, 'bold'), bg='#34495e', fg='white')
+        operations_frame.pack(fill='both', expand=True, padx=20, pady=10)
+        
+        perf_columns = ('Operation', 'Count', 'p50 ms', 'p95 ms', 'Max ms', 'Rows')
+        self.perf_tree = ttk.Treeview(operations_frame, columns=perf_columns, show='headings')
+        for col in perf_columns:
+            self.perf_tree.heading(col, text=col)
+            self.perf_tree.column(col, width=80, anchor='e')
+        self.perf_tree.column('Operation', width=520, anchor='w')
+        
+        perf_scroll = ttk.Scrollbar(operations_frame, orient='vertical', command=self.perf_tree.yview)
+        self.perf_tree.configure(yscrollcommand=perf_scroll.set)
+        self.perf_tree.pack(side='left', fill='both', expand=True, padx=10, pady=10)
+        perf_scroll.pack(side='right', fill='y', pady=10)
+        
+        # Slow statements with their query plans
+        slow_frame = tk.LabelFrame(perf_frame, text=f"Slow Queries (over {perf.recorder.slow_query_ms} ms)",
+                                  font=('Arial', 12, 'bold'), bg='#34495e', fg='white')
+        slow_frame.pack(fill='both', padx=20, pady=10)
+        self.slow_query_text = tk.Text(slow_frame, height=10, bg='#2c3e50', fg='white',
+                                       font=('Courier', 9), wrap='none')
+        self.slow_query_text.pack(fill='both', expand=True, padx=10, pady=10)
+        
+        self.perf_tab = str(perf_frame)
+        self.refresh_performance()
+    
+    def refresh_performance(self):
+        """Update the performance tab while it is shown, every PERF_REFRESH_MS"""
+        if self.notebook.select() == self.perf_tab:
+            summary = perf.recorder.summary()
+            self.perf_tree.delete(*self.perf_tree.get_children())
+            for entry in summary:
+                rows = '' if entry['mean_rows'] is None else f"{entry['mean_rows']:g}"
+                self.perf_tree.insert('', 'end', values=(
+                    entry['operation'], entry['count'], f"{entry['p50_ms']:.2f}",
+                    f"{entry['p95_ms']:.2f}", f"{entry['max_ms']:.2f}", rows))
+            
+            lines = []
+            for query in reversed(perf.recorder.slow_queries):
+                lines.append(f"{query['ms']:.1f} ms, {query['rows']} rows: {query['sql']}")
+                lines.extend('    ' + line for line in query['plan'])
+            self.slow_query_text.delete('1.0', 'end')
+            self.slow_query_text.insert('1.0', '\n'.join(lines))
+            self.perf_status.config(text=f"{len(summary)} operations")
+        
+        self.root.after(self.PERF_REFRESH_MS, self.refresh_performance)
+    
+    def reset_performance(self):
+        """Discard recorded timings"""
+        perf.recorder.reset()
+        self.perf_status.config(text="Reset")
+    
+    def export_trace(self):
+        """Save recorded timings as a Chrome trace"""
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            filetypes=[("Trace files", "*.json"), ("All files", "*.*")]
+        )
+        if not filename:
+            return
+        try:
+            events = perf.recorder.export_trace(filename)
+            messagebox.showinfo("Success", f"Saved {events} events to {filename}")
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to save trace: {str(e)}")
     
     def add_transaction(self):
         """Add new transaction to database"""
@@ -342,19 +803,15 @@ class FinanceTracker:
                 messagebox.showerror("Error", "Please fill all required fields")
                 return
             
-            self.cursor.execute('''
-                INSERT INTO transactions (date, category, description, amount, type, tags)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (date, category, description, amount, trans_type, tags))
+            delta = add_transaction_row(
+                self.conn, (date, category, description, amount, trans_type, tags))
             
-            self.conn.commit()
             self.clear_transaction_fields()
-            self.load_transactions()
-            self.update_dashboard()
+            self.apply_change(delta)
             messagebox.showinfo("Success", "Transaction added successfully")
             
         except ValueError:
-            messagebox.showerror("Error", "Please enter a valid amount")
+            messagebox.showerror("Error", "Please enter a valid amount and a YYYY-MM-DD date")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to add transaction: {str(e)}")
     
@@ -368,6 +825,9 @@ class FinanceTracker:
         try:
             item = self.trans_tree.item(selected[0])
             trans_id = item['values'][0]
+            if not self.is_live(trans_id):
+                messagebox.showerror("Error", "Archived transactions cannot be changed")
+                return
             
             date = self.date_entry.get()
             category = self.category_combo.get()
@@ -376,20 +836,15 @@ class FinanceTracker:
             trans_type = self.type_combo.get()
             tags = self.tags_entry.get()
             
-            self.cursor.execute('''
-                UPDATE transactions 
-                SET date=?, category=?, description=?, amount=?, type=?, tags=?
-                WHERE id=?
-            ''', (date, category, description, amount, trans_type, tags, trans_id))
+            delta = update_transaction_row(
+                self.conn, trans_id, (date, category, description, amount, trans_type, tags))
             
-            self.conn.commit()
             self.clear_transaction_fields()
-            self.load_transactions()
-            self.update_dashboard()
+            self.apply_change(delta)
             messagebox.showinfo("Success", "Transaction updated successfully")
             
         except ValueError:
-            messagebox.showerror("Error", "Please enter a valid amount")
+            messagebox.showerror("Error", "Please enter a valid amount and a YYYY-MM-DD date")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to update transaction: {str(e)}")
     
@@ -399,22 +854,106 @@ class FinanceTracker:
         if not selected:
             messagebox.showwarning("Warning", "Please select a transaction to delete")
             return
+        if not self.is_live(self.trans_tree.item(selected[0])['values'][0]):
+            messagebox.showerror("Error", "Archived transactions cannot be deleted")
+            return
         
         if messagebox.askyesno("Confirm", "Are you sure you want to delete this transaction?"):
             try:
                 item = self.trans_tree.item(selected[0])
                 trans_id = item['values'][0]
                 
-                self.cursor.execute('DELETE FROM transactions WHERE id=?', (trans_id,))
-                self.conn.commit()
+                delta = delete_transaction_row(self.conn, trans_id)
                 
-                self.load_transactions()
-                self.update_dashboard()
+                self.apply_change(delta)
                 messagebox.showinfo("Success", "Transaction deleted successfully")
                 
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to delete transaction: {str(e)}")
     
+    def is_live(self, trans_id):
+        """Check whether a listed transaction is in the live table rather
+        than a read-only archive"""
+        self.cursor.execute('SELECT 1 FROM transactions WHERE id = ?', (trans_id,))
+        return self.cursor.fetchone() is not None
+    
+    def apply_change(self, delta):
+        """Patch every view affected by a single transaction write"""
+        self.balance_index.apply(delta)
+        if hasattr(self, 'trans_tree'):
+            self.patch_transaction_list(delta)
+            self.refresh_transaction_balances()
+        self.patch_dashboard(delta)
+        if self.columns is not None:
+            self.columns.apply(delta)
+        
+        # Budget spend only moves with expenses
+        if 'Expense' in (row[5] for row in (delta.old, delta.new) if row is not None):
+            self.budget_engine.invalidate()
+            if hasattr(self, 'budget_tree'):
+                self.load_budgets()
+    
+    def patch_transaction_list(self, delta):
+        """Move, add or drop the changed row in the loaded window"""
+        # A load in flight may or may not see the write; start it over
+        if self.trans_paging:
+            self.load_transactions(self.search_entry.get())
+            return
+        
+        if delta.old is not None and str(delta.old[0]) in self.trans_keys:
+            self.remove_transaction_rows([str(delta.old[0])])
+        if delta.new is None:
+            return
+        
+        # Single-row lookup through the pager's filters and sort expression
+        self.cursor.execute(*self.trans_pager.row_query(delta.new[0]))
+        row = self.cursor.fetchone()
+        if row is None:
+            return
+        trans, key = TransactionPager.split_row(row)
+        
+        children = self.trans_tree.get_children()
+        index = next((i for i, iid in enumerate(children)
+                      if self.trans_pager.precedes(key, self.trans_keys[iid])), len(children))
+        
+        # Rows beyond either end of the window belong to pages not loaded
+        if children and index == 0 and not self.trans_at_start:
+            return
+        if index == len(children) and not self.trans_at_end:
+            return
+        
+        # Its balance arrives with refresh_transaction_balances()
+        iid = str(trans[0])
+        self.trans_tree.insert('', index, iid=iid, values=trans + ('',))
+        self.trans_keys[iid] = key
+    
+    def refresh_transaction_balances(self):
+        """Re-read the running balance of every loaded row, since a write
+        moves the balance of all later transactions"""
+        if self.trans_paging or not self.trans_keys:
+            return
+        ids = [int(iid) for iid in self.trans_keys]
+        self.worker.submit('balances', self.balance_index.running_balances,
+                           lambda balances: self.show_transaction_balances(ids, balances), ids)
+    
+    def show_transaction_balances(self, ids, balances):
+        """Fill in the Balance column of rows still loaded"""
+        for trans_id, balance in zip(ids, balances):
+            iid = str(trans_id)
+            if self.trans_tree.exists(iid):
+                self.trans_tree.set(iid, 'Balance', format_balance(balance))
+    
+    def patch_dashboard(self, delta):
+        """Adjust dashboard totals and recent transactions for one write"""
+        # A full refresh in flight may have read the table before the write
+        if self.dashboard_stats is None:
+            self.update_dashboard()
+            return
+        
+        if not patch_dashboard_stats(self.dashboard_stats, delta):
+            self.worker.submit('recent', fetch_recent_transactions, self.show_recent_transactions)
+        self.show_dashboard(self.dashboard_stats)
+    
     def on_transaction_select(self, event):
         """Handle transaction selection"""
         selected = self.trans_tree.selection()
@@ -444,43 +983,155 @@ class FinanceTracker:
         self.tags_entry.delete(0, tk.END)
     
     def search_transactions(self, event):
-        """Search transactions by description"""
-        search_term = self.search_entry.get().lower()
-        self.load_transactions(search_term)
+        """Search transactions once typing pauses"""
+        if self.search_job is not None:
+            self.root.after_cancel(self.search_job)
+        self.search_job = self.root.after(self.SEARCH_DEBOUNCE_MS, self.run_search)
+    
+    def run_search(self):
+        """Run the full-text search for the current search box contents"""
+        self.search_job = None
+        self.load_transactions(self.search_entry.get())
     
     def filter_transactions(self, event):
-        """Filter transactions by category"""
-        self.load_transactions()
+        """Filter transactions by category and tag"""
+        self.load_transactions(self.search_entry.get())
+    
+    def refresh_tag_filter(self):
+        """Fill the tag filter with the tags now in use"""
+        self.tag_filter_combo['values'] = ['All'] + fetch_tag_names(self.cursor)
     
+    @perf.timed('load_transactions')
     def load_transactions(self, search_term=''):
-        """Load transactions into treeview"""
-        # Clear existing items
-        for item in self.trans_tree.get_children():
-            self.trans_tree.delete(item)
-        
-        # Build query
-        query = 'SELECT * FROM transactions WHERE 1=1'
-        params = []
-        
-        if search_term:
-            query += ' AND (description LIKE ? OR category LIKE ?)'
-            params.extend([f'%{search_term}%', f'%{search_term}%'])
-        
+        """Load the first page of transactions into treeview"""
         filter_category = self.filter_combo.get() if hasattr(self, 'filter_combo') else 'All'
-        if filter_category and filter_category != 'All':
-            query += ' AND category = ?'
-            params.append(filter_category)
-        
-        query += ' ORDER BY date DESC'
-        
-        self.cursor.execute(query, params)
-        transactions = self.cursor.fetchall()
-        
-        for trans in transactions:
-            self.trans_tree.insert('', 'end', values=trans)
+        filter_tag = self.tag_filter_combo.get() if hasattr(self, 'tag_filter_combo') else 'All'
+        self.trans_pager.set_filters(search_term, filter_category, filter_tag)
+        self.update_sort_headings()
+        
+        # Pages requested for the old window no longer apply
+        self.worker.cancel('transactions-page')
+        self.trans_paging = True
+        self.worker.cancel('balances')
+        self.worker.submit('transactions', self.fetch_transactions_page,
+                           self.show_transactions, self.trans_pager.page_query(),
+                           on_error=self.on_transactions_error)
+    
+    def fetch_transactions_page(self, cursor, page_query):
+        """Fetch a page of (transaction, sort key) rows with each row's
+        running balance appended; runs on the query worker"""
+        page = TransactionPager.fetch_page(cursor, page_query)
+        balances = self.balance_index.running_balances(cursor, [trans[0] for trans, _ in page])
+        return [(trans + (format_balance(balance),), key)
+                for (trans, key), balance in zip(page, balances)]
+    
+    def on_transactions_error(self, error):
+        """Report a failed transactions query and let paging resume"""
+        self.trans_paging = False
+        messagebox.showerror("Error", f"Failed to load transactions: {str(error)}")
+    
+    def show_transactions(self, page):
+        """Replace treeview contents with a freshly loaded first page"""
+        # Clear existing items
+        self.trans_tree.delete(*self.trans_tree.get_children())
+        self.trans_keys.clear()
+        
+        self.insert_transaction_rows(page, 'end')
+        self.trans_at_start = True
+        self.trans_at_end = len(page) < self.trans_pager.page_size
+        self.trans_tree.yview_moveto(0)
+        self.trans_paging = False
+    
+    def insert_transaction_rows(self, rows, index):
+        """Insert (transaction, sort key) rows into treeview at index"""
+        for trans, key in (reversed(rows) if index == 0 else rows):
+            iid = str(trans[0])
+            self.trans_tree.insert('', index, iid=iid, values=trans)
+            self.trans_keys[iid] = key
+    
+    def remove_transaction_rows(self, items):
+        """Remove rows from treeview"""
+        self.trans_tree.delete(*items)
+        for iid in items:
+            del self.trans_keys[iid]
+    
+    def sort_transactions(self, column):
+        """Sort transactions by column in SQL, toggling direction on repeat clicks"""
+        pager = self.trans_pager
+        descending = not pager.descending if pager.sort_column == column else column == 'Date'
+        pager.set_sort(column, descending)
+        self.load_transactions(self.search_entry.get())
+    
+    def update_sort_headings(self):
+        """Mark the sorted column heading with the sort direction"""
+        pager = self.trans_pager
+        for col in self.trans_tree['columns']:
+            arrow = (' ▼' if pager.descending else ' ▲') if col == pager.sort_column else ''
+            self.trans_tree.heading(col, text=col + arrow)
+    
+    def on_transactions_scroll(self, first, last):
+        """Track the treeview scroll position and page in rows near the edges"""
+        self.trans_scroll.set(first, last)
+        if not self.trans_paging:
+            self.trans_paging = True
+            self.root.after_idle(self.page_transactions)
+    
+    def page_transactions(self):
+        """Request more rows when the view nears the top or bottom of the window"""
+        children = self.trans_tree.get_children()
+        if children:
+            first, last = self.trans_tree.yview()
+            top = int(round(first * len(children)))
+            rows_below = len(children) - int(round(last * len(children)))
+            
+            if not self.trans_at_end and rows_below < self.TRANS_PREFETCH_ROWS:
+                page_query = self.trans_pager.page_query(self.trans_keys[children[-1]])
+                self.worker.submit('transactions-page', self.fetch_transactions_page,
+                                   self.append_transactions, page_query,
+                                   on_error=self.on_transactions_error)
+                return
+            
+            if not self.trans_at_start and top < self.TRANS_PREFETCH_ROWS:
+                page_query = self.trans_pager.page_query(self.trans_keys[children[0]], forward=False)
+                self.worker.submit('transactions-page', self.fetch_transactions_page,
+                                   self.prepend_transactions, page_query,
+                                   on_error=self.on_transactions_error)
+                return
         
-        # Update recent transactions on dashboard
-        self.update_recent_transactions(transactions[:10])
+        self.trans_paging = False
+    
+    def append_transactions(self, page):
+        """Add a page below the loaded window, dropping rows far above the view"""
+        children = self.trans_tree.get_children()
+        total = len(children)
+        top = int(round(self.trans_tree.yview()[0] * total))
+        
+        self.trans_at_end = len(page) < self.trans_pager.page_size
+        self.insert_transaction_rows(page, 'end')
+        
+        # Keep the view steady while trimming rows scrolled far out of view
+        excess = total + len(page) - self.TRANS_WINDOW_ROWS
+        if excess > 0:
+            self.remove_transaction_rows(children[:excess])
+            self.trans_at_start = False
+            self.trans_tree.yview_moveto((top - excess) / (total + len(page) - excess))
+        self.trans_paging = False
+    
+    def prepend_transactions(self, page):
+        """Add a page above the loaded window, dropping rows far below the view"""
+        children = self.trans_tree.get_children()
+        total = len(children)
+        top = int(round(self.trans_tree.yview()[0] * total))
+        
+        self.trans_at_start = len(page) < self.trans_pager.page_size
+        self.insert_transaction_rows(page, 0)
+        
+        excess = max(total + len(page) - self.TRANS_WINDOW_ROWS, 0)
+        if excess:
+            self.remove_transaction_rows(children[total - excess:])
+            self.trans_at_end = False
+        self.trans_tree.yview_moveto((top + len(page)) / (total + len(page) - excess))
+        self.trans_paging = False
     
     def update_recent_transactions(self, transactions):
         """Update recent transactions display"""
@@ -499,17 +1150,32 @@ class FinanceTracker:
             category = self.budget_category.get()
             amount = float(self.budget_amount.get())
             period = self.budget_period.get()
+            anchor_text = self.budget_anchor.get().strip()
+            if not math.isfinite(amount) or amount < 0:
+                raise ValueError(f"invalid budget amount {amount!r}")
             
             if not all([category, amount, period]):
                 messagebox.showerror("Error", "Please fill all fields")
                 return
             
+            anchor = None
+            if anchor_text:
+                limit = BUDGET_ANCHOR_LIMITS.get(period, 0)
+                if not anchor_text.isdigit() or not 1 <= int(anchor_text) <= limit:
+                    messagebox.showerror("Error", f"Please enter a valid start for a {period} budget")
+                    return
+                anchor = int(anchor_text)
+            
+            # Upsert keeps the budget's id stable
             self.cursor.execute('''
-                INSERT OR REPLACE INTO budgets (category, amount, period)
-                VALUES (?, ?, ?)
-            ''', (category, amount, period))
+                INSERT INTO budgets (category, amount, period, anchor)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (category) DO UPDATE SET
+                    amount = excluded.amount, period = excluded.period, anchor = excluded.anchor
+            ''', (category, amount, period, anchor))
             
             self.conn.commit()
+            self.budget_engine.invalidate()
             self.load_budgets()
             messagebox.showinfo("Success", "Budget set successfully")
             
@@ -518,449 +1184,495 @@ class FinanceTracker:
         except Exception as e:
             messagebox.showerror("Error", f"Failed to set budget: {str(e)}")
     
+    @perf.timed('load_budgets')
     def load_budgets(self):
         """Load budgets and calculate spending"""
+        self.worker.submit('budgets', self.evaluate_budgets, self.show_budgets)
+    
+    def evaluate_budgets(self, cursor):
+        """Return (BudgetStatus, projected spend) pairs; runs on the query
+        worker"""
+        # numpy is first imported here
+        from finance_tracker.forecast import forecast_spend
+        
+        today = datetime.now().date()
+        budgets = self.budget_engine.evaluate(cursor, today)
+        return list(zip(budgets, forecast_spend(cursor, today).project(budgets, today)))
+    
+    def show_budgets(self, budgets):
+        """Fill the budget treeview, warning of budgets the forecast
+        expects to be exceeded by the end of their period"""
         for item in self.budget_tree.get_children():
             self.budget_tree.delete(item)
         
-        self.cursor.execute('SELECT * FROM budgets')
-        budgets = self.cursor.fetchall()
-        
-        for budget in budgets:
-            category, amount, period = budget[1], budget[2], budget[3]
-            
-            # Calculate spent amount for the period
-            if period == 'Monthly':
-                start_date = datetime.now().replace(day=1).strftime('%Y-%m-%d')
-            elif period == 'Weekly':
-                start_date = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
-            else:  # Yearly
-                start_date = datetime.now().replace(month=1, day=1).strftime('%Y-%m-%d')
-            
-            self.cursor.execute('''
-                SELECT SUM(amount) FROM transactions 
-                WHERE category = ? AND type = 'Expense' AND date >= ?
-            ''', (category, start_date))
-            
-            spent = self.cursor.fetchone()[0] or 0
+        for budget, projected in budgets:
+            amount, spent = budget.amount, budget.spent
             remaining = amount - spent
-            status = "Over Budget" if remaining < 0 else f"{(remaining/amount)*100:.1f}% Left"
+            if remaining < 0:
+                status, tags = "Over Budget", ('over',)
+            elif projected > amount:
+                status, tags = f"Projected Over by ${projected - amount:.2f}", ('projected_over',)
+            elif amount <= 0:
+                # Budgets stored before amounts were validated
+                status, tags = "No Budget", ()
+            else:
+                status, tags = f"{(remaining/amount)*100:.1f}% Left", ()
             
             self.budget_tree.insert('', 'end', values=(
-                category, f"${amount:.2f}", f"${spent:.2f}", 
-                f"${remaining:.2f}", period, status
-            ))
+                budget.category, f"${amount:.2f}", f"${spent:.2f}", 
+                f"${remaining:.2f}", f"${projected:.2f}", f"{budget.period} from {budget.start}",
+                status
+            ), tags=tags)
+    
+    def chart_version(self, chart_type):
+        """Version of the data behind a chart; the day is part of it since
+        budget windows move with the date"""
+        if chart_type == 'Budget Analysis':
+            return (self.budget_engine.version, datetime.now().date())
+        if chart_type == 'Balance Over Time':
+            return self.balance_index.version
+        return self.columns.version
     
+    @perf.timed('generate_chart')
     def generate_chart(self):
-        """Generate selected chart"""
+        """Generate selected chart, reusing its last rendering if the data
+        and size have not changed since"""
         chart_type = self.chart_type.get()
+        from finance_tracker.charts import CHART_DRAWERS
+        if chart_type not in CHART_DRAWERS:
+            return
         
-        # Clear previous chart
-        for widget in self.chart_frame.winfo_children():
-            widget.destroy()
-        
-        fig, ax = plt.subplots(figsize=(10, 6))
-        fig.patch.set_facecolor('#34495e')
-        ax.set_facecolor('#2c3e50')
-        
-        if chart_type == 'Expense by Category':
-            self.create_expense_pie_chart(ax)
-        elif chart_type == 'Income vs Expenses':
-            self.create_income_expense_chart(ax)
-        elif chart_type == 'Monthly Trends':
-            self.create_monthly_trends_chart(ax)
-        elif chart_type == 'Budget Analysis':
-            self.create_budget_analysis_chart(ax)
-        
-        # Embed chart in tkinter
-        canvas = FigureCanvasTkAgg(fig, self.chart_frame)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill='both', expand=True)
-    
-    def create_expense_pie_chart(self, ax):
-        """Create expense by category pie chart"""
-        self.cursor.execute('''
-            SELECT category, SUM(amount) FROM transactions 
-            WHERE type = 'Expense' 
-            GROUP BY category
-        ''')
-        data = self.cursor.fetchall()
-        
-        if data:
-            categories, amounts = zip(*data)
-            colors = plt.cm.Set3(np.linspace(0, 1, len(categories)))
-            
-            ax.pie(amounts, labels=categories, autopct='%1.1f%%', colors=colors, startangle=90)
-            ax.set_title('Expenses by Category', color='white', fontsize=14, fontweight='bold')
-        else:
-            ax.text(0.5, 0.5, 'No expense data available', transform=ax.transAxes, 
-                   ha='center', va='center', color='white', fontsize=12)
-    
-    def create_income_expense_chart(self, ax):
-        """Create income vs expenses bar chart"""
-        self.cursor.execute('''
-            SELECT type, SUM(amount) FROM transactions 
-            GROUP BY type
-        ''')
-        data = self.cursor.fetchall()
-        
-        if data:
-            types, amounts = zip(*data)
-            colors = ['#27ae60' if t == 'Income' else '#e74c3c' for t in types]
-            
-            bars = ax.bar(types, amounts, color=colors)
-            ax.set_title('Income vs Expenses', color='white', fontsize=14, fontweight='bold')
-            ax.set_ylabel('Amount ($)', color='white')
-            ax.tick_params(colors='white')
-            
-            # Add value labels on bars
-            for bar, amount in zip(bars, amounts):
-                height = bar.get_height()
-                ax.text(bar.get_x() + bar.get_width()/2., height + height*0.01,
-                       f'${amount:.2f}', ha='center', va='bottom', color='white')
-        else:
-            ax.text(0.5, 0.5, 'No data available', transform=ax.transAxes, 
-                   ha='center', va='center', color='white', fontsize=12)
-    
-    def create_monthly_trends_chart(self, ax):
-        """Create monthly trends line chart"""
-        self.cursor.execute('''
-            SELECT strftime('%Y-%m', date) as month, type, SUM(amount) 
-            FROM transactions 
-            GROUP BY month, type
-            ORDER BY month
-        ''')
-        data = self.cursor.fetchall()
-        
-        if data:
-            # Process data
-            months = {}
-            for month, trans_type, amount in data:
-                if month not in months:
-                    months[month] = {'Income': 0, 'Expense': 0}
-                months[month][trans_type] = amount
-            
-            if months:
-                month_labels = sorted(months.keys())
-                income_data = [months[m]['Income'] for m in month_labels]
-                expense_data = [months[m]['Expense'] for m in month_labels]
-                
-                ax.plot(month_labels, income_data, marker='o', label='Income', color='#27ae60', linewidth=2)
-                ax.plot(month_labels, expense_data, marker='s', label='Expenses', color='#e74c3c', linewidth=2)
-                
-                ax.set_title('Monthly Trends', color='white', fontsize=14, fontweight='bold')
-                ax.set_xlabel('Month', color='white')
-                ax.set_ylabel('Amount ($)', color='white')
-                ax.legend()
-                ax.tick_params(colors='white')
-                ax.grid(True, alpha=0.3)
-                
-                # Rotate x-axis labels for better readability
-                plt.setp(ax.get_xticklabels(), rotation=45, ha='right')
-        else:
-            ax.text(0.5, 0.5, 'No data available', transform=ax.transAxes, 
-                   ha='center', va='center', color='white', fontsize=12)
-    
-    def create_budget_analysis_chart(self, ax):
-        """Create budget analysis chart"""
-        self.cursor.execute('SELECT * FROM budgets')
-        budgets = self.cursor.fetchall()
-        
-        if budgets:
-            categories = []
-            budget_amounts = []
-            spent_amounts = []
-            
-            for budget in budgets:
-                category, amount, period = budget[1], budget[2], budget[3]
-                
-                # Calculate spent amount for the period
-                if period == 'Monthly':
-                    start_date = datetime.now().replace(day=1).strftime('%Y-%m-%d')
-                elif period == 'Weekly':
-                    start_date = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
-                else:  # Yearly
-                    start_date = datetime.now().replace(month=1, day=1).strftime('%Y-%m-%d')
-                
-                self.cursor.execute('''
-                    SELECT SUM(amount) FROM transactions 
-                    WHERE category = ? AND type = 'Expense' AND date >= ?
-                ''', (category, start_date))
-                
-                spent = self.cursor.fetchone()[0] or 0
-                
-                categories.append(category)
-                budget_amounts.append(amount)
-                spent_amounts.append(spent)
-            
-            x = np.arange(len(categories))
-            width = 0.35
-            
-            bars1 = ax.bar(x - width/2, budget_amounts, width, label='Budget', color='#3498db', alpha=0.8)
-            bars2 = ax.bar(x + width/2, spent_amounts, width, label='Spent', color='#e74c3c', alpha=0.8)
-            
-            ax.set_title('Budget vs Spending Analysis', color='white', fontsize=14, fontweight='bold')
-            ax.set_xlabel('Categories', color='white')
-            ax.set_ylabel('Amount ($)', color='white')
-            ax.set_xticks(x)
-            ax.set_xticklabels(categories)
-            ax.legend()
-            ax.tick_params(colors='white')
-            
-            # Add value labels on bars
-            for bars in [bars1, bars2]:
-                for bar in bars:
-                    height = bar.get_height()
-                    ax.text(bar.get_x() + bar.get_width()/2., height + height*0.01,
-                           f'${height:.0f}', ha='center', va='bottom', color='white', fontsize=8)
-        else:
-            ax.text(0.5, 0.5, 'No budget data available', transform=ax.transAxes, 
-                   ha='center', va='center', color='white', fontsize=12)
+        version = self.chart_version(chart_type)
+        size = self.chart_view.size()
+        if self.chart_view.is_current(chart_type, version, size):
+            self.chart_worker.cancel('chart')
+            self.chart_view.show_cached(chart_type)
+            return
+        
+        # Querying and drawing both happen on the chart worker thread
+        self.chart_view.show_placeholder(chart_type)
+        self.chart_worker.submit(
+            'chart', self.render_chart,
+            lambda ppm: self.chart_view.show_image(chart_type, version, size, ppm),
+            chart_type, size,
+            on_error=lambda e: self.chart_view.show_error(f"Failed to draw chart: {str(e)}")
+        )
+    
+    def render_chart(self, cursor, chart_type, size):
+        """Query and rasterize a chart; runs on the chart worker thread"""
+        with perf.span(f'{chart_type}: data'):
+            if chart_type == 'Budget Analysis':
+                data = self.budget_engine.evaluate(cursor)
+            elif chart_type == 'Balance Over Time':
+                data = self.balance_index.series(cursor)
+            else:
+                data = self.columns.chart_data(cursor, chart_type)
+        
+        from finance_tracker.charts import CHART_DRAWERS
+        draw = CHART_DRAWERS[chart_type]
+        with perf.span(f'{chart_type}: draw'):
+            return self.chart_renderer.render(chart_type, size, lambda ax: draw(ax, data))
+    
+    def on_chart_resize(self, event):
+        """Re-render the shown chart once resizing settles"""
+        if self.chart_resize_job is not None:
+            self.root.after_cancel(self.chart_resize_job)
+        self.chart_resize_job = self.root.after(self.CHART_RESIZE_DEBOUNCE_MS, self.rerender_chart)
+    
+    def rerender_chart(self):
+        """Redraw the chart on screen at the view's current size"""
+        self.chart_resize_job = None
+        if self.chart_type.get() in self.chart_view.images:
+            self.generate_chart()
     
     def export_csv(self):
-        """Export transactions to CSV"""
-        try:
-            filename = filedialog.asksaveasfilename(
-                defaultextension=".csv",
-                filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
-            )
-            
-            if filename:
-                self.cursor.execute('SELECT * FROM transactions ORDER BY date DESC')
-                transactions = self.cursor.fetchall()
-                
-                with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-                    writer = csv.writer(csvfile)
-                    writer.writerow(['ID', 'Date', 'Category', 'Description', 'Amount', 'Type', 'Tags'])
-                    writer.writerows(transactions)
-                
-                messagebox.showinfo("Success", f"Data exported to {filename}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to export CSV: {str(e)}")
+        """Export transactions to CSV in the background"""
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[("CSV files", "*.csv"), ("Compressed CSV", "*.csv.gz"), 
+                       ("All files", "*.*")]
+        )
+        
+        if filename:
+            from finance_tracker.exporter import export_csv_file
+            self.start_export(export_csv_file, filename)
     
     def export_json(self):
-        """Export data to JSON"""
-        try:
-            filename = filedialog.asksaveasfilename(
-                defaultextension=".json",
-                filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
-            )
-            
-            if filename:
-                # Export transactions
-                self.cursor.execute('SELECT * FROM transactions ORDER BY date DESC')
-                transactions = self.cursor.fetchall()
-                
-                # Export budgets
-                self.cursor.execute('SELECT * FROM budgets')
-                budgets = self.cursor.fetchall()
-                
-                data = {
-                    'transactions': [
-                        {
-                            'id': t[0], 'date': t[1], 'category': t[2], 
-                            'description': t[3], 'amount': t[4], 'type': t[5], 'tags': t[6]
-                        } for t in transactions
-                    ],
-                    'budgets': [
-                        {
-                            'id': b[0], 'category': b[1], 'amount': b[2], 'period': b[3]
-                        } for b in budgets
-                    ],
-                    'export_date': datetime.now().isoformat()
-                }
-                
-                with open(filename, 'w', encoding='utf-8') as jsonfile:
-                    json.dump(data, jsonfile, indent=2, ensure_ascii=False)
-                
-                messagebox.showinfo("Success", f"Data exported to {filename}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to export JSON: {str(e)}")
+        """Export data to JSON or NDJSON in the background"""
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            filetypes=[("JSON files", "*.json"), ("NDJSON files", "*.ndjson"), 
+                       ("Compressed JSON", "*.json.gz *.ndjson.gz"), ("All files", "*.*")]
+        )
+        
+        if filename:
+            from finance_tracker.exporter import export_json_file
+            self.start_export(export_json_file, filename)
+    
+    def start_export(self, export_func, filename):
+        """Run an export function on a background thread"""
+        if self.export_task is not None:
+            messagebox.showwarning("Warning", "An export is already running")
+            return
+        
+        self.export_progress['value'] = 0
+        self.export_status.config(text="Exporting...")
+        self.export_task = BackgroundTask(
+            self.root, export_func, DATABASE_FILE, filename,
+            on_progress=self.show_export_progress,
+            on_done=lambda written: self.finish_export(filename, written),
+            on_error=self.fail_export
+        )
+    
+    def show_export_progress(self, written, total):
+        """Update the export progress bar"""
+        self.export_progress['value'] = written * 100 / total if total else 100
+        self.export_status.config(text=f"{written} of {total} rows")
+    
+    def finish_export(self, filename, written):
+        """Report a finished export"""
+        self.export_task = None
+        self.export_progress['value'] = 100
+        self.export_status.config(text=f"{written} rows exported")
+        messagebox.showinfo("Success", f"Data exported to {filename}")
+    
+    def fail_export(self, error):
+        """Report an export that stopped part way"""
+        self.export_task = None
+        self.export_status.config(text="Export failed")
+        messagebox.showerror("Error", f"Failed to export: {str(error)}")
     
     def import_csv(self):
-        """Import transactions from CSV"""
-        try:
-            filename = filedialog.askopenfilename(
-                filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
-            )
+        """Import transactions from CSV in the background"""
+        if self.import_task is not None:
+            messagebox.showwarning("Warning", "An import is already running")
+            return
+        
+        filename = filedialog.askopenfilename(
+            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
+        )
+        
+        if filename:
+            from finance_tracker.importer import (PARALLEL_IMPORT_MIN_BYTES, import_csv_file,
+                                                  import_file_parallel)
             
-            if filename:
-                with open(filename, 'r', encoding='utf-8') as csvfile:
-                    reader = csv.DictReader(csvfile)
-                    imported_count = 0
-                    
-                    for row in reader:
-                        # Skip if required fields are missing
-                        if not all([row.get('Date'), row.get('Category'), 
-                                   row.get('Amount'), row.get('Type')]):
-                            continue
-                        
-                        self.cursor.execute('''
-                            INSERT INTO transactions (date, category, description, amount, type, tags)
-                            VALUES (?, ?, ?, ?, ?, ?)
-                        ''', (
-                            row.get('Date', ''),
-                            row.get('Category', ''),
-                            row.get('Description', ''),
-                            float(row.get('Amount', 0)),
-                            row.get('Type', ''),
-                            row.get('Tags', '')
-                        ))
-                        imported_count += 1
-                    
-                    self.conn.commit()
-                    self.load_transactions()
-                    self.update_dashboard()
-                    messagebox.showinfo("Success", f"Imported {imported_count} transactions")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to import CSV: {str(e)}")
+            # Large files are split across processes for parsing
+            if os.path.getsize(filename) >= PARALLEL_IMPORT_MIN_BYTES:
+                self.start_import(import_file_parallel, filename)
+            else:
+                self.start_import(import_csv_file, filename)
+    
+    def start_import(self, import_func, filename):
+        """Run an import function on a background thread"""
+        self.import_progress['value'] = 0
+        self.import_status.config(text="Importing...")
+        self.import_task = BackgroundTask(
+            self.root, import_func, DATABASE_FILE, filename,
+            on_progress=self.show_import_progress,
+            on_done=self.finish_import,
+            on_error=self.fail_import
+        )
+    
+    def show_import_progress(self, done, total, imported, failed):
+        """Update the import progress bar and counters"""
+        self.import_progress['value'] = done * 100 / total if total else 100
+        self.import_status.config(text=f"{imported} imported, {failed} skipped")
+    
+    def finish_import(self, report):
+        """Refresh views and summarize a finished import"""
+        self.import_task = None
+        self.import_progress['value'] = 100
+        self.import_status.config(text=f"{report.imported} imported, {report.failed} skipped")
+        self.load_data()
+        
+        message = f"Imported {report.imported} transactions"
+        if report.budgets:
+            message += f" and {report.budgets} budgets"
+        if report.failed:
+            details = '\n'.join(f"{line}: {error}" for line, error in report.errors[:5])
+            message += f"\n\nSkipped {report.failed} invalid rows:\n{details}"
+        messagebox.showinfo("Success", message)
+    
+    def fail_import(self, error):
+        """Report an import that stopped part way"""
+        self.import_task = None
+        self.import_status.config(text="Import failed")
+        
+        # Batches committed before the failure are kept
+        self.load_data()
+        messagebox.showerror("Error", f"Failed to import: {str(error)}")
     
     def import_json(self):
-        """Import data from JSON"""
-        try:
-            filename = filedialog.askopenfilename(
-                filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
-            )
+        """Import data from JSON or NDJSON in the background"""
+        if self.import_task is not None:
+            messagebox.showwarning("Warning", "An import is already running")
+            return
+        
+        filename = filedialog.askopenfilename(
+            filetypes=[("JSON files", "*.json"), ("NDJSON files", "*.ndjson *.jsonl"), 
+                       ("All files", "*.*")]
+        )
+        
+        if filename:
+            from finance_tracker.importer import (PARALLEL_IMPORT_MIN_BYTES, import_json_file,
+                                                  import_file_parallel)
             
-            if filename:
-                with open(filename, 'r', encoding='utf-8') as jsonfile:
-                    data = json.load(jsonfile)
-                
-                imported_trans = 0
-                imported_budgets = 0
-                
-                # Import transactions
-                if 'transactions' in data:
-                    for trans in data['transactions']:
-                        if all([trans.get('date'), trans.get('category'), 
-                               trans.get('amount'), trans.get('type')]):
-                            self.cursor.execute('''
-                                INSERT INTO transactions (date, category, description, amount, type, tags)
-                                VALUES (?, ?, ?, ?, ?, ?)
-                            ''', (
-                                trans.get('date', ''),
-                                trans.get('category', ''),
-                                trans.get('description', ''),
-                                float(trans.get('amount', 0)),
-                                trans.get('type', ''),
-                                trans.get('tags', '')
-                            ))
-                            imported_trans += 1
-                
-                # Import budgets
-                if 'budgets' in data:
-                    for budget in data['budgets']:
-                        if all([budget.get('category'), budget.get('amount'), budget.get('period')]):
-                            self.cursor.execute('''
-                                INSERT OR REPLACE INTO budgets (category, amount, period)
-                                VALUES (?, ?, ?)
-                            ''', (
-                                budget.get('category', ''),
-                                float(budget.get('amount', 0)),
-                                budget.get('period', '')
-                            ))
-                            imported_budgets += 1
-                
-                self.conn.commit()
-                self.load_transactions()
-                self.load_budgets()
-                self.update_dashboard()
-                messagebox.showinfo("Success", 
-                                  f"Imported {imported_trans} transactions and {imported_budgets} budgets")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to import JSON: {str(e)}")
+            # NDJSON is line oriented, so it can be split for parallel parsing
+            if filename.lower().endswith(('.ndjson', '.jsonl')):
+                workers = None if os.path.getsize(filename) >= PARALLEL_IMPORT_MIN_BYTES else 1
+                self.start_import(functools.partial(import_file_parallel, workers=workers), filename)
+            else:
+                self.start_import(import_json_file, filename)
     
     def create_backup(self):
-        """Create database backup"""
-        try:
-            filename = filedialog.asksaveasfilename(
-                defaultextension=".db",
-                filetypes=[("Database files", "*.db"), ("All files", "*.*")]
+        """Back up the database in the background"""
+        if self.backup_task is not None:
+            messagebox.showwarning("Warning", "A backup or restore is already running")
+            return
+        
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".db",
+            filetypes=[("Database files", "*.db"), ("All files", "*.*")]
+        )
+        
+        if filename:
+            from finance_tracker.backup import backup_database
+            
+            self.backup_progress['value'] = 0
+            self.backup_status.config(text="Backing up...")
+            self.backup_task = BackgroundTask(
+                self.root, backup_database, DATABASE_FILE, filename,
+                on_progress=self.show_backup_progress,
+                on_done=self.finish_backup,
+                on_error=lambda e: self.fail_backup(f"Failed to create backup: {str(e)}")
             )
+    
+    def create_differential_backup(self):
+        """Back up only what changed since an earlier backup, in the background"""
+        if self.backup_task is not None:
+            messagebox.showwarning("Warning", "A backup or restore is already running")
+            return
+        
+        base = filedialog.askopenfilename(
+            title="Choose the backup to build on",
+            filetypes=[("Database files", "*.db"), ("All files", "*.*")]
+        )
+        if not base:
+            return
+        
+        filename = filedialog.asksaveasfilename(
+            title="Save differential backup",
+            defaultextension=".db",
+            filetypes=[("Database files", "*.db"), ("All files", "*.*")]
+        )
+        
+        if filename:
+            from finance_tracker.backup import backup_differential
             
-            if filename:
-                # Create backup by copying database
-                backup_conn = sqlite3.connect(filename)
-                self.conn.backup(backup_conn)
-                backup_conn.close()
-                messagebox.showinfo("Success", f"Backup created: {filename}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to create backup: {str(e)}")
+            self.backup_progress['value'] = 0
+            self.backup_status.config(text="Backing up changes...")
+            self.backup_task = BackgroundTask(
+                self.root, backup_differential, DATABASE_FILE, base, filename,
+                on_progress=self.show_backup_progress,
+                on_done=self.finish_backup,
+                on_error=lambda e: self.fail_backup(f"Failed to create backup: {str(e)}")
+            )
+    
+    def show_backup_progress(self, done, total):
+        """Update the backup progress bar"""
+        self.backup_progress['value'] = done * 100 / total if total else 100
+    
+    def finish_backup(self, filename):
+        """Report a finished backup"""
+        self.backup_task = None
+        self.backup_progress['value'] = 100
+        self.backup_status.config(text="Backup complete")
+        messagebox.showinfo("Success", f"Backup created: {filename}")
+    
+    def fail_backup(self, message):
+        """Report a backup or restore that did not complete"""
+        self.backup_task = None
+        self.backup_status.config(text="Failed")
+        messagebox.showerror("Error", message)
     
     def restore_backup(self):
         """Restore from database backup"""
+        if self.backup_task is not None:
+            messagebox.showwarning("Warning", "A backup or restore is already running")
+            return
+        # Each of these holds a connection of its own to the database
+        if any(task is not None for task in (self.import_task, self.export_task,
+                                             self.archive_task)):
+            messagebox.showwarning("Warning", "Wait for the running import, export or "
+                                              "archive to finish before restoring")
+            return
+        
+        # A full backup, optionally with differential backups taken after it
+        filenames = filedialog.askopenfilenames(
+            title="Choose a backup and any differential backups of it",
+            filetypes=[("Database files", "*.db"), ("All files", "*.*")]
+        )
+        if not filenames:
+            return
+        
+        from finance_tracker.backup import plan_restore, prepare_restore
+        
         try:
-            filename = filedialog.askopenfilename(
-                filetypes=[("Database files", "*.db"), ("All files", "*.*")]
+            base, diffs = plan_restore(filenames)
+        except (ValueError, sqlite3.Error) as e:
+            messagebox.showerror("Error", f"Failed to restore backup: {str(e)}")
+            return
+        
+        if messagebox.askyesno("Confirm", 
+                               "This will replace all current data. Are you sure?"):
+            # The backup is verified and staged while the app stays usable;
+            # only the final swap below pauses it
+            self.backup_progress['value'] = 0
+            self.backup_status.config(text="Preparing restore...")
+            self.backup_task = BackgroundTask(
+                self.root, functools.partial(prepare_restore, diffs=diffs),
+                base, DATABASE_FILE,
+                on_progress=self.show_backup_progress,
+                on_done=self.finish_restore,
+                on_error=lambda e: self.fail_backup(f"Failed to restore backup: {str(e)}")
             )
-            
-            if filename:
-                if messagebox.askyesno("Confirm", 
-                                     "This will replace all current data. Are you sure?"):
-                    self.conn.close()
-                    
-                    # Replace current database with backup
-                    import shutil
-                    shutil.copy2(filename, 'finance_tracker.db')
-                    
-                    # Reconnect to database
-                    self.conn = sqlite3.connect('finance_tracker.db')
-                    self.cursor = self.conn.cursor()
-                    
-                    # Refresh all data
-                    self.load_data()
-                    messagebox.showinfo("Success", "Database restored successfully")
+    
+    def finish_restore(self, staged):
+        """Swap the staged restore in and reconnect"""
+        from finance_tracker.backup import restore_database
+        
+        self.backup_task = None
+        self.worker.close()
+        if self.chart_worker is not None:
+            self.chart_worker.close()
+        self.connections.close()
+        
+        error = None
+        try:
+            restore_database(staged, DATABASE_FILE)
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to restore backup: {str(e)}")
+            error = e
+        
+        # Reconnect to whichever database is now in place
+        self.connections = ConnectionManager(DATABASE_FILE)
+        self.conn = self.connections.writer
+        self.cursor = self.conn.cursor()
+        self.worker = QueryWorker(self.connections, self.root)
+        if self.chart_worker is not None:
+            self.chart_worker = QueryWorker(self.connections, self.root, name='Chart worker')
+        
+        if error is not None:
+            # The current database stayed in place, so the loaded data still holds
+            self.fail_backup(f"Failed to restore backup: {str(error)}")
+            return
+        
+        # Refresh all data
+        self.load_data()
+        self.backup_progress['value'] = 100
+        self.backup_status.config(text="Restore complete")
+        messagebox.showinfo("Success", "Database restored successfully")
+    
+    def rebuild_summaries(self):
+        """Recompute the monthly rollups used by the dashboard and charts"""
+        try:
+            rebuild_rollups(self.conn)
+            self.update_dashboard()
+            messagebox.showinfo("Success", "Monthly summaries rebuilt")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to rebuild summaries: {str(e)}")
     
+    def archive_years(self):
+        """Move years before this one out to archive files in the background"""
+        if self.archive_task is not None:
+            messagebox.showwarning("Warning", "Archiving is already running")
+            return
+        if not messagebox.askyesno(
+                "Archive Closed Years",
+                "Move transactions from before this year into a read-only file per year? "
+                "Totals, charts, exports and the transactions list still include them, "
+                "but they can no longer be edited. Take a new full backup afterwards."):
+            return
+        
+        from finance_tracker.archive import archive_closed_years
+        
+        self.archive_status.config(text="Archiving...")
+        self.archive_task = BackgroundTask(
+            self.root, archive_closed_years, DATABASE_FILE,
+            on_progress=lambda done, total: self.archive_status.config(
+                text=f"{done} of {total} years"),
+            on_done=self.finish_archive,
+            on_error=self.fail_archive
+        )
+    
+    def finish_archive(self, moved):
+        """Report archived years and reload views of the live file"""
+        self.archive_task = None
+        self.archive_status.config(text=f"{len(moved)} years archived")
+        self.load_data()
+        if moved:
+            years = ', '.join(str(year) for year in moved)
+            messagebox.showinfo("Success", f"Archived {sum(moved.values())} transactions "
+                                           f"from {years}")
+        else:
+            messagebox.showinfo("Success", "No closed years left to archive")
+    
+    def fail_archive(self, error):
+        """Report archiving that stopped part way; finished years stay archived"""
+        self.archive_task = None
+        self.archive_status.config(text="Archiving failed")
+        self.load_data()
+        messagebox.showerror("Error", f"Failed to archive: {str(error)}")
+    
+    @perf.timed('load_data')
     def load_data(self):
         """Load all data and refresh displays"""
-        self.load_transactions()
-        self.load_budgets()
+        self.budget_engine.invalidate()
+        self.balance_index.invalidate()
+        if self.columns is not None:
+            self.columns.invalidate()
+        
+        # Tabs not built yet load their data when they are
+        if hasattr(self, 'trans_tree'):
+            self.load_transactions()
+        if hasattr(self, 'budget_tree'):
+            self.load_budgets()
         self.update_dashboard()
     
+    @perf.timed('update_dashboard')
     def update_dashboard(self):
         """Update dashboard statistics"""
-        try:
-            # Calculate total balance
-            self.cursor.execute('''
-                SELECT 
-                    SUM(CASE WHEN type = 'Income' THEN amount ELSE 0 END) - 
-                    SUM(CASE WHEN type = 'Expense' THEN amount ELSE 0 END) as balance
-                FROM transactions
-            ''')
-            balance = self.cursor.fetchone()[0] or 0
-            
-            # Calculate monthly income
-            current_month = datetime.now().strftime('%Y-%m')
-            self.cursor.execute('''
-                SELECT SUM(amount) FROM transactions 
-                WHERE type = 'Income' AND strftime('%Y-%m', date) = ?
-            ''', (current_month,))
-            monthly_income = self.cursor.fetchone()[0] or 0
-            
-            # Calculate monthly expenses
-            self.cursor.execute('''
-                SELECT SUM(amount) FROM transactions 
-                WHERE type = 'Expense' AND strftime('%Y-%m', date) = ?
-            ''', (current_month,))
-            monthly_expenses = self.cursor.fetchone()[0] or 0
-            
-            # Calculate savings rate
-            savings_rate = ((monthly_income - monthly_expenses) / monthly_income * 100) if monthly_income > 0 else 0
-            
-            # Update dashboard labels
-            if hasattr(self, 'total_balance_label'):
-                self.total_balance_label.config(text=f"${balance:.2f}")
-            if hasattr(self, 'monthly_income_label'):
-                self.monthly_income_label.config(text=f"${monthly_income:.2f}")
-            if hasattr(self, 'monthly_expenses_label'):
-                self.monthly_expenses_label.config(text=f"${monthly_expenses:.2f}")
-            if hasattr(self, 'savings_rate_label'):
-                self.savings_rate_label.config(text=f"{savings_rate:.1f}%")
-                
-        except Exception as e:
-            print(f"Error updating dashboard: {e}")
+        self.dashboard_stats = None
+        self.worker.cancel('recent')
+        self.worker.submit('dashboard', fetch_dashboard_stats, self.show_dashboard)
+    
+    def show_dashboard(self, stats):
+        """Show dashboard statistics"""
+        self.startup.mark('dashboard_data')
+        self.dashboard_stats = stats
+        balance = stats['balance_cents'] / 100
+        monthly_income = stats['monthly_income_cents'] / 100
+        monthly_expenses = stats['monthly_expenses_cents'] / 100
+        
+        # Calculate savings rate
+        savings_rate = ((monthly_income - monthly_expenses) / monthly_income * 100) if monthly_income > 0 else 0
+        
+        # Update dashboard labels
+        if hasattr(self, 'total_balance_label'):
+            self.total_balance_label.config(text=f"${balance:.2f}")
+        if hasattr(self, 'monthly_income_label'):
+            self.monthly_income_label.config(text=f"${monthly_income:.2f}")
+        if hasattr(self, 'monthly_expenses_label'):
+            self.monthly_expenses_label.config(text=f"${monthly_expenses:.2f}")
+        if hasattr(self, 'savings_rate_label'):
+            self.savings_rate_label.config(text=f"{savings_rate:.1f}%")
+        
+        self.update_recent_transactions(stats['recent'])
+    
+    def show_recent_transactions(self, recent):
+        """Show a re-fetched recent transactions list"""
+        if self.dashboard_stats is not None:
+            self.dashboard_stats['recent'] = recent
+        self.update_recent_transactions(recent)
     
     def run(self):
         """Start the application"""
@@ -970,18 +1682,39 @@ class FinanceTracker:
     def on_closing(self):
         """Handle application closing"""
         if messagebox.askokcancel("Quit", "Do you want to quit?"):
-            self.conn.close()
-            self.root.destroy()
+            self.close()
+    
+    def close(self):
+        """Stop background work and close the window"""
+        self.worker.close()
+        if self.chart_worker is not None:
+            self.chart_worker.close()
+        self.connections.close()
+        self.root.destroy()
 
 if __name__ == "__main__":
-    # Install required packages reminder
-    try:
-        import matplotlib.pyplot as plt
-        import numpy as np
-    except ImportError:
+    # Install required packages reminder; checked without importing them
+    missing = [name for name in ('matplotlib', 'numpy') if importlib.util.find_spec(name) is None]
+    if missing:
         print("Required packages not installed. Please run:")
         print("pip install matplotlib numpy")
         exit(1)
     
-    app = FinanceTracker()
+    parser = argparse.ArgumentParser(description="Personal Finance Tracker Pro")
+    parser.add_argument('--startup-report', metavar='FILE',
+                        help="append startup timings as a JSON line to FILE ('-' for stderr)")
+    parser.add_argument('--quit-after-startup', action='store_true',
+                        help="exit once startup completes, for timing runs")
+    parser.add_argument('--perf', action='store_true',
+                        help="time queries and refreshes, log slow queries to stderr "
+                             "and show a Performance tab")
+    parser.add_argument('--slow-query-ms', type=float, default=perf.SLOW_QUERY_MS,
+                        help=f"slow query threshold for --perf (default: {perf.SLOW_QUERY_MS})")
+    args = parser.parse_args()
+    
+    # Before the database is opened, so every connection is timed
+    if args.perf:
+        perf.enable(args.slow_query_ms, slow_log=sys.stderr)
+    
+    app = FinanceTracker(args.startup_report, args.quit_after_startup)
     app.run()
@@ -0,0 +1 @@
+"""Headless benchmarks of the app's hot paths on generated data"""
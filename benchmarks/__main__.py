@@ -0,0 +1,109 @@
+"""Run the benchmarks and compare results across commits.
+
+    python -m benchmarks run [--rows 10k 100k 1M] [--repeat N] [--cases NAME ...]
+                             [--output FILE] [--workdir DIR] [--no-memory]
+    python -m benchmarks compare BASE NEW [--threshold 1.2]
+    python -m benchmarks list
+
+Generated databases are cached in the work directory, so only the first
+run at a size pays for building it.
+"""
+import argparse
+import json
+import sys
+
+from .suite import CASES, compare, default_workdir, run_suite
+
+
+def parse_count(text):
+    """Parse a row count like 10000, 10k or 2M"""
+    multiplier = {'k': 1000, 'm': 1000000}.get(text[-1:].lower(), 1)
+    try:
+        count = int(float(text[:-1] if multiplier > 1 else text) * multiplier)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a row count like 10k, got {text!r}")
+    if count < 1:
+        raise argparse.ArgumentTypeError("row count must be positive")
+    return count
+
+
+def cmd_run(args):
+    unknown = [name for name in args.cases or () if name not in CASES]
+    if unknown:
+        print(f"Unknown case {unknown[0]!r}; see `python -m benchmarks list`", file=sys.stderr)
+        return 2
+    
+    def log(message):
+        print(message, file=sys.stderr, flush=True)
+    
+    report = run_suite(args.rows, args.cases, repeat=args.repeat, seed=args.seed,
+                       workdir=args.workdir, memory=not args.no_memory, log=log)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 0
+
+
+def cmd_compare(args):
+    with open(args.base, encoding='utf-8') as f:
+        base = json.load(f)
+    with open(args.new, encoding='utf-8') as f:
+        new = json.load(f)
+    
+    print(f"{base['meta'].get('commit')} -> {new['meta'].get('commit')}")
+    regressions = 0
+    for rows, name, metric, before, after, ratio, regressed in compare(base, new, args.threshold):
+        regressions += regressed
+        print(f"{rows:>9} {name:26} {metric:8} {before:12.3f} {after:12.3f} "
+              f"{ratio:6.2f}x{'  REGRESSION' if regressed else ''}")
+    return 1 if regressions else 0
+
+
+def cmd_list(args):
+    for name, (_, _, heavy) in CASES.items():
+        print(f"{name}{'  (heavy)' if heavy else ''}")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='benchmarks',
+                                     description="Benchmark the finance tracker's hot paths")
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    command = commands.add_parser('run', help="run cases and print JSON results")
+    command.add_argument('--rows', nargs='+', type=parse_count, default=[10000, 100000],
+                         help="database sizes, e.g. 10k 1M (default: 10k 100k)")
+    command.add_argument('--repeat', type=int, default=20,
+                         help="timed runs per case; imports and exports run at most 3 (default: 20)")
+    command.add_argument('--cases', nargs='+', metavar='NAME', help="cases to run (default: all)")
+    command.add_argument('--seed', type=int, default=0, help="data generator seed (default: 0)")
+    command.add_argument('--workdir', default=default_workdir(),
+                         help="where generated databases are cached (default: %(default)s)")
+    command.add_argument('--output', help="write JSON here instead of to stdout")
+    command.add_argument('--no-memory', action='store_true',
+                         help="skip the extra traced run measuring peak memory")
+    command.set_defaults(func=cmd_run)
+    
+    command = commands.add_parser('compare', help="compare two result files")
+    command.add_argument('base', help="earlier results")
+    command.add_argument('new', help="later results")
+    command.add_argument('--threshold', type=float, default=1.2,
+                         help="slowdown ratio reported as a regression (default: 1.2)")
+    command.set_defaults(func=cmd_compare)
+    
+    command = commands.add_parser('list', help="list benchmark cases")
+    command.set_defaults(func=cmd_list)
+    
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""Deterministic synthetic data for the benchmarks"""
+import os
+import random
+from contextlib import closing
+from datetime import date, timedelta
+
+from finance_tracker.db import BUDGET_PERIODS, connect, migrate_database
+from finance_tracker.importer import insert_batch, upsert_budgets
+from finance_tracker.transactions import storage_row
+
+
+# Bump when the generated data changes, so cached databases are rebuilt
+GENERATOR_VERSION = 1
+
+# Last day covered by generated data; fixed so runs are comparable
+END_DATE = date(2024, 12, 31)
+
+# Expense category -> (share of expenses, typical amount, merchants)
+EXPENSES = {
+    'Food': (0.30, 28.0, ['Grocer', 'Bakery', 'Pizzeria', 'Cafe', 'Market', 'Sushi Bar']),
+    'Transportation': (0.15, 35.0, ['Fuel Station', 'Metro', 'Taxi', 'Parking', 'Airline']),
+    'Entertainment': (0.10, 45.0, ['Cinema', 'Concert Hall', 'Streaming', 'Bookshop']),
+    'Utilities': (0.08, 90.0, ['Power Co', 'Water Board', 'Internet', 'Mobile']),
+    'Healthcare': (0.05, 70.0, ['Pharmacy', 'Dentist', 'Clinic', 'Optician']),
+    'Shopping': (0.20, 60.0, ['Department Store', 'Electronics', 'Clothing', 'Hardware']),
+    'Investment': (0.04, 400.0, ['Broker', 'Pension Fund', 'Savings']),
+    'Other': (0.08, 40.0, ['Gift', 'Charity', 'Post Office', 'Fees']),
+}
+INCOME_SOURCES = ['Salary', 'Freelance', 'Dividends', 'Refund', 'Interest']
+
+# Most tagged transactions use a handful of common tags
+TAGS = ['work', 'family', 'travel', 'recurring', 'weekend', 'online', 'cash', 'gift',
+        'business', 'holiday', 'kids', 'health', 'home', 'car', 'pets', 'subscription']
+TAG_WEIGHTS = [1 / rank for rank in range(1, len(TAGS) + 1)]
+
+
+def generate_rows(count, seed=0, years=5):
+    """Yield count (date, category, description, amount, type, tags)
+    transactions spread over the years before END_DATE"""
+    rng = random.Random(seed)
+    days = years * 365
+    categories = list(EXPENSES)
+    weights = [share for share, _, _ in EXPENSES.values()]
+    
+    for _ in range(count):
+        day = (END_DATE - timedelta(days=rng.randrange(days))).isoformat()
+        
+        if rng.random() < 0.1:
+            category, trans_type = 'Income', 'Income'
+            description = rng.choice(INCOME_SOURCES)
+            amount = round(rng.lognormvariate(7, 0.6), 2)
+        else:
+            category = rng.choices(categories, weights)[0]
+            trans_type = 'Expense'
+            _, typical, merchants = EXPENSES[category]
+            description = f'{rng.choice(merchants)} #{rng.randrange(1000)}'
+            amount = round(typical * rng.lognormvariate(0, 0.7), 2)
+        
+        tag_count = rng.choices((0, 1, 2, 3), (50, 30, 15, 5))[0]
+        tags = ','.join(sorted(set(rng.choices(TAGS, TAG_WEIGHTS, k=tag_count))))
+        yield (day, category, description, amount, trans_type, tags)
+
+
+def generate_budgets(seed=0):
+    """Return (category, amount, period, anchor) budgets for every expense category"""
+    rng = random.Random(seed)
+    budgets = []
+    for category, (share, typical, _) in EXPENSES.items():
+        period = rng.choice(BUDGET_PERIODS)
+        monthly = round(typical * share * 120, -1)
+        amount = {'Monthly': monthly, 'Weekly': round(monthly / 4, -1),
+                  'Yearly': monthly * 12}[period]
+        budgets.append((category, amount, period, None))
+    return budgets
+
+
+def build_database(path, count, seed=0, batch_size=10000, progress=None):
+    """Create a database of count generated transactions plus budgets"""
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    
+    with closing(connect(path)) as conn:
+        migrate_database(conn)
+        batch = []
+        written = 0
+        for row in generate_rows(count, seed):
+            batch.append(storage_row(row))
+            if len(batch) >= batch_size:
+                insert_batch(conn, batch)
+                written += len(batch)
+                batch = []
+                if progress is not None:
+                    progress(written, count)
+        if batch:
+            insert_batch(conn, batch)
+        upsert_budgets(conn, generate_budgets(seed))
+        conn.execute('PRAGMA optimize')
+    return path
+
+
+def cached_database(workdir, count, seed=0, progress=None):
+    """Path of a generated database, building it only if not already cached"""
+    os.makedirs(workdir, exist_ok=True)
+    path = os.path.join(workdir, f'bench-v{GENERATOR_VERSION}-{count}-{seed}.db')
+    if not os.path.exists(path):
+        partial = path + '.partial'
+        build_database(partial, count, seed, progress=progress)
+        os.replace(partial, path)
+    else:
+        # Bring a database cached by older code up to the current schema
+        with closing(connect(path)) as conn:
+            migrate_database(conn)
+    return path
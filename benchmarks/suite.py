@@ -0,0 +1,381 @@
+"""Benchmark cases for the app's hot paths, run headlessly.
+
+Each case times the finance_tracker call behind one GUI action on a
+generated database. Latencies are reported as percentiles over repeated
+runs after one warm-up, and peak memory as the Python heap high-water
+mark (tracemalloc) of one extra run; SQLite's own cache and the worker
+processes of parallel imports are not included in it.
+"""
+import itertools
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import time
+import tracemalloc
+from contextlib import closing
+from datetime import datetime
+
+from finance_tracker.analytics import TransactionColumns
+from finance_tracker.balances import BalanceIndex
+from finance_tracker.budgets import BudgetEngine
+from finance_tracker.charts import CHART_DRAWERS, CHART_TYPES, ChartRenderer
+from finance_tracker.db import connect, migrate_database
+from finance_tracker.perf import percentile
+from finance_tracker.rollups import fetch_dashboard_stats
+from finance_tracker.transactions import TransactionPager
+
+from .generate import END_DATE, GENERATOR_VERSION, TAGS, cached_database
+
+
+# Bumped when the result format or the meaning of a case changes
+RESULT_FORMAT = 1
+
+# Runs of cases marked heavy (imports and exports) are capped at this
+HEAVY_REPEAT = 3
+
+# Search terms the search case cycles through, as typed in the search box
+SEARCH_TERMS = ['grocer', 'taxi', 'pharm', 'sushi bar', 'salary', 'cinema 12']
+
+CHART_SIZE = (1000, 600)
+
+# Case name -> (run, setup, heavy). setup(context) prepares each run
+# untimed and its result is passed to run(context, state).
+CASES = {}
+
+
+def case(name, setup=None, heavy=False):
+    """Register a benchmark case"""
+    def register(run):
+        CASES[name] = (run, setup, heavy)
+        return run
+    return register
+
+
+class BenchContext:
+    """A generated database plus the state cases share: a read-only
+    connection like the app's query worker, and files made on demand"""
+    
+    def __init__(self, database, workdir):
+        self.database = database
+        self.workdir = workdir
+        self.conn = connect(database, readonly=True)
+        self.cursor = self.conn.cursor()
+        self.search_terms = itertools.cycle(SEARCH_TERMS)
+        self.tags = itertools.cycle(TAGS)
+        self.columns = None
+        self.renderer = None
+        self.balances = None
+        self.files = {}
+    
+    def path(self, name):
+        """Scratch file in the work directory, named after the database"""
+        stem = os.path.splitext(os.path.basename(self.database))[0]
+        return os.path.join(self.workdir, f'{stem}-{name}')
+    
+    def export_file(self, extension):
+        """An export of the database to import from, made once"""
+        if extension not in self.files:
+            from finance_tracker.exporter import export_csv_file, export_json_file
+            
+            path = self.path(f'input.{extension}')
+            if not os.path.exists(path):
+                export = export_csv_file if extension == 'csv' else export_json_file
+                export(self.database, path + '.partial')
+                os.replace(path + '.partial', path)
+            self.files[extension] = path
+        return self.files[extension]
+    
+    def close(self):
+        self.conn.close()
+
+
+# Transactions tab
+
+@case('load_transactions')
+def load_transactions(context, state):
+    pager = TransactionPager()
+    TransactionPager.fetch_page(context.cursor, pager.page_query())
+
+
+@case('scroll_transactions')
+def scroll_transactions(context, state):
+    # 20 pages of keyset pagination from the top, as when dragging the bar
+    pager = TransactionPager()
+    key = None
+    for _ in range(20):
+        rows = TransactionPager.fetch_page(context.cursor, pager.page_query(key))
+        if not rows:
+            break
+        key = rows[-1][1]
+
+
+def next_search(context):
+    pager = TransactionPager()
+    pager.set_filters(next(context.search_terms))
+    return pager
+
+
+@case('search_transactions', setup=next_search)
+def search_transactions(context, pager):
+    TransactionPager.fetch_page(context.cursor, pager.page_query())
+
+
+def next_tag_filter(context):
+    pager = TransactionPager()
+    pager.set_filters(tag=next(context.tags))
+    return pager
+
+
+@case('filter_by_tag', setup=next_tag_filter)
+def filter_by_tag(context, pager):
+    TransactionPager.fetch_page(context.cursor, pager.page_query())
+
+
+def next_balance_page(context):
+    pager = TransactionPager()
+    page = TransactionPager.fetch_page(context.cursor, pager.page_query())
+    return [trans[0] for trans, _ in page]
+
+
+@case('running_balances', setup=next_balance_page)
+def running_balances(context, ids):
+    # The Balance column of a first page, on a loaded index
+    if context.balances is None:
+        context.balances = BalanceIndex()
+    context.balances.running_balances(context.cursor, ids)
+
+
+# Dashboard and budgets
+
+@case('update_dashboard')
+def update_dashboard(context, state):
+    fetch_dashboard_stats(context.cursor)
+
+
+@case('load_budgets')
+def load_budgets(context, state):
+    # A new engine each run, so nothing is served from its cache
+    BudgetEngine().evaluate(context.cursor, today=END_DATE)
+
+
+@case('forecast_budgets')
+def forecast_budgets(context, state):
+    # The projections behind the Budget tab's warnings
+    from finance_tracker.forecast import forecast_spend
+    budgets = BudgetEngine().evaluate(context.cursor, today=END_DATE)
+    forecast_spend(context.cursor, END_DATE).project(budgets, END_DATE)
+
+
+# Analytics
+
+@case('build_analytics', setup=lambda context: TransactionColumns())
+def build_analytics(context, columns):
+    # What the first chart after startup or an import pays
+    columns.chart_data(context.cursor, 'Income vs Expenses')
+
+
+def chart_case(chart_type):
+    """Register a case querying and rasterizing one chart type"""
+    def run(context, state):
+        if context.renderer is None:
+            context.columns = TransactionColumns()
+            context.renderer = ChartRenderer()
+        
+        if chart_type == 'Budget Analysis':
+            data = BudgetEngine().evaluate(context.cursor, today=END_DATE)
+        elif chart_type == 'Balance Over Time':
+            # A new index each run, as after startup or an import
+            data = BalanceIndex().series(context.cursor)
+        else:
+            data = context.columns.chart_data(context.cursor, chart_type)
+        draw = CHART_DRAWERS[chart_type]
+        context.renderer.render(chart_type, CHART_SIZE, lambda ax: draw(ax, data))
+    
+    case('chart_' + chart_type.lower().replace(' ', '_'))(run)
+
+
+for _chart_type in CHART_TYPES:
+    chart_case(_chart_type)
+
+
+# Import and export
+
+def empty_database(context):
+    path = context.path('import.db')
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    with closing(connect(path)) as conn:
+        migrate_database(conn)
+    return path
+
+
+def csv_import(context):
+    context.export_file('csv')
+    return empty_database(context)
+
+
+def json_import(context):
+    context.export_file('json')
+    return empty_database(context)
+
+
+@case('import_csv', setup=csv_import, heavy=True)
+def import_csv(context, database):
+    from finance_tracker.importer import (PARALLEL_IMPORT_MIN_BYTES, import_csv_file,
+                                          import_file_parallel)
+    
+    # The same choice the app makes
+    path = context.export_file('csv')
+    if os.path.getsize(path) >= PARALLEL_IMPORT_MIN_BYTES:
+        import_file_parallel(database, path)
+    else:
+        import_csv_file(database, path)
+
+
+@case('import_json', setup=json_import, heavy=True)
+def import_json(context, database):
+    from finance_tracker.importer import import_json_file
+    import_json_file(database, context.export_file('json'))
+
+
+@case('export_csv', heavy=True)
+def export_csv(context, state):
+    from finance_tracker.exporter import export_csv_file
+    export_csv_file(context.database, context.path('output.csv'))
+
+
+@case('export_json', heavy=True)
+def export_json(context, state):
+    from finance_tracker.exporter import export_json_file
+    export_json_file(context.database, context.path('output.json'))
+
+
+# Running and reporting
+
+def summarize(timings):
+    """Latency statistics in milliseconds"""
+    ordered = sorted(seconds * 1000 for seconds in timings)
+    return {
+        'runs': len(ordered),
+        'min_ms': round(ordered[0], 3),
+        'p50_ms': round(percentile(ordered, 0.50), 3),
+        'p95_ms': round(percentile(ordered, 0.95), 3),
+        'p99_ms': round(percentile(ordered, 0.99), 3),
+        'max_ms': round(ordered[-1], 3),
+        'mean_ms': round(sum(ordered) / len(ordered), 3),
+    }
+
+
+def run_case(context, name, repeat, memory=True):
+    """Time one case, returning its summary"""
+    run, setup, heavy = CASES[name]
+    runs = min(repeat, HEAVY_REPEAT) if heavy else repeat
+    
+    timings = []
+    # Heavy cases skip the warm-up; one more import proves little
+    for index in range(runs if heavy else runs + 1):
+        state = setup(context) if setup else None
+        start = time.perf_counter()
+        run(context, state)
+        elapsed = time.perf_counter() - start
+        if heavy or index:
+            timings.append(elapsed)
+    result = summarize(timings)
+    
+    if memory:
+        state = setup(context) if setup else None
+        tracemalloc.start()
+        try:
+            run(context, state)
+            result['peak_kib'] = tracemalloc.get_traced_memory()[1] // 1024
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def run_suite(rows, names=None, repeat=20, seed=0, workdir=None, memory=True, log=None):
+    """Run cases against a generated database of each size in rows,
+    returning the JSON-ready report"""
+    names = names or list(CASES)
+    workdir = workdir or default_workdir()
+    report = {'format': RESULT_FORMAT, 'meta': environment(seed, repeat), 'sizes': []}
+    
+    for count in rows:
+        if log is not None:
+            log(f"{count} rows: preparing database")
+        database = cached_database(workdir, count, seed)
+        context = BenchContext(database, workdir)
+        try:
+            results = {}
+            for name in names:
+                results[name] = run_case(context, name, repeat, memory)
+                if log is not None:
+                    log(f"{count} rows: {name:26} p50 {results[name]['p50_ms']:10.3f} ms  "
+                        f"p95 {results[name]['p95_ms']:10.3f} ms")
+        finally:
+            context.close()
+        report['sizes'].append({'rows': count, 'results': results})
+    
+    report['meta']['max_rss_kib'] = max_rss_kib()
+    return report
+
+
+def default_workdir():
+    import tempfile
+    return os.path.join(tempfile.gettempdir(), 'finance_tracker_bench')
+
+
+def max_rss_kib():
+    """Process peak resident set size, where the platform reports it"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, KiB elsewhere
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def environment(seed, repeat):
+    """What a result depends on besides the code, for comparing runs"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    
+    return {
+        'commit': commit,
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'generator': GENERATOR_VERSION,
+        'seed': seed,
+        'repeat': repeat,
+    }
+
+
+def compare(base, new, threshold=1.2):
+    """Pair up the cases of two reports, returning (rows, case, metric,
+    before, after, ratio, regressed) for p50 latency and peak memory"""
+    rows = []
+    before = {(size['rows'], name): result
+              for size in base['sizes'] for name, result in size['results'].items()}
+    for size in new['sizes']:
+        for name, result in size['results'].items():
+            old = before.get((size['rows'], name))
+            if old is None:
+                continue
+            for metric in ('p50_ms', 'peak_kib'):
+                if metric not in result or metric not in old:
+                    continue
+                ratio = result[metric] / old[metric] if old[metric] else 1.0
+                rows.append((size['rows'], name, metric, old[metric], result[metric],
+                             ratio, ratio > threshold))
+    return rows
@@ -0,0 +1,15 @@
+"""Core of the finance tracker: storage, queries, budgets, import/export
+and charting, usable without a GUI.
+
+Only the standard library is loaded by importing the package. numpy is
+needed by finance_tracker.analytics, and matplotlib by
+finance_tracker.charts; both load when those modules are imported.
+"""
+from .db import (DATABASE_FILE, CATEGORIES, TRANSACTION_TYPES, BUDGET_PERIODS,
+                 BUDGET_ANCHOR_LIMITS, migrate_database)
+from .transactions import (TransactionDelta, TransactionPager, add_transaction_row,
+                           update_transaction_row, delete_transaction_row)
+from .rollups import rebuild_rollups, fetch_dashboard_stats
+from .budgets import BudgetEngine, BudgetStatus, budget_window
+from .balances import BalanceIndex
+from .archive import archive_year, history, history_select
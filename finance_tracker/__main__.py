@@ -0,0 +1,6 @@
+"""Allow `python -m finance_tracker`"""
+import sys
+
+from .cli import main
+
+sys.exit(main())
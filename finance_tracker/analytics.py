@@ -0,0 +1,325 @@
+"""Columnar in-memory analytics over the transactions table"""
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from .archive import history
+from .transactions import to_cents
+
+
+def split_tags(tags):
+    """Split a comma-separated tags field into distinct, trimmed names"""
+    names = []
+    for name in (tags or '').split(','):
+        name = name.strip()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+# Day number stored for dates SQLite cannot parse
+NO_DAY = -2 ** 31
+_EPOCH_ORDINAL = datetime(1970, 1, 1).toordinal()
+
+
+def day_number(date):
+    """Days since 1970-01-01 for an ISO date string, or NO_DAY"""
+    try:
+        return datetime.strptime(str(date)[:10], '%Y-%m-%d').toordinal() - _EPOCH_ORDINAL
+    except ValueError:
+        return NO_DAY
+
+
+def group_sum(keys, weights, size):
+    """Sum weights per integer key in [0, size), returning (sums, counts).
+    Dense key ranges use bincount; sparse ones sort and use reduceat."""
+    if size <= 4 * len(keys) + 1024:
+        return (np.bincount(keys, weights=weights, minlength=size),
+                np.bincount(keys, minlength=size))
+    
+    sums = np.zeros(size)
+    counts = np.zeros(size, dtype=np.int64)
+    if len(keys):
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        sums[keys[starts]] = np.add.reduceat(weights[order], starts)
+        counts[keys[starts]] = np.diff(np.r_[starts, len(keys)])
+    return sums, counts
+
+
+class TransactionColumns:
+    """Columnar in-memory copy of the transactions table for analytics.
+    
+    Dates are int32 day numbers, amounts int64 cents, and category, type
+    and tags dictionary-encoded int32 codes (tags as (row, code) pairs).
+    The columns are built from the database on first use, then kept
+    current by apply() with each write's TransactionDelta. Updates and
+    deletes leave dead rows behind a live mask until the next rebuild.
+    
+    Queries take a cursor so they can run on the QueryWorker thread.
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.built = False
+        self.building = False
+        self.pending = []
+        # Bumped by invalidate(), so a build that raced one is discarded
+        self.generation = 0
+        # Bumped by every change, for caches of query results
+        self.version = 0
+    
+    def invalidate(self):
+        """Drop the columns; the next query rebuilds them"""
+        with self.lock:
+            self.built = False
+            self.pending = []
+            self.generation += 1
+            self.version += 1
+    
+    def _build(self, cursor):
+        """Load every transaction; writes seen meanwhile are replayed"""
+        with self.lock:
+            if self.built or self.building:
+                return
+            self.building = True
+            self.pending = []
+            generation = self.generation
+        
+        try:
+            # Day numbers and cents come straight from their stored columns;
+            # archived years are included
+            cursor.execute(f'''
+                SELECT id, IFNULL(day, ?), category, type, amount_cents, tags
+                FROM {history(cursor.connection)}
+            ''', (NO_DAY,))
+            rows = cursor.fetchall()
+            count = len(rows)
+            capacity = max(1024, count * 5 // 4)
+            
+            columns = {
+                'ids': np.zeros(capacity, dtype=np.int64),
+                'days': np.zeros(capacity, dtype=np.int32),
+                'cents': np.zeros(capacity, dtype=np.int64),
+                'category_codes': np.zeros(capacity, dtype=np.int32),
+                'type_codes': np.zeros(capacity, dtype=np.int32),
+                'live': np.zeros(capacity, dtype=bool),
+            }
+            categories, types, tags = {}, {}, {}
+            tag_rows = tag_codes = np.zeros(0, dtype=np.int32)
+            tag_size = 0
+            
+            if rows:
+                ids, days, category_values, type_values, cents, tag_fields = zip(*rows)
+                columns['ids'][:count] = np.fromiter(ids, np.int64, count)
+                columns['days'][:count] = np.fromiter(days, np.int32, count)
+                columns['cents'][:count] = np.fromiter(cents, np.int64, count)
+                columns['category_codes'][:count] = self._encode_column(categories, category_values)
+                columns['type_codes'][:count] = self._encode_column(types, type_values)
+                columns['live'][:count] = True
+                
+                # Split each distinct tags field once, then expand per row
+                fields = {}
+                field_codes = self._encode_column(fields, tag_fields)
+                field_tags = [self._encode(tags, split_tags(field)) for field in fields]
+                lengths = np.array([len(codes) for codes in field_tags], dtype=np.int64)
+                starts = np.cumsum(lengths) - lengths
+                flat = np.array([code for codes in field_tags for code in codes], dtype=np.int32)
+                
+                row_lengths = lengths[field_codes]
+                tag_rows = np.repeat(np.arange(count, dtype=np.int32), row_lengths)
+                offsets = np.arange(len(tag_rows)) - np.repeat(np.cumsum(row_lengths) - row_lengths,
+                                                               row_lengths)
+                tag_codes = flat[np.repeat(starts[field_codes], row_lengths) + offsets]
+                tag_size = len(tag_rows)
+            
+            # Spare room for appended pairs, as for the row columns
+            tag_capacity = max(1024, tag_size * 5 // 4)
+            for name, pairs in zip(self.TAG_COLUMNS, (tag_rows, tag_codes)):
+                columns[name] = np.zeros(tag_capacity, dtype=np.int32)
+                columns[name][:tag_size] = pairs
+            
+            with self.lock:
+                if generation != self.generation:
+                    return
+                
+                for name, column in columns.items():
+                    setattr(self, name, column)
+                self.size = count
+                self.positions = dict(zip(columns['ids'][:count].tolist(), range(count)))
+                self.categories, self.types, self.tags = categories, types, tags
+                self.tag_size = tag_size
+                
+                self.built = True
+                for delta in self.pending:
+                    self._apply(delta)
+                self.pending = []
+        finally:
+            with self.lock:
+                self.building = False
+    
+    @staticmethod
+    def _encode(codes, values):
+        """Map values to dictionary codes, adding codes for new values"""
+        return [codes.setdefault(value, len(codes)) for value in values]
+    
+    @staticmethod
+    def _encode_column(codes, values):
+        """Dictionary-encode a whole column into an int32 array"""
+        for value in set(values):
+            codes.setdefault(value, len(codes))
+        return np.fromiter(map(codes.__getitem__, values), np.int32, len(values))
+    
+    def apply(self, delta):
+        """Apply one TransactionDelta"""
+        with self.lock:
+            if self.building:
+                self.pending.append(delta)
+            elif self.built:
+                self._apply(delta)
+            self.version += 1
+    
+    def _apply(self, delta):
+        # Replays may repeat a write the build already saw, so an update
+        # is always a removal (if present) plus an append
+        if delta.old is not None:
+            self._remove(delta.old[0])
+        if delta.new is not None:
+            self._remove(delta.new[0])
+            self._append(delta.new)
+    
+    def _remove(self, trans_id):
+        position = self.positions.pop(trans_id, None)
+        if position is not None:
+            self.live[position] = False
+    
+    def _append(self, row):
+        trans_id, date, category, description, amount, trans_type, tags = row
+        if self.size == len(self.ids):
+            self._grow(len(self.ids) * 2)
+        
+        position = self.size
+        self.ids[position] = trans_id
+        self.days[position] = day_number(date)
+        self.cents[position] = to_cents(amount)
+        self.category_codes[position] = self._encode(self.categories, [category])[0]
+        self.type_codes[position] = self._encode(self.types, [trans_type])[0]
+        self.live[position] = True
+        self.positions[trans_id] = position
+        self.size += 1
+        
+        names = split_tags(tags)
+        if names:
+            end = self.tag_size + len(names)
+            if end > len(self.tag_rows):
+                self._grow(max(len(self.tag_rows) * 2, end), self.TAG_COLUMNS)
+            self.tag_rows[self.tag_size:end] = position
+            self.tag_codes[self.tag_size:end] = self._encode(self.tags, names)
+            self.tag_size = end
+    
+    # Arrays indexed by row position, and those indexed by (row, tag) pair
+    ROW_COLUMNS = ('ids', 'days', 'cents', 'category_codes', 'type_codes', 'live')
+    TAG_COLUMNS = ('tag_rows', 'tag_codes')
+    
+    def _grow(self, capacity, names=ROW_COLUMNS):
+        for name in names:
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:len(column)] = column
+            setattr(self, name, grown)
+    
+    def _snapshot(self, cursor):
+        """Build if needed, then copy out the live rows of each column with
+        the code -> value lists for categories and types"""
+        self._build(cursor)
+        with self.lock:
+            if not self.built:
+                # Invalidated while building; the caller reloads anyway
+                empty = np.zeros(0, dtype=np.int32)
+                return empty, empty.astype(np.int64), empty, empty, [], []
+            
+            live = self.live[:self.size]
+            return (self.days[:self.size][live], self.cents[:self.size][live],
+                    self.category_codes[:self.size][live], self.type_codes[:self.size][live],
+                    self._names(self.categories), self._names(self.types))
+    
+    @staticmethod
+    def _names(codes):
+        """Dictionary code -> value lookup list"""
+        names = [None] * len(codes)
+        for value, code in codes.items():
+            names[code] = value
+        return names
+    
+    def expense_by_category(self, cursor):
+        """Return (category, total) expense rows ordered by category"""
+        days, cents, categories, types, category_names, type_names = self._snapshot(cursor)
+        
+        expense = type_names.index('Expense') if 'Expense' in type_names else -1
+        mask = types == expense
+        sums, counts = group_sum(categories[mask], cents[mask], len(category_names))
+        return sorted((category_names[code], sums[code] / 100) for code in np.flatnonzero(counts))
+    
+    def totals_by_type(self, cursor):
+        """Return (type, total) rows ordered by type"""
+        days, cents, categories, types, category_names, type_names = self._snapshot(cursor)
+        
+        sums, counts = group_sum(types, cents, len(type_names))
+        return sorted((type_names[code], sums[code] / 100) for code in np.flatnonzero(counts))
+    
+    def monthly_trends(self, cursor):
+        """Return (month, type, total) rows ordered by month, skipping
+        transactions without a valid date"""
+        days, cents, categories, types, category_names, type_names = self._snapshot(cursor)
+        
+        dated = days != NO_DAY
+        months = days[dated].astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+        if not len(months):
+            return []
+        
+        # One group per (month, type) pair
+        first = months.min()
+        width = len(type_names)
+        keys = (months - first) * width + types[dated]
+        sums, counts = group_sum(keys, cents[dated], int(months.max() - first + 1) * width)
+        
+        rows = []
+        for key in np.flatnonzero(counts):
+            month = np.datetime64(int(first + key // width), 'M')
+            rows.append((str(month), type_names[key % width], sums[key] / 100))
+        return sorted(rows)
+    
+    def spending_by_tag(self, cursor):
+        """Return (tag, total) expense rows, largest first"""
+        self._build(cursor)
+        with self.lock:
+            if not self.built:
+                return []
+            
+            # (row, code) pairs of live rows, with those rows' cents and types
+            tag_rows = self.tag_rows[:self.tag_size]
+            keep = self.live[tag_rows]
+            rows = tag_rows[keep]
+            codes = self.tag_codes[:self.tag_size][keep]
+            cents, types = self.cents[rows], self.type_codes[rows]
+            tag_names, type_names = self._names(self.tags), self._names(self.types)
+        
+        expense = type_names.index('Expense') if 'Expense' in type_names else -1
+        mask = types == expense
+        sums, counts = group_sum(codes[mask], cents[mask], len(tag_names))
+        return sorted(((tag_names[code], sums[code] / 100) for code in np.flatnonzero(counts)),
+                      key=lambda row: (-row[1], row[0]))
+    
+    # Chart type -> query producing the data it plots
+    CHART_QUERIES = {
+        'Expense by Category': expense_by_category,
+        'Income vs Expenses': totals_by_type,
+        'Monthly Trends': monthly_trends,
+        'Spending by Tag': spending_by_tag,
+    }
+    
+    def chart_data(self, cursor, chart_type):
+        """Run the query behind a chart type"""
+        return self.CHART_QUERIES[chart_type](self, cursor)
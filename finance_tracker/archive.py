@@ -0,0 +1,355 @@
+"""Closed years moved out to archive files, attached on demand.
+
+archive_year() moves a year's transactions from the database into a file
+of their own beside it, <name>-<year>.db, listed in the archives table.
+The monthly rollups and daily balances keep the archived totals, so the
+dashboard, rollup charts, forecasts and running balances still cover
+every year, while scans, backups and VACUUM only touch the live file.
+Each archive carries its own search, tag and sort indexes, so the
+transactions list pages through every year; archived rows are read-only.
+
+Queries over full history read from history(), which attaches just the
+archives a day range needs and names a temporary view over them and the
+live table. Archives are only read once written; back each one up once.
+"""
+import os
+import sqlite3
+from datetime import date
+
+from .balances import SIGNED_CENTS
+from .db import _TAG_NAME_SQL, _tags_json_sql, connect
+from .transactions import from_day, to_day
+
+
+# Columns an archive holds, in the order of the live table
+ARCHIVE_COLUMNS = 'id, date, category, description, amount, type, tags, amount_cents, day'
+
+# Tables and indexes of an archive file, for the queries history() serves
+# and the transactions list; the search and tag tables match the live ones
+ARCHIVE_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS {schema}.transactions (
+        id INTEGER PRIMARY KEY,
+        date TEXT NOT NULL,
+        category TEXT NOT NULL,
+        description TEXT,
+        amount REAL NOT NULL,
+        type TEXT NOT NULL,
+        tags TEXT,
+        amount_cents INTEGER NOT NULL,
+        day INTEGER NOT NULL
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS {schema}.idx_transactions_day ON transactions (day)',
+    'CREATE INDEX IF NOT EXISTS {schema}.idx_transactions_date ON transactions (date)',
+    '''
+    CREATE INDEX IF NOT EXISTS {schema}.idx_transactions_type_day
+        ON transactions (type, day, amount_cents)
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS {schema}.idx_transactions_category_type_day
+        ON transactions (category, type, day, amount_cents)
+    ''',
+    # (sort key, id) indexes as in migration 10, for keyset pages
+    '''
+    CREATE INDEX IF NOT EXISTS {schema}.idx_transactions_category_id
+        ON transactions (category, id)
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS {schema}.idx_transactions_description_id
+        ON transactions (IFNULL(description, ''), id)
+    ''',
+    'CREATE INDEX IF NOT EXISTS {schema}.idx_transactions_amount_id ON transactions (amount, id)',
+    'CREATE INDEX IF NOT EXISTS {schema}.idx_transactions_type_id ON transactions (type, id)',
+    '''
+    CREATE INDEX IF NOT EXISTS {schema}.idx_transactions_tags_id
+        ON transactions (IFNULL(tags, ''), id)
+    ''',
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS {schema}.transactions_fts USING fts5(
+        description, category, tags,
+        content='transactions', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS {schema}.tags (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS {schema}.transaction_tags (
+        tag_id INTEGER NOT NULL,
+        transaction_id INTEGER NOT NULL,
+        PRIMARY KEY (tag_id, transaction_id)
+    ) WITHOUT ROWID
+    ''',
+]
+
+# Rebuild an archive's search and tag tables from its transactions, which
+# has no triggers to keep them in step
+ARCHIVE_REINDEX = [
+    "INSERT INTO {schema}.transactions_fts (transactions_fts) VALUES ('rebuild')",
+    'DELETE FROM {schema}.transaction_tags',
+    'DELETE FROM {schema}.tags',
+    f'''
+    INSERT INTO {{schema}}.tags (name)
+    SELECT DISTINCT {_TAG_NAME_SQL}
+    FROM {{schema}}.transactions AS t, json_each({_tags_json_sql('t.tags')})
+    WHERE t.tags != '' AND {_TAG_NAME_SQL} != ''
+    ''',
+    f'''
+    INSERT INTO {{schema}}.transaction_tags (tag_id, transaction_id)
+    SELECT DISTINCT tags.id, t.id
+    FROM {{schema}}.transactions AS t, json_each({_tags_json_sql('t.tags')})
+    JOIN {{schema}}.tags AS tags ON tags.name = {_TAG_NAME_SQL}
+    WHERE t.tags != ''
+    ''',
+]
+
+# Name of the view history() keeps on each connection
+HISTORY_VIEW = 'all_transactions'
+
+
+def archive_path(database, year):
+    """Archive file of a year, beside the database"""
+    stem, extension = os.path.splitext(database)
+    return f'{stem}-{year}{extension or ".db"}'
+
+
+def year_days(year):
+    """[start, end) day numbers of a year"""
+    return to_day(f'{year:04d}-01-01'), to_day(f'{year + 1:04d}-01-01')
+
+
+def list_archives(cursor):
+    """Return (year, file, count) for every archived year, oldest first"""
+    cursor.execute('SELECT year, file, count FROM archives ORDER BY year')
+    return cursor.fetchall()
+
+
+def history(conn, start_day=None, end_day=None):
+    """Name of a table holding every transaction dated in [start_day,
+    end_day), either bound open.
+    
+    Without archives in range that is the live table. Otherwise the
+    archives needed are attached to conn, which must not be inside a
+    transaction, and a temporary view over them and the live table is
+    returned. Archives attached earlier stay attached and in the view.
+    """
+    archives = conn.execute('SELECT year, file FROM archives ORDER BY year').fetchall()
+    needed = []
+    for year, file in archives:
+        first, last = year_days(year)
+        if (start_day is None or start_day < last) and (end_day is None or end_day > first):
+            needed.append((year, file))
+    if not needed:
+        return 'transactions'
+    
+    attached = {name for _, name, _ in conn.execute('PRAGMA database_list')}
+    missing = [(year, file) for year, file in needed if f'archive_{year}' not in attached]
+    limit = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+    if len(attached) - 2 + len(missing) > limit:
+        raise ValueError(f"Reading {len(attached) - 2 + len(missing)} archived years at once "
+                         f"exceeds SQLite's limit of {limit} attached databases")
+    if missing:
+        directory = os.path.dirname(conn.execute('PRAGMA database_list').fetchone()[2])
+        for year, file in missing:
+            conn.execute(f'ATTACH DATABASE ? AS archive_{year}', (os.path.join(directory, file),))
+            attached.add(f'archive_{year}')
+    
+    sql = f'CREATE TEMP VIEW {HISTORY_VIEW} AS ' + _union(conn, ARCHIVE_COLUMNS)
+    current = conn.execute('SELECT sql FROM temp.sqlite_master WHERE name = ?',
+                           (HISTORY_VIEW,)).fetchone()
+    if current is None or current[0] != sql:
+        # Read-only connections still need their temporary schema
+        query_only = conn.execute('PRAGMA query_only').fetchone()[0]
+        conn.execute('PRAGMA query_only = OFF')
+        try:
+            conn.execute(f'DROP VIEW IF EXISTS temp.{HISTORY_VIEW}')
+            conn.execute(sql)
+        finally:
+            conn.execute(f'PRAGMA query_only = {query_only}')
+    return HISTORY_VIEW
+
+
+def _attached_schemas(conn):
+    """Schemas of the transaction tables attached to conn, live first"""
+    return ['main'] + sorted(name for _, name, _ in conn.execute('PRAGMA database_list')
+                             if name.startswith('archive_'))
+
+
+def history_schemas(conn):
+    """Attach every archive to conn as history() does, returning the
+    schemas holding transactions: 'main', then one per archive"""
+    history(conn)
+    return _attached_schemas(conn)
+
+
+def not_live(schema, table=None):
+    """SQL condition on a schema's transactions, named table in the query,
+    skipping rows that are also in the live table, as an interrupted
+    archive_year() leaves them; those are read from the live table only"""
+    if schema == 'main':
+        return 'true'
+    return (f'NOT EXISTS (SELECT 1 FROM main.transactions '
+            f'WHERE id = {table or schema + ".transactions"}.id)')
+
+
+def _union(conn, columns):
+    """UNION ALL of columns over the live table and every attached archive"""
+    return ' UNION ALL '.join(
+        f'SELECT {columns} FROM {schema}.transactions WHERE {not_live(schema)}'
+        for schema in _attached_schemas(conn))
+
+
+def history_select(conn, columns, start_day=None, end_day=None):
+    """SELECT of columns from the transactions history() covers, as a
+    compound over its tables rather than its view. An ORDER BY added to
+    it merges the tables' own index orders instead of sorting every row."""
+    if history(conn, start_day, end_day) == 'transactions':
+        return f'SELECT {columns} FROM transactions'
+    return _union(conn, columns)
+
+
+def archive_year(database, year):
+    """Move one closed year's transactions into its archive file,
+    returning how many moved.
+    
+    Rows are copied in one transaction on the archive and removed in
+    another on the database, which also lists the archive. Until the
+    second commits, history() reads each moved row from the live table
+    only, whether or not the year was archived before, and running this
+    again completes an interrupted move. Rows later added for an
+    archived year stay in the live file until it is archived again. The database's backup
+    chain restarts, so differential backups need a new full backup.
+    """
+    if year >= date.today().year:
+        raise ValueError(f"{year} has not closed yet")
+    
+    first, last = year_days(year)
+    path = archive_path(database, year)
+    conn = connect(database)
+    try:
+        conn.execute('ATTACH DATABASE ? AS archive', (path,))
+        try:
+            with conn:
+                for statement in ARCHIVE_SCHEMA:
+                    conn.execute(statement.format(schema='archive'))
+                conn.execute(f'''
+                    INSERT OR REPLACE INTO archive.transactions ({ARCHIVE_COLUMNS})
+                    SELECT {ARCHIVE_COLUMNS} FROM main.transactions
+                    WHERE day >= ? AND day < ?
+                ''', (first, last))
+                for statement in ARCHIVE_REINDEX:
+                    conn.execute(statement.format(schema='archive'))
+            
+            with conn:
+                # No other write may land in the year between totalling and
+                # deleting it
+                conn.execute('BEGIN IMMEDIATE')
+                
+                # The year's totals, which the delete's triggers take out of
+                # the rollups and daily balances, to put back afterwards
+                rollups = conn.execute('''
+                    SELECT substr(date, 1, 7), category, type, SUM(amount_cents), COUNT(*)
+                    FROM main.transactions WHERE day >= ? AND day < ?
+                    GROUP BY 1, 2, 3
+                ''', (first, last)).fetchall()
+                balances = conn.execute(f'''
+                    SELECT day, SUM({SIGNED_CENTS}), COUNT(*)
+                    FROM main.transactions WHERE day >= ? AND day < ?
+                    GROUP BY day
+                ''', (first, last)).fetchall()
+                moved = sum(row[4] for row in rollups)
+                
+                seq = conn.execute("SELECT seq FROM main.sqlite_sequence "
+                                   "WHERE name = 'change_log'").fetchone()
+                conn.execute('DELETE FROM main.transactions WHERE day >= ? AND day < ?',
+                             (first, last))
+                
+                conn.executemany('''
+                    INSERT INTO main.monthly_rollups (month, category, type, total_cents, count)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (month, category, type) DO UPDATE SET
+                        total_cents = total_cents + excluded.total_cents,
+                        count = count + excluded.count
+                ''', rollups)
+                conn.executemany('''
+                    INSERT INTO main.daily_balances (day, net_cents, count) VALUES (?, ?, ?)
+                    ON CONFLICT (day) DO UPDATE SET
+                        net_cents = net_cents + excluded.net_cents, count = count + excluded.count
+                ''', balances)
+                
+                conn.execute('''
+                    INSERT INTO main.archives (year, file, count)
+                    VALUES (?, ?, (SELECT COUNT(*) FROM archive.transactions))
+                    ON CONFLICT (year) DO UPDATE SET count = excluded.count
+                ''', (year, os.path.basename(path)))
+                
+                # Diffs cannot express the move; drop its journal entries
+                # and start a new chain
+                conn.execute('DELETE FROM main.change_log WHERE seq > ?', (seq[0] if seq else 0,))
+                conn.execute('UPDATE main.database_info SET uuid = lower(hex(randomblob(16)))')
+        finally:
+            conn.execute('DETACH DATABASE archive')
+    finally:
+        conn.close()
+    
+    return moved
+
+
+def index_archives(database):
+    """Add the search, tag and sort indexes to archives written before
+    archives carried them, returning the years updated"""
+    conn = connect(database)
+    try:
+        directory = os.path.dirname(conn.execute('PRAGMA database_list').fetchone()[2])
+        updated = []
+        for year, file, _ in list_archives(conn.cursor()):
+            conn.execute('ATTACH DATABASE ? AS archive', (os.path.join(directory, file),))
+            try:
+                indexed = conn.execute("SELECT 1 FROM archive.sqlite_master "
+                                       "WHERE name = 'transaction_tags'").fetchone()
+                if indexed is None:
+                    with conn:
+                        for statement in ARCHIVE_SCHEMA + ARCHIVE_REINDEX:
+                            conn.execute(statement.format(schema='archive'))
+                    updated.append(year)
+            finally:
+                conn.execute('DETACH DATABASE archive')
+    finally:
+        conn.close()
+    return updated
+
+
+def archive_closed_years(database, before=None, progress=None):
+    """Archive every year before the given one (the current year by
+    default) that has transactions in the live file, returning
+    {year: transactions moved}. Archives written without the indexes
+    the transactions list needs get them first. progress receives
+    (years done, years)."""
+    index_archives(database)
+    before = min(before or date.today().year, date.today().year)
+    conn = connect(database, readonly=True)
+    try:
+        # Years of the live rows, found by skipping along the day index
+        years = []
+        start = -2 ** 31
+        while True:
+            row = conn.execute('SELECT MIN(day) FROM transactions WHERE day >= ? AND day < ?',
+                               (start, year_days(before)[0])).fetchone()
+            if row[0] is None:
+                break
+            years.append(int(from_day(row[0])[:4]))
+            start = year_days(years[-1])[1]
+    finally:
+        conn.close()
+    
+    moved = {}
+    for done, year in enumerate(years):
+        moved[year] = archive_year(database, year)
+        if progress is not None:
+            progress(done + 1, len(years))
+    return moved
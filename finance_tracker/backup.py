@@ -0,0 +1,306 @@
+"""Online full and differential backups, and atomic restore"""
+import os
+import sqlite3
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from .db import connect, migrate_database
+
+
+# Pages copied per backup step; the source is only locked during a step
+BACKUP_STEP_PAGES = 4096
+
+
+def _copy(source, target, progress):
+    """Copy a whole database between connections in steps, reporting
+    (pages done, total pages)"""
+    def report(status, remaining, total):
+        if progress is not None:
+            progress(total - remaining, total)
+    
+    source.backup(target, pages=BACKUP_STEP_PAGES, progress=report, sleep=0)
+
+
+def _remove(path):
+    """Delete a file if it exists"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def backup_database(database, path, progress=None):
+    """Copy a live database to path without blocking its other users.
+    
+    The copy is taken from one WAL snapshot held open by a read
+    transaction, so writers keep committing while it runs and never force
+    it to restart. It is written beside path and renamed over it when
+    complete, so path never holds a partial backup.
+    """
+    partial = path + '.partial'
+    _remove(partial)
+    
+    source = connect(database, readonly=True)
+    try:
+        source.execute('BEGIN')
+        source.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+        target = sqlite3.connect(partial)
+        try:
+            _copy(source, target, progress)
+            # Backups are single files, whatever the source's journal mode
+            target.execute('PRAGMA journal_mode = DELETE')
+        finally:
+            target.close()
+    finally:
+        source.close()
+    
+    os.replace(partial, path)
+    return path
+
+
+# Tables the change journal covers. Transactions are upserted so their
+# update triggers patch the rollups and search index in place; budgets are
+# few and unique by category, so changed ones are deleted and re-inserted
+# to let renames swap categories freely.
+JOURNALED_TABLES = {'transactions': 'upsert', 'budgets': 'reinsert'}
+
+# Columns a migration derived from others, computed when a diff taken
+# before it is replayed; amounts are rounded to cents as migration 7 did
+DERIVED_COLUMNS = {
+    'transactions': {
+        'amount': 'CAST(ROUND(amount * 100) AS INTEGER) / 100.0',
+        'amount_cents': 'CAST(ROUND(amount * 100) AS INTEGER)',
+        'day': 'CAST(julianday(date(date)) - 2440587.5 AS INTEGER)',
+    },
+}
+
+
+class Snapshot(NamedTuple):
+    """Where a full backup or diff sits in its database's change journal"""
+    uuid: str
+    since: Optional[int]
+    seq: int
+
+
+def _journal_position(conn, schema='main'):
+    """(uuid, seq) of a database's change journal"""
+    uuid = conn.execute(f'SELECT uuid FROM {schema}.database_info').fetchone()[0]
+    row = conn.execute(f"SELECT seq FROM {schema}.sqlite_sequence "
+                       f"WHERE name = 'change_log'").fetchone()
+    return uuid, row[0] if row else 0
+
+
+def read_snapshot(path):
+    """Read a full backup's or a diff's Snapshot"""
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        tables = {name for (name,) in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if 'diff_meta' in tables:
+            meta = dict(conn.execute('SELECT key, value FROM diff_meta'))
+            return Snapshot(meta['uuid'], int(meta['since']), int(meta['seq']))
+        if 'database_info' in tables:
+            uuid, seq = _journal_position(conn)
+            return Snapshot(uuid, None, seq)
+        raise ValueError(f"{path} predates differential backups; take a new full backup")
+    finally:
+        conn.close()
+
+
+def backup_differential(database, base, path, progress=None):
+    """Write the rows changed since the base snapshot to path.
+    
+    base is a full backup or an earlier diff of the same database. The
+    diff is a small SQLite file holding the changed rows as they are now,
+    the journal entries naming them (those with no row were deleted),
+    and the journal position it brings a restore up to. Like full
+    backups it reads one snapshot and never blocks writers. progress
+    receives (rows copied, rows changed).
+    """
+    since = read_snapshot(base)
+    partial = path + '.partial'
+    _remove(partial)
+    
+    # Not read-only: the diff is written through an attached database
+    conn = connect(database)
+    try:
+        conn.execute('ATTACH DATABASE ? AS diff', (partial,))
+        with conn:
+            conn.execute('BEGIN')
+            uuid, seq = _journal_position(conn)
+            if uuid != since.uuid:
+                raise ValueError(f"{base} is a backup of a different database")
+            if since.seq > seq:
+                raise ValueError(f"{base} is newer than the database")
+            
+            conn.execute('''
+                CREATE TABLE diff.change_log AS
+                SELECT seq, table_name, row_id FROM change_log WHERE seq > ?
+            ''', (since.seq,))
+            changed = conn.execute('SELECT COUNT(*) FROM diff.change_log').fetchone()[0]
+            copied = 0
+            for table in JOURNALED_TABLES:
+                conn.execute(f'''
+                    CREATE TABLE diff.{table} AS
+                    SELECT t.* FROM {table} t
+                    JOIN diff.change_log c ON c.table_name = '{table}' AND c.row_id = t.id
+                ''')
+                copied += conn.execute(f'SELECT COUNT(*) FROM diff.{table}').fetchone()[0]
+                if progress is not None:
+                    progress(copied, changed)
+            conn.execute('CREATE TABLE diff.diff_meta (key TEXT PRIMARY KEY, value TEXT)')
+            conn.executemany('INSERT INTO diff.diff_meta VALUES (?, ?)', [
+                ('uuid', uuid), ('since', since.seq), ('seq', seq),
+                ('created', datetime.now().isoformat()),
+            ])
+        conn.execute('DETACH DATABASE diff')
+    finally:
+        conn.close()
+    
+    os.replace(partial, path)
+    return path
+
+
+def _apply_diff(conn, path, position):
+    """Replay one diff onto a restore target at the given journal position"""
+    conn.execute('ATTACH DATABASE ? AS diff', (path,))
+    try:
+        result = conn.execute('PRAGMA diff.quick_check').fetchone()[0]
+        if result != 'ok':
+            raise ValueError(f"{path} failed integrity check: {result}")
+        meta = dict(conn.execute('SELECT key, value FROM diff.diff_meta'))
+        if meta['uuid'] != position[0]:
+            raise ValueError(f"{path} is a diff of a different database")
+        if not int(meta['since']) <= position[1] <= int(meta['seq']):
+            raise ValueError(f"{path} does not follow on from the backup before it")
+        
+        with conn:
+            for table, strategy in JOURNALED_TABLES.items():
+                changed = 'SELECT row_id FROM diff.change_log WHERE table_name = ?'
+                if strategy == 'reinsert':
+                    conn.execute(f'DELETE FROM main.{table} WHERE id IN ({changed})', (table,))
+                else:
+                    conn.execute(f'''
+                        DELETE FROM main.{table}
+                        WHERE id IN ({changed}) AND id NOT IN (SELECT id FROM diff.{table})
+                    ''', (table,))
+                
+                # Only columns both sides have, so diffs survive later
+                # migrations, plus those derived from them
+                columns = [name for (_, name, *_) in conn.execute(f'PRAGMA main.table_info({table})')]
+                present = {name for (_, name, *_) in conn.execute(f'PRAGMA diff.table_info({table})')}
+                derived = DERIVED_COLUMNS.get(table, {})
+                if set(derived) <= present:
+                    derived = {}
+                values = {name: derived.get(name, name) for name in columns
+                          if name in present or name in derived}
+                names = ', '.join(values)
+                updates = ', '.join(f'{name} = excluded.{name}' for name in values if name != 'id')
+                conn.execute(f'''
+                    INSERT INTO main.{table} ({names})
+                    SELECT {', '.join(values.values())} FROM diff.{table} WHERE true ORDER BY id
+                    ON CONFLICT (id) DO UPDATE SET {updates}
+                ''')
+            
+            # The replay journaled itself under new numbers; put back the
+            # source's entries so later diffs of it still line up
+            conn.execute('DELETE FROM main.change_log WHERE seq > ?', (position[1],))
+            conn.execute('''
+                INSERT OR REPLACE INTO main.change_log (seq, table_name, row_id)
+                SELECT seq, table_name, row_id FROM diff.change_log
+            ''')
+            conn.execute("DELETE FROM main.sqlite_sequence WHERE name = 'change_log'")
+            conn.execute("INSERT INTO main.sqlite_sequence (name, seq) VALUES ('change_log', ?)",
+                         (int(meta['seq']),))
+    finally:
+        conn.execute('DETACH DATABASE diff')
+    
+    return position[0], int(meta['seq'])
+
+
+def plan_restore(paths):
+    """Order backup files for prepare_restore: (full backup, diffs).
+    
+    Exactly one full backup is expected. From it, the diff reaching
+    furthest is chosen at each step, so of several differentials only
+    the newest is replayed.
+    """
+    snapshots = {path: read_snapshot(path) for path in paths}
+    bases = [path for path, snapshot in snapshots.items() if snapshot.since is None]
+    if len(bases) != 1:
+        raise ValueError("Choose exactly one full backup, plus any diffs of it")
+    
+    base = bases[0]
+    uuid, position = snapshots[base].uuid, snapshots[base].seq
+    diffs = []
+    while True:
+        following = [path for path, snapshot in snapshots.items()
+                     if snapshot.since is not None and snapshot.uuid == uuid
+                     and snapshot.since <= position < snapshot.seq]
+        if not following:
+            break
+        diffs.append(max(following, key=lambda path: snapshots[path].seq))
+        position = snapshots[diffs[-1]].seq
+    
+    for path, snapshot in snapshots.items():
+        if snapshot.since is not None and (snapshot.uuid != uuid or snapshot.seq > position):
+            raise ValueError(f"{path} does not follow on from {base}")
+    return base, diffs
+
+
+def prepare_restore(path, database, progress=None, diffs=()):
+    """Stage a backup for restore_database, returning the staged file.
+    
+    The backup is checked, copied beside the database, migrated to the
+    current schema and brought forward by replaying diffs (see
+    plan_restore), all while the database stays in use.
+    """
+    source = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        result = source.execute('PRAGMA quick_check').fetchone()[0]
+        if result != 'ok':
+            raise ValueError(f"Backup failed integrity check: {result}")
+        
+        staged = database + '.restore'
+        _remove(staged)
+        target = sqlite3.connect(staged)
+        try:
+            _copy(source, target, progress)
+            target.execute('PRAGMA journal_mode = DELETE')
+            migrate_database(target)
+            
+            position = _journal_position(target)
+            for diff in diffs:
+                position = _apply_diff(target, diff, position)
+        finally:
+            target.close()
+    except Exception:
+        _remove(database + '.restore')
+        raise
+    finally:
+        source.close()
+    
+    return staged
+
+
+def restore_database(staged, database):
+    """Swap a staged restore in for the database with one atomic rename.
+    
+    Every connection to the database must be closed first. Each open
+    connection to a WAL database holds a shared lock, even while idle, so
+    an exclusive lock is only granted once no other connection is left.
+    """
+    if os.path.exists(database):
+        check = sqlite3.connect(database, timeout=0, isolation_level=None)
+        try:
+            check.execute('PRAGMA locking_mode = EXCLUSIVE')
+            check.execute('BEGIN EXCLUSIVE')
+            check.execute('ROLLBACK')
+        except sqlite3.OperationalError:
+            raise RuntimeError("The database is still open in another program") from None
+        finally:
+            check.close()
+    
+    _remove(database + '-wal')
+    _remove(database + '-shm')
+    os.replace(staged, database)
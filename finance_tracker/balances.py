@@ -0,0 +1,175 @@
+"""Running balance over time from per-day net changes"""
+import json
+import threading
+
+from .transactions import from_day, to_day
+
+
+# Signed effect of a transaction on the balance, as in migration 8
+SIGNED_CENTS = "IIF(type = 'Income', amount_cents, IIF(type = 'Expense', -amount_cents, 0))"
+
+
+def format_balance(balance):
+    """Balance as shown in the transactions list; blank for undated rows"""
+    return '' if balance is None else f"{balance:.2f}"
+
+
+class BalanceIndex:
+    """Balance at the end of any day, in O(log D) for D days.
+    
+    daily_balances holds each day's net change, kept by triggers. The
+    index loads it into a Fenwick tree over the days from the first to
+    the last, so a balance is a prefix sum. A write only marks its days
+    dirty through apply(); the next lookup re-reads those days from
+    daily_balances and adjusts the tree by the difference. Values are
+    re-read rather than added, so a write both seen by a load and passed
+    to apply() is not counted twice. A day outside the loaded range
+    reloads the whole index.
+    
+    Lookups take a cursor so they can run on the QueryWorker thread.
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.first = 0
+        # 1-based Fenwick tree; slot i covers day first + i - 1
+        self.tree = [0]
+        # Day -> net cents as last read from daily_balances
+        self.net = {}
+        self.dirty = set()
+        # Bumped by every change, for caches of query results
+        self.version = 0
+    
+    def invalidate(self):
+        """Drop the index; the next lookup reloads it"""
+        with self.lock:
+            self.loaded = False
+            self.dirty.clear()
+            self.version += 1
+    
+    def apply(self, delta):
+        """Note the days a TransactionDelta changed"""
+        with self.lock:
+            for row in (delta.old, delta.new):
+                if row is None:
+                    continue
+                try:
+                    self.dirty.add(to_day(row[1]))
+                except ValueError:
+                    # Undated rows are not part of the balance
+                    pass
+            self.version += 1
+    
+    def _load(self, cursor):
+        """Read every day and build the tree in O(D)"""
+        cursor.execute('SELECT day, net_cents FROM daily_balances ORDER BY day')
+        rows = cursor.fetchall()
+        self.net = dict(rows)
+        self.dirty.clear()
+        self.first = rows[0][0] if rows else 0
+        
+        span = rows[-1][0] - self.first + 1 if rows else 0
+        tree = [0] * (span + 1)
+        for day, cents in rows:
+            tree[day - self.first + 1] = cents
+        for i in range(1, span + 1):
+            parent = i + (i & -i)
+            if parent <= span:
+                tree[parent] += tree[i]
+        self.tree = tree
+        self.loaded = True
+    
+    def _refresh(self, cursor):
+        """Bring the index up to date; the lock must be held"""
+        if not self.loaded:
+            self._load(cursor)
+            return
+        if not self.dirty:
+            return
+        
+        days = sorted(self.dirty)
+        last = self.first + len(self.tree) - 2
+        if days[0] < self.first or days[-1] > last:
+            self._load(cursor)
+            return
+        
+        self.dirty.clear()
+        cursor.execute('''
+            SELECT day, net_cents FROM daily_balances
+            WHERE day IN (SELECT value FROM json_each(?))
+        ''', (json.dumps(days),))
+        stored = dict(cursor.fetchall())
+        for day in days:
+            change = stored.get(day, 0) - self.net.get(day, 0)
+            if day in stored:
+                self.net[day] = stored[day]
+            else:
+                self.net.pop(day, None)
+            
+            i = day - self.first + 1
+            while change and i < len(self.tree):
+                self.tree[i] += change
+                i += i & -i
+    
+    def _prefix(self, day):
+        """Net cents of all days up to and including day"""
+        i = min(day - self.first + 1, len(self.tree) - 1)
+        total = 0
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+    
+    def balance_at(self, cursor, date):
+        """Balance at the end of a YYYY-MM-DD date"""
+        day = to_day(date)
+        with self.lock:
+            self._refresh(cursor)
+            return self._prefix(day) / 100
+    
+    def series(self, cursor):
+        """Return (date, balance) at the end of every day with transactions"""
+        with self.lock:
+            self._refresh(cursor)
+            days = sorted(self.net.items())
+        
+        rows = []
+        balance = 0
+        for day, cents in days:
+            balance += cents
+            rows.append((from_day(day), balance / 100))
+        return rows
+    
+    def running_balances(self, cursor, ids):
+        """Balance after each transaction in ids, taking transactions in
+        (date, id) order, or None for undated ones"""
+        if not ids:
+            return []
+        from .archive import history_schemas, not_live
+        
+        # The effect of later transactions on each one's day, through the
+        # (type, day, amount_cents) covering index of each file; the unary
+        # + on id keeps SQLite from range-scanning the (type, id) sort
+        # index instead. Archived rows are listed too, and later rows on
+        # their days may be in the archive or the live table. Spelled out
+        # per file, as SQLite does not push t.day into a UNION ALL view.
+        schemas = history_schemas(cursor.connection)
+        later = ' + '.join(f'''
+            IFNULL((SELECT SUM({SIGNED_CENTS}) FROM {schema}.transactions AS s
+                    WHERE type IN ('Income', 'Expense') AND day = t.day AND +id > t.id
+                      AND {not_live(schema, 's')}), 0)
+        ''' for schema in schemas)
+        cursor.execute(' UNION ALL '.join(f'''
+            SELECT t.id, t.day, {later}
+            FROM {schema}.transactions AS t
+            WHERE t.id IN (SELECT value FROM json_each(?)) AND t.day IS NOT NULL
+              AND {not_live(schema, 't')}
+        ''' for schema in schemas), [json.dumps(list(ids))] * len(schemas))
+        same_day = {trans_id: (day, cents or 0) for trans_id, day, cents in cursor.fetchall()}
+        
+        with self.lock:
+            self._refresh(cursor)
+            balances = {trans_id: (self._prefix(day) - cents) / 100
+                        for trans_id, (day, cents) in same_day.items()}
+        return [balances.get(trans_id) for trans_id in ids]
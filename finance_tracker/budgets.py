@@ -0,0 +1,112 @@
+"""Budget periods and spend evaluation"""
+import calendar
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+
+from .archive import history
+from .transactions import to_day
+
+
+def budget_window(period, anchor, today):
+    """Return the [start, end) dates of the budget period containing today.
+    
+    anchor moves where periods start: day of month (1-31) for Monthly,
+    ISO weekday (1=Monday) for Weekly and month (1-12) for Yearly. Without
+    one, months and years start on the 1st and weeks are the last 7 days.
+    """
+    if period == 'Weekly':
+        if anchor is None:
+            return today - timedelta(days=7), today + timedelta(days=1)
+        start = today - timedelta(days=(today.isoweekday() - anchor) % 7)
+        return start, start + timedelta(days=7)
+    
+    if period == 'Yearly':
+        month = anchor or 1
+        year = today.year if today.month >= month else today.year - 1
+        start = today.replace(year=year, month=month, day=1)
+        return start, start.replace(year=year + 1)
+    
+    # Monthly; anchor days past the end of a month fall on its last day
+    def anchored(year, month):
+        return today.replace(year=year, month=month,
+                             day=min(anchor or 1, calendar.monthrange(year, month)[1]))
+    
+    def shift(year, month, months):
+        index = year * 12 + month - 1 + months
+        return index // 12, index % 12 + 1
+    
+    start = anchored(today.year, today.month)
+    if start > today:
+        start = anchored(*shift(today.year, today.month, -1))
+    return start, anchored(*shift(start.year, start.month, 1))
+
+
+class BudgetStatus(NamedTuple):
+    """A budget with its current period and the expenses within it"""
+    category: str
+    amount: float
+    period: str
+    anchor: Optional[int]
+    start: str
+    end: str
+    spent: float
+
+
+class BudgetEngine:
+    """Computes spend for every budget in one grouped query. Results are
+    cached until invalidate() is called after a write, or the day changes."""
+    
+    def __init__(self):
+        self.version = 0
+        self.cache = None
+    
+    def invalidate(self):
+        """Discard cached results after transactions or budgets change"""
+        self.version += 1
+    
+    def evaluate(self, cursor, today=None):
+        """Return a BudgetStatus for every budget"""
+        today = today or datetime.now().date()
+        version = self.version
+        if self.cache is not None and self.cache[:2] == (version, today):
+            return self.cache[2]
+        
+        cursor.execute('SELECT category, amount, period, anchor FROM budgets ORDER BY id')
+        budgets = cursor.fetchall()
+        
+        windows = []
+        for category, amount, period, anchor in budgets:
+            start, end = budget_window(period, anchor, today)
+            windows.append((category, start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')))
+        
+        spent = {}
+        if windows:
+            # Windows reaching into an archived year read it too
+            source = history(cursor.connection, min(to_day(start) for _, start, _ in windows),
+                             max(to_day(end) for _, _, end in windows))
+            
+            # One pass over every budget window, each probing the
+            # (category, type, day, amount_cents) covering index
+            values = ', '.join(['(?, ?, ?, ?)'] * len(windows))
+            params = [value for position, (category, start, end) in enumerate(windows)
+                      for value in (position, category, to_day(start), to_day(end))]
+            cursor.execute(f'''
+                WITH windows (position, category, start, end) AS (VALUES {values})
+                SELECT w.position, IFNULL(SUM(t.amount_cents), 0) / 100.0
+                FROM windows w
+                LEFT JOIN {source} t
+                    ON t.category = w.category AND t.type = 'Expense'
+                    AND t.day >= w.start AND t.day < w.end
+                GROUP BY w.position
+            ''', params)
+            spent = dict(cursor.fetchall())
+        
+        results = [
+            BudgetStatus(category, amount, period, anchor, start, end, spent[position])
+            for position, ((category, amount, period, anchor), (_, start, end))
+            in enumerate(zip(budgets, windows))
+        ]
+        
+        # A write during the query bumps the version, leaving this stale
+        self.cache = (version, today, results)
+        return results
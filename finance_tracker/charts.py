@@ -0,0 +1,206 @@
+"""Chart drawing on a headless Agg canvas"""
+import matplotlib
+from matplotlib.artist import setp
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+import numpy as np
+
+
+class ChartRenderer:
+    """Draws charts onto one long-lived Agg figure, without any GUI toolkit.
+    
+    Each chart type keeps its own Axes in the figure; only the one being
+    drawn is visible. render() returns the finished raster as PPM bytes
+    for a Tk PhotoImage. A renderer must only be used by one thread.
+    """
+    
+    DPI = 100
+    
+    def __init__(self):
+        self.figure = Figure(figsize=(10, 6), dpi=self.DPI, facecolor='#34495e')
+        self.canvas = FigureCanvasAgg(self.figure)
+        self.axes = {}
+    
+    def draw(self, chart_type, size, draw):
+        """Redraw chart_type's Axes in place with draw(ax) at size pixels"""
+        width, height = size
+        self.figure.set_size_inches(width / self.DPI, height / self.DPI)
+        
+        if chart_type not in self.axes:
+            self.axes[chart_type] = self.figure.add_subplot(label=chart_type)
+        for name, ax in self.axes.items():
+            ax.set_visible(name == chart_type)
+        
+        ax = self.axes[chart_type]
+        ax.clear()
+        ax.set_facecolor('#2c3e50')
+        draw(ax)
+    
+    def render(self, chart_type, size, draw):
+        """Draw a chart and rasterize it, returning binary PPM bytes"""
+        self.draw(chart_type, size, draw)
+        self.canvas.draw()
+        
+        # Binary PPM is RGB with a short text header
+        rgba = np.asarray(self.canvas.buffer_rgba())
+        header = f'P6 {rgba.shape[1]} {rgba.shape[0]} 255 '.encode('ascii')
+        return header + rgba[:, :, :3].tobytes()
+
+
+def draw_expense_pie_chart(ax, data):
+    """Draw expense by category pie chart"""
+    if data:
+        categories, amounts = zip(*data)
+        colors = matplotlib.colormaps['Set3'](np.linspace(0, 1, len(categories)))
+        
+        ax.pie(amounts, labels=categories, autopct='%1.1f%%', colors=colors, startangle=90)
+        ax.set_title('Expenses by Category', color='white', fontsize=14, fontweight='bold')
+    else:
+        ax.text(0.5, 0.5, 'No expense data available', transform=ax.transAxes, 
+               ha='center', va='center', color='white', fontsize=12)
+
+
+def draw_income_expense_chart(ax, data):
+    """Draw income vs expenses bar chart"""
+    if data:
+        types, amounts = zip(*data)
+        colors = ['#27ae60' if t == 'Income' else '#e74c3c' for t in types]
+        
+        bars = ax.bar(types, amounts, color=colors)
+        ax.set_title('Income vs Expenses', color='white', fontsize=14, fontweight='bold')
+        ax.set_ylabel('Amount ($)', color='white')
+        ax.tick_params(colors='white')
+        
+        # Add value labels on bars
+        for bar, amount in zip(bars, amounts):
+            height = bar.get_height()
+            ax.text(bar.get_x() + bar.get_width()/2., height + height*0.01,
+                   f'${amount:.2f}', ha='center', va='bottom', color='white')
+    else:
+        ax.text(0.5, 0.5, 'No data available', transform=ax.transAxes, 
+               ha='center', va='center', color='white', fontsize=12)
+
+
+def draw_monthly_trends_chart(ax, data):
+    """Draw monthly trends line chart"""
+    if data:
+        # Process data
+        months = {}
+        for month, trans_type, amount in data:
+            if month not in months:
+                months[month] = {'Income': 0, 'Expense': 0}
+            months[month][trans_type] = amount
+        
+        if months:
+            month_labels = sorted(months.keys())
+            income_data = [months[m]['Income'] for m in month_labels]
+            expense_data = [months[m]['Expense'] for m in month_labels]
+            
+            ax.plot(month_labels, income_data, marker='o', label='Income', color='#27ae60', linewidth=2)
+            ax.plot(month_labels, expense_data, marker='s', label='Expenses', color='#e74c3c', linewidth=2)
+            
+            ax.set_title('Monthly Trends', color='white', fontsize=14, fontweight='bold')
+            ax.set_xlabel('Month', color='white')
+            ax.set_ylabel('Amount ($)', color='white')
+            ax.legend()
+            ax.tick_params(colors='white')
+            ax.grid(True, alpha=0.3)
+            
+            # Rotate x-axis labels for better readability
+            setp(ax.get_xticklabels(), rotation=45, ha='right')
+    else:
+        ax.text(0.5, 0.5, 'No data available', transform=ax.transAxes, 
+               ha='center', va='center', color='white', fontsize=12)
+
+
+def draw_budget_analysis_chart(ax, data):
+    """Draw budget analysis chart from BudgetStatus rows"""
+    if data:
+        categories = [budget.category for budget in data]
+        budget_amounts = [budget.amount for budget in data]
+        spent_amounts = [budget.spent for budget in data]
+        
+        x = np.arange(len(categories))
+        width = 0.35
+        
+        bars1 = ax.bar(x - width/2, budget_amounts, width, label='Budget', color='#3498db', alpha=0.8)
+        bars2 = ax.bar(x + width/2, spent_amounts, width, label='Spent', color='#e74c3c', alpha=0.8)
+        
+        ax.set_title('Budget vs Spending Analysis', color='white', fontsize=14, fontweight='bold')
+        ax.set_xlabel('Categories', color='white')
+        ax.set_ylabel('Amount ($)', color='white')
+        ax.set_xticks(x)
+        ax.set_xticklabels(categories)
+        ax.legend()
+        ax.tick_params(colors='white')
+        
+        # Add value labels on bars
+        for bars in [bars1, bars2]:
+            for bar in bars:
+                height = bar.get_height()
+                ax.text(bar.get_x() + bar.get_width()/2., height + height*0.01,
+                       f'${height:.0f}', ha='center', va='bottom', color='white', fontsize=8)
+    else:
+        ax.text(0.5, 0.5, 'No budget data available', transform=ax.transAxes, 
+               ha='center', va='center', color='white', fontsize=12)
+
+
+def draw_tag_spending_chart(ax, data, limit=15):
+    """Draw spending by tag as horizontal bars, largest on top"""
+    if data:
+        shown = data[:limit]
+        tags = [tag for tag, _ in shown][::-1]
+        amounts = [amount for _, amount in shown][::-1]
+        
+        ax.barh(tags, amounts, color='#e67e22')
+        title = 'Spending by Tag'
+        if len(data) > limit:
+            title += f' (top {limit} of {len(data)})'
+        ax.set_title(title, color='white', fontsize=14, fontweight='bold')
+        ax.set_xlabel('Amount ($)', color='white')
+        ax.tick_params(colors='white')
+        ax.grid(True, axis='x', alpha=0.3)
+    else:
+        ax.text(0.5, 0.5, 'No tagged expenses', transform=ax.transAxes, 
+               ha='center', va='center', color='white', fontsize=12)
+
+
+def draw_balance_chart(ax, data):
+    """Draw the running balance as a step line over dates"""
+    if data:
+        dates = np.array([date for date, _ in data], dtype='datetime64[D]')
+        balances = np.array([balance for _, balance in data])
+        
+        ax.step(dates, balances, where='post', color='#3498db', linewidth=2)
+        ax.fill_between(dates, balances, step='post', color='#3498db', alpha=0.2)
+        ax.axhline(0, color='#bdc3c7', linewidth=1)
+        
+        ax.set_title('Balance Over Time', color='white', fontsize=14, fontweight='bold')
+        ax.set_xlabel('Date', color='white')
+        ax.set_ylabel('Balance ($)', color='white')
+        ax.tick_params(colors='white')
+        ax.grid(True, alpha=0.3)
+        setp(ax.get_xticklabels(), rotation=45, ha='right')
+    else:
+        ax.text(0.5, 0.5, 'No data available', transform=ax.transAxes, 
+               ha='center', va='center', color='white', fontsize=12)
+
+
+# Chart type -> function drawing its data onto an Axes
+CHART_DRAWERS = {
+    'Expense by Category': draw_expense_pie_chart,
+    'Income vs Expenses': draw_income_expense_chart,
+    'Monthly Trends': draw_monthly_trends_chart,
+    'Budget Analysis': draw_budget_analysis_chart,
+    'Spending by Tag': draw_tag_spending_chart,
+    'Balance Over Time': draw_balance_chart,
+}
+CHART_TYPES = list(CHART_DRAWERS)
+
+
+def save_chart(chart_type, data, path, size=(1000, 600)):
+    """Draw one chart and write it to path; the format follows the
+    extension (PNG, SVG, PDF, ...)"""
+    renderer = ChartRenderer()
+    renderer.draw(chart_type, size, lambda ax: CHART_DRAWERS[chart_type](ax, data))
+    renderer.figure.savefig(path, facecolor=renderer.figure.get_facecolor())
@@ -0,0 +1,355 @@
+"""Command line interface for scripted and scheduled use.
+
+    python -m finance_tracker [--db PATH] import FILE [--workers N]
+    python -m finance_tracker [--db PATH] export FILE
+    python -m finance_tracker [--db PATH] summary [--month YYYY-MM] [--json]
+    python -m finance_tracker [--db PATH] budgets [--date YYYY-MM-DD] [--forecast] [--json]
+    python -m finance_tracker [--db PATH] chart TYPE FILE [--size WxH]
+    python -m finance_tracker [--db PATH] backup FILE [--since BACKUP]
+    python -m finance_tracker [--db PATH] restore FILE [DIFF ...]
+    python -m finance_tracker [--db PATH] archive [--before YEAR] [--vacuum] [--list]
+
+--perf prints per-operation timings and slow query plans to stderr, and
+--trace FILE saves them as a Chrome trace.
+
+Reports read the monthly rollups rather than scanning transactions, and
+heavy modules are only imported by the subcommands that need them.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from contextlib import closing
+from datetime import datetime
+
+from . import perf
+from .db import DATABASE_FILE, connect, migrate_database
+
+
+def open_database(database):
+    """Open the database, creating or upgrading its schema"""
+    conn = connect(database)
+    migrate_database(conn)
+    return conn
+
+
+def print_progress(done, total, *counts):
+    """Progress callback printing a percentage to stderr"""
+    percent = done * 100 // total if total else 100
+    print(f"\r{percent:3d}%", end='', file=sys.stderr, flush=True)
+
+
+def cmd_import(args):
+    """Import a CSV, NDJSON or JSON file. Large CSV files, or any with
+    --workers, are parsed in parallel unless a quoted field spans lines;
+    smaller ones are read with the csv module as the app does."""
+    from .importer import (PARALLEL_IMPORT_MIN_BYTES, import_csv_file, import_file_parallel,
+                           import_json_file)
+    
+    open_database(args.db).close()
+    progress = print_progress if sys.stderr.isatty() else None
+    large = os.path.getsize(args.file) >= PARALLEL_IMPORT_MIN_BYTES
+    name = args.file.lower()
+    
+    if name.endswith('.json'):
+        report = import_json_file(args.db, args.file, progress=progress)
+    elif name.endswith(('.ndjson', '.jsonl')):
+        # Line oriented, so splitting it is always safe
+        workers = args.workers or (None if large else 1)
+        report = import_file_parallel(args.db, args.file, progress=progress, workers=workers)
+    elif args.workers is not None or large:
+        report = import_file_parallel(args.db, args.file, progress=progress, workers=args.workers)
+    else:
+        report = import_csv_file(args.db, args.file, progress=progress)
+    if progress is not None:
+        print(file=sys.stderr)
+    
+    print(f"Imported {report.imported} transactions and {report.budgets} budgets, "
+          f"skipped {report.failed} invalid rows")
+    for line, error in report.errors:
+        print(f"  {line}: {error}", file=sys.stderr)
+    return 1 if report.failed else 0
+
+
+def cmd_export(args):
+    """Export to CSV, JSON or NDJSON, gzip-compressed for .gz names"""
+    from .exporter import export_csv_file, export_json_file
+    
+    open_database(args.db).close()
+    name = args.file.lower()
+    if name.endswith('.gz'):
+        name = name[:-3]
+    
+    if name.endswith('.csv'):
+        written = export_csv_file(args.db, args.file)
+    else:
+        written = export_json_file(args.db, args.file)
+    print(f"Exported {written} rows to {args.file}")
+    return 0
+
+
+def cmd_summary(args):
+    """Print balance, a month's income and expenses, and spend by category"""
+    from .rollups import fetch_balance_cents
+    
+    month = args.month or datetime.now().strftime('%Y-%m')
+    with closing(open_database(args.db)) as conn:
+        cursor = conn.cursor()
+        balance = fetch_balance_cents(cursor)
+        cursor.execute('''
+            SELECT category, type, SUM(total_cents) FROM monthly_rollups
+            WHERE month = ?
+            GROUP BY category, type
+            ORDER BY category
+        ''', (month,))
+        rows = cursor.fetchall()
+    
+    # Summed in cents, converted once
+    income = sum(cents for category, trans_type, cents in rows if trans_type == 'Income') / 100
+    expenses = sum(cents for category, trans_type, cents in rows if trans_type == 'Expense') / 100
+    summary = {
+        'balance': balance / 100,
+        'month': month,
+        'income': income,
+        'expenses': expenses,
+        'expenses_by_category': {category: cents / 100 for category, trans_type, cents in rows
+                                 if trans_type == 'Expense'},
+    }
+    
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return 0
+    
+    print(f"Balance:  ${summary['balance']:,.2f}")
+    print(f"{month} income:   ${income:,.2f}")
+    print(f"{month} expenses: ${expenses:,.2f}")
+    for category, total in summary['expenses_by_category'].items():
+        print(f"  {category:<16} ${total:,.2f}")
+    return 0
+
+
+def cmd_budgets(args):
+    """Print spend against every budget"""
+    from .budgets import BudgetEngine
+    
+    today = datetime.strptime(args.date, '%Y-%m-%d').date() if args.date else datetime.now().date()
+    with closing(open_database(args.db)) as conn:
+        cursor = conn.cursor()
+        statuses = BudgetEngine().evaluate(cursor, today)
+        projections = [None] * len(statuses)
+        if args.forecast:
+            from .forecast import forecast_spend
+            projections = forecast_spend(cursor, today).project(statuses, today)
+    
+    if args.json:
+        report = []
+        for status, projected in zip(statuses, projections):
+            entry = {'category': status.category, 'amount': status.amount,
+                     'period': status.period, 'start': status.start, 'end': status.end,
+                     'spent': status.spent}
+            if projected is not None:
+                entry['projected'] = round(projected, 2)
+            report.append(entry)
+        print(json.dumps(report, indent=2))
+        return 0
+    
+    if not statuses:
+        print("No budgets set")
+    for status, projected in zip(statuses, projections):
+        percentage = status.spent / status.amount * 100 if status.amount else 0
+        if status.spent > status.amount:
+            flag = ' OVER'
+        elif projected is not None and projected > status.amount:
+            flag = f" PROJECTED OVER (${projected:,.2f})"
+        else:
+            flag = ''
+        print(f"{status.category:<16} {status.period:<8} from {status.start}  "
+              f"${status.spent:,.2f} of ${status.amount:,.2f} ({percentage:.1f}%){flag}")
+    return 0
+
+
+def cmd_chart(args):
+    """Render a chart to an image file"""
+    from .charts import CHART_TYPES, save_chart
+    from .rollups import CHART_QUERIES
+    
+    if args.type not in CHART_TYPES:
+        print(f"Unknown chart type {args.type!r}; choose from: {', '.join(CHART_TYPES)}",
+              file=sys.stderr)
+        return 2
+    
+    with closing(open_database(args.db)) as conn:
+        cursor = conn.cursor()
+        if args.type == 'Budget Analysis':
+            from .budgets import BudgetEngine
+            data = BudgetEngine().evaluate(cursor)
+        else:
+            data = CHART_QUERIES[args.type](cursor)
+    
+    save_chart(args.type, data, args.file, args.size)
+    print(f"Saved {args.type} to {args.file}")
+    return 0
+
+
+def cmd_backup(args):
+    """Copy the database, or what changed since a backup, while it stays in use"""
+    from .backup import backup_database, backup_differential
+    
+    open_database(args.db).close()
+    progress = print_progress if sys.stderr.isatty() else None
+    if args.since:
+        backup_differential(args.db, args.since, args.file, progress=progress)
+    else:
+        backup_database(args.db, args.file, progress=progress)
+    if progress is not None:
+        print(file=sys.stderr)
+    print(f"Backed up {args.db} to {args.file}")
+    return 0
+
+
+def cmd_restore(args):
+    """Replace the database with a verified backup, brought forward by any diffs"""
+    from .backup import plan_restore, prepare_restore, restore_database
+    
+    base, diffs = plan_restore(args.files)
+    progress = print_progress if sys.stderr.isatty() else None
+    staged = prepare_restore(base, args.db, progress=progress, diffs=diffs)
+    if progress is not None:
+        print(file=sys.stderr)
+    restore_database(staged, args.db)
+    print(f"Restored {args.db} from {base}"
+          + (f" and {len(diffs)} differential backups" if diffs else ""))
+    return 0
+
+
+def cmd_archive(args):
+    """Move closed years out to archive files, or list the archives"""
+    from .archive import archive_closed_years, list_archives
+    
+    with closing(open_database(args.db)) as conn:
+        if args.list:
+            archives = list_archives(conn.cursor())
+            if not archives:
+                print("No archived years")
+            for year, file, count in archives:
+                print(f"{year}  {count:>9,} transactions  {file}")
+            return 0
+    
+    progress = print_progress if sys.stderr.isatty() else None
+    moved = archive_closed_years(args.db, args.before, progress=progress)
+    if progress is not None:
+        print(file=sys.stderr)
+    if not moved:
+        print("No closed years left to archive")
+    for year, count in moved.items():
+        print(f"Archived {count} transactions from {year}")
+    
+    if moved and args.vacuum:
+        with closing(connect(args.db)) as conn:
+            conn.execute('VACUUM')
+    return 0
+
+
+def parse_size(text):
+    """Parse WIDTHxHEIGHT in pixels"""
+    try:
+        width, height = (int(part) for part in text.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT, got {text!r}")
+    return width, height
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='finance_tracker',
+                                     description="Personal finance tracker (headless)")
+    parser.add_argument('--db', default=DATABASE_FILE,
+                        help=f"database file (default: {DATABASE_FILE})")
+    parser.add_argument('--perf', action='store_true',
+                        help="print timings of each query and step to stderr")
+    parser.add_argument('--trace', metavar='FILE',
+                        help="save timings as Chrome trace JSON (chrome://tracing, Perfetto)")
+    parser.add_argument('--slow-query-ms', type=float, default=perf.SLOW_QUERY_MS,
+                        help=f"log queries slower than this with --perf (default: {perf.SLOW_QUERY_MS})")
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    command = commands.add_parser('import', help="import transactions and budgets")
+    command.add_argument('file', help="CSV, NDJSON (.ndjson/.jsonl) or JSON export")
+    command.add_argument('--workers', type=int,
+                         help="parser processes for CSV/NDJSON (default: by file size); "
+                              "CSV files with quoted line breaks are read in one process")
+    command.set_defaults(func=cmd_import)
+    
+    command = commands.add_parser('export', help="export transactions and budgets")
+    command.add_argument('file', help=".csv, .json or .ndjson, optionally ending in .gz")
+    command.set_defaults(func=cmd_export)
+    
+    command = commands.add_parser('summary', help="print balance and a month's totals")
+    command.add_argument('--month', help="YYYY-MM (default: this month)")
+    command.add_argument('--json', action='store_true', help="print JSON")
+    command.set_defaults(func=cmd_summary)
+    
+    command = commands.add_parser('budgets', help="print spend against budgets")
+    command.add_argument('--date', help="evaluate as of YYYY-MM-DD (default: today)")
+    command.add_argument('--forecast', action='store_true',
+                         help="project spend to the end of each period")
+    command.add_argument('--json', action='store_true', help="print JSON")
+    command.set_defaults(func=cmd_budgets)
+    
+    command = commands.add_parser('chart', help="render a chart to an image file")
+    command.add_argument('type', help="'Expense by Category', 'Income vs Expenses', "
+                                      "'Monthly Trends', 'Budget Analysis', "
+                                      "'Spending by Tag' or 'Balance Over Time'")
+    command.add_argument('file', help="output image (.png, .svg, .pdf)")
+    command.add_argument('--size', type=parse_size, default=(1000, 600),
+                         help="WIDTHxHEIGHT in pixels (default: 1000x600)")
+    command.set_defaults(func=cmd_chart)
+    
+    command = commands.add_parser('backup', help="back up the database")
+    command.add_argument('file', help="backup database file")
+    command.add_argument('--since', metavar='BACKUP',
+                         help="only save changes made since this full or differential backup")
+    command.set_defaults(func=cmd_backup)
+    
+    command = commands.add_parser('restore', help="replace the database with a backup")
+    command.add_argument('files', nargs='+', metavar='FILE',
+                         help="a full backup plus any differential backups of it")
+    command.set_defaults(func=cmd_restore)
+    
+    command = commands.add_parser('archive', help="move closed years to archive files")
+    command.add_argument('--before', type=int, metavar='YEAR',
+                         help="archive years before this one (default: this year)")
+    command.add_argument('--vacuum', action='store_true',
+                         help="shrink the database file afterwards")
+    command.add_argument('--list', action='store_true', help="list archived years")
+    command.set_defaults(func=cmd_archive)
+    
+    return parser
+
+
+def print_perf_summary(recorder):
+    """Print per-operation timings, slowest total first"""
+    print(f"{'ms p50':>10} {'ms p95':>10} {'count':>7} {'rows':>9}  operation", file=sys.stderr)
+    for entry in recorder.summary():
+        rows = '' if entry['mean_rows'] is None else f"{entry['mean_rows']:g}"
+        print(f"{entry['p50_ms']:10.3f} {entry['p95_ms']:10.3f} {entry['count']:7} {rows:>9}  "
+              f"{entry['operation']}", file=sys.stderr)
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    recorder = None
+    if args.perf or args.trace:
+        recorder = perf.enable(args.slow_query_ms, slow_log=sys.stderr if args.perf else None)
+    try:
+        with perf.span(args.command):
+            return args.func(args)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if recorder is not None:
+            if args.perf:
+                print_perf_summary(recorder)
+            if args.trace:
+                recorder.export_trace(args.trace)
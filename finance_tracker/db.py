@@ -0,0 +1,538 @@
+"""Database location, fixed vocabularies and schema migrations"""
+import sqlite3
+import threading
+
+from . import perf
+
+
+DATABASE_FILE = 'finance_tracker.db'
+
+CATEGORIES = ['Food', 'Transportation', 'Entertainment', 'Utilities', 
+              'Healthcare', 'Shopping', 'Income', 'Investment', 'Other']
+TRANSACTION_TYPES = ['Income', 'Expense']
+BUDGET_PERIODS = ['Monthly', 'Weekly', 'Yearly']
+
+# Largest budget start per period: day of month, weekday, month
+BUDGET_ANCHOR_LIMITS = {'Monthly': 31, 'Weekly': 7, 'Yearly': 12}
+
+
+def _tags_json_sql(value):
+    """SQL rewriting a tags expression as a JSON array for json_each.
+    
+    Triggers cannot use CTEs, so the field is split by json_each instead.
+    json_quote escapes everything but commas, which become the element
+    boundaries.
+    """
+    return f"""'[' || replace(json_quote({value}), ',', '","') || ']'"""
+
+
+# A json_each element trimmed as split_tags trims it
+_TAG_NAME_SQL = "trim(value, ' ' || char(9, 10, 13))"
+
+
+def _signed_cents_sql(row):
+    """SQL for a row's effect on the balance in cents: income adds,
+    expenses subtract"""
+    return (f"IIF({row}.type = 'Income', {row}.amount_cents, "
+            f"IIF({row}.type = 'Expense', -{row}.amount_cents, 0))")
+
+
+def _split_tags_sql(value):
+    """SQL table of the distinct, trimmed names in a tags expression"""
+    return f'''(
+        SELECT DISTINCT {_TAG_NAME_SQL} AS name FROM json_each({_tags_json_sql(value)})
+        WHERE {_TAG_NAME_SQL} != ''
+    )'''
+
+
+# Schema migrations, applied in order. The index of the last applied script
+# (1-based) is stored in PRAGMA user_version, so each runs exactly once.
+MIGRATIONS = [
+    # 1: base schema plus indexes for pagination, dashboard and budgets.
+    # Written with IF NOT EXISTS so databases created before versioning
+    # migrate in place.
+    '''
+    CREATE TABLE IF NOT EXISTS transactions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date TEXT NOT NULL,
+        category TEXT NOT NULL,
+        description TEXT,
+        amount REAL NOT NULL,
+        type TEXT NOT NULL,
+        tags TEXT
+    );
+    
+    CREATE TABLE IF NOT EXISTS budgets (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        category TEXT NOT NULL UNIQUE,
+        amount REAL NOT NULL,
+        period TEXT NOT NULL
+    );
+    
+    -- (date, id) keyset pagination; id is the rowid so it rides along
+    CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions (date);
+    
+    -- Covering indexes: dashboard totals and monthly sums by type, budget
+    -- spend by category, all answered without touching the table
+    CREATE INDEX IF NOT EXISTS idx_transactions_type_date
+        ON transactions (type, date, amount);
+    CREATE INDEX IF NOT EXISTS idx_transactions_category_type_date
+        ON transactions (category, type, date, amount);
+    ''',
+    
+    # 2: full-text index over description, category and tags for search.
+    # External-content table, so the text is stored only once; the
+    # triggers keep it in step with every write.
+    '''
+    CREATE VIRTUAL TABLE transactions_fts USING fts5(
+        description, category, tags,
+        content='transactions', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    );
+    
+    INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild');
+    
+    CREATE TRIGGER transactions_fts_insert AFTER INSERT ON transactions BEGIN
+        INSERT INTO transactions_fts (rowid, description, category, tags)
+        VALUES (NEW.id, NEW.description, NEW.category, NEW.tags);
+    END;
+    
+    CREATE TRIGGER transactions_fts_delete AFTER DELETE ON transactions BEGIN
+        INSERT INTO transactions_fts (transactions_fts, rowid, description, category, tags)
+        VALUES ('delete', OLD.id, OLD.description, OLD.category, OLD.tags);
+    END;
+    
+    CREATE TRIGGER transactions_fts_update
+    AFTER UPDATE OF description, category, tags ON transactions BEGIN
+        INSERT INTO transactions_fts (transactions_fts, rowid, description, category, tags)
+        VALUES ('delete', OLD.id, OLD.description, OLD.category, OLD.tags);
+        INSERT INTO transactions_fts (rowid, description, category, tags)
+        VALUES (NEW.id, NEW.description, NEW.category, NEW.tags);
+    END;
+    ''',
+    
+    # 3: per month/category/type sums and counts, kept exact by triggers so
+    # dashboard and chart aggregates scale with months, not transactions.
+    # Dates strftime() cannot parse are filed under month ''.
+    '''
+    CREATE TABLE monthly_rollups (
+        month TEXT NOT NULL,
+        category TEXT NOT NULL,
+        type TEXT NOT NULL,
+        total REAL NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (month, category, type)
+    ) WITHOUT ROWID;
+    
+    INSERT INTO monthly_rollups (month, category, type, total, count)
+    SELECT IFNULL(strftime('%Y-%m', date), ''), category, type, SUM(amount), COUNT(*)
+    FROM transactions
+    GROUP BY 1, 2, 3;
+    
+    CREATE TRIGGER monthly_rollups_insert AFTER INSERT ON transactions BEGIN
+        INSERT INTO monthly_rollups (month, category, type, total, count)
+        VALUES (IFNULL(strftime('%Y-%m', NEW.date), ''), NEW.category, NEW.type, NEW.amount, 1)
+        ON CONFLICT (month, category, type)
+        DO UPDATE SET total = total + excluded.total, count = count + 1;
+    END;
+    
+    CREATE TRIGGER monthly_rollups_delete AFTER DELETE ON transactions BEGIN
+        UPDATE monthly_rollups SET total = total - OLD.amount, count = count - 1
+        WHERE month = IFNULL(strftime('%Y-%m', OLD.date), '')
+          AND category = OLD.category AND type = OLD.type;
+        DELETE FROM monthly_rollups
+        WHERE month = IFNULL(strftime('%Y-%m', OLD.date), '')
+          AND category = OLD.category AND type = OLD.type AND count = 0;
+    END;
+    
+    CREATE TRIGGER monthly_rollups_update
+    AFTER UPDATE OF date, category, amount, type ON transactions BEGIN
+        UPDATE monthly_rollups SET total = total - OLD.amount, count = count - 1
+        WHERE month = IFNULL(strftime('%Y-%m', OLD.date), '')
+          AND category = OLD.category AND type = OLD.type;
+        DELETE FROM monthly_rollups
+        WHERE month = IFNULL(strftime('%Y-%m', OLD.date), '')
+          AND category = OLD.category AND type = OLD.type AND count = 0;
+        INSERT INTO monthly_rollups (month, category, type, total, count)
+        VALUES (IFNULL(strftime('%Y-%m', NEW.date), ''), NEW.category, NEW.type, NEW.amount, 1)
+        ON CONFLICT (month, category, type)
+        DO UPDATE SET total = total + excluded.total, count = count + 1;
+    END;
+    ''',
+    
+    # 4: optional period anchor per budget (see budget_window)
+    '''
+    ALTER TABLE budgets ADD COLUMN anchor INTEGER;
+    ''',
+    
+    # 5: change journal behind differential backups. One row per changed
+    # transaction or budget, moved to a new seq on every write, so the rows
+    # changed since a snapshot are those logged after the snapshot's
+    # sqlite_sequence value. A random id ties a database's snapshots and
+    # diffs together.
+    '''
+    CREATE TABLE database_info (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        uuid TEXT NOT NULL
+    );
+    
+    INSERT INTO database_info (id, uuid) VALUES (1, lower(hex(randomblob(16))));
+    
+    CREATE TABLE change_log (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        table_name TEXT NOT NULL,
+        row_id INTEGER NOT NULL,
+        UNIQUE (table_name, row_id)
+    );
+    
+    -- Each write drops the row's previous entry, keeping the log one row
+    -- per changed row however often it is edited. (Not INSERT OR REPLACE:
+    -- an UPSERT firing the trigger would override its conflict policy.)
+    CREATE TRIGGER change_log_transactions_insert AFTER INSERT ON transactions BEGIN
+        DELETE FROM change_log WHERE table_name = 'transactions' AND row_id = NEW.id;
+        INSERT INTO change_log (table_name, row_id) VALUES ('transactions', NEW.id);
+    END;
+    
+    CREATE TRIGGER change_log_transactions_update AFTER UPDATE ON transactions BEGIN
+        DELETE FROM change_log
+        WHERE table_name = 'transactions' AND row_id IN (OLD.id, NEW.id);
+        INSERT INTO change_log (table_name, row_id)
+        SELECT 'transactions', OLD.id WHERE OLD.id != NEW.id;
+        INSERT INTO change_log (table_name, row_id) VALUES ('transactions', NEW.id);
+    END;
+    
+    CREATE TRIGGER change_log_transactions_delete AFTER DELETE ON transactions BEGIN
+        DELETE FROM change_log WHERE table_name = 'transactions' AND row_id = OLD.id;
+        INSERT INTO change_log (table_name, row_id) VALUES ('transactions', OLD.id);
+    END;
+    
+    CREATE TRIGGER change_log_budgets_insert AFTER INSERT ON budgets BEGIN
+        DELETE FROM change_log WHERE table_name = 'budgets' AND row_id = NEW.id;
+        INSERT INTO change_log (table_name, row_id) VALUES ('budgets', NEW.id);
+    END;
+    
+    CREATE TRIGGER change_log_budgets_update AFTER UPDATE ON budgets BEGIN
+        DELETE FROM change_log
+        WHERE table_name = 'budgets' AND row_id IN (OLD.id, NEW.id);
+        INSERT INTO change_log (table_name, row_id)
+        SELECT 'budgets', OLD.id WHERE OLD.id != NEW.id;
+        INSERT INTO change_log (table_name, row_id) VALUES ('budgets', NEW.id);
+    END;
+    
+    CREATE TRIGGER change_log_budgets_delete AFTER DELETE ON budgets BEGIN
+        DELETE FROM change_log WHERE table_name = 'budgets' AND row_id = OLD.id;
+        INSERT INTO change_log (table_name, row_id) VALUES ('budgets', OLD.id);
+    END;
+    ''',
+    
+    # 6: normalized tag index. The comma-separated tags field is split as
+    # split_tags does and kept in step by triggers, so filtering and
+    # totals by tag are index lookups. Tags no longer used are dropped.
+    f'''
+    CREATE TABLE tags (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE
+    );
+    
+    -- Keyed by tag first: a tag's transactions are one index range
+    CREATE TABLE transaction_tags (
+        tag_id INTEGER NOT NULL,
+        transaction_id INTEGER NOT NULL,
+        PRIMARY KEY (tag_id, transaction_id)
+    ) WITHOUT ROWID;
+    
+    CREATE INDEX idx_transaction_tags_transaction ON transaction_tags (transaction_id);
+    
+    INSERT INTO tags (name)
+    SELECT DISTINCT {_TAG_NAME_SQL}
+    FROM transactions, json_each({_tags_json_sql('transactions.tags')})
+    WHERE transactions.tags != '' AND {_TAG_NAME_SQL} != '';
+    
+    INSERT INTO transaction_tags (tag_id, transaction_id)
+    SELECT DISTINCT tags.id, transactions.id
+    FROM transactions, json_each({_tags_json_sql('transactions.tags')})
+    JOIN tags ON tags.name = {_TAG_NAME_SQL}
+    WHERE transactions.tags != '';
+    
+    -- No OR IGNORE below: an UPSERT firing the trigger would override it
+    CREATE TRIGGER transaction_tags_insert AFTER INSERT ON transactions
+    WHEN NEW.tags != '' BEGIN
+        INSERT INTO tags (name)
+        SELECT name FROM {_split_tags_sql('NEW.tags')}
+        WHERE name NOT IN (SELECT name FROM tags);
+        INSERT INTO transaction_tags (tag_id, transaction_id)
+        SELECT tags.id, NEW.id FROM {_split_tags_sql('NEW.tags')} AS split
+        JOIN tags ON tags.name = split.name;
+    END;
+    
+    CREATE TRIGGER transaction_tags_delete AFTER DELETE ON transactions
+    WHEN OLD.tags != '' BEGIN
+        DELETE FROM transaction_tags WHERE transaction_id = OLD.id;
+        DELETE FROM tags
+        WHERE name IN (SELECT name FROM {_split_tags_sql('OLD.tags')})
+          AND NOT EXISTS (SELECT 1 FROM transaction_tags WHERE tag_id = tags.id);
+    END;
+    
+    CREATE TRIGGER transaction_tags_update AFTER UPDATE OF id, tags ON transactions BEGIN
+        DELETE FROM transaction_tags WHERE transaction_id = OLD.id;
+        INSERT INTO tags (name)
+        SELECT name FROM {_split_tags_sql('NEW.tags')}
+        WHERE name NOT IN (SELECT name FROM tags);
+        INSERT INTO transaction_tags (tag_id, transaction_id)
+        SELECT tags.id, NEW.id FROM {_split_tags_sql('NEW.tags')} AS split
+        JOIN tags ON tags.name = split.name;
+        DELETE FROM tags
+        WHERE name IN (SELECT name FROM {_split_tags_sql('OLD.tags')})
+          AND NOT EXISTS (SELECT 1 FROM transaction_tags WHERE tag_id = tags.id);
+    END;
+    ''',
+    
+    # 7: exact money and index-friendly dates. amount_cents and day (days
+    # since 1970-01-01) are written alongside amount and date, checked by
+    # the triggers below, and are what sums and date ranges run on. amount
+    # is rounded to whole cents to match. Dates SQLite cannot parse keep a
+    # NULL day and are filed under month ''; new writes must use
+    # YYYY-MM-DD. Rollups are rebuilt in integer cents.
+    '''
+    DROP TRIGGER monthly_rollups_insert;
+    DROP TRIGGER monthly_rollups_delete;
+    DROP TRIGGER monthly_rollups_update;
+    DROP TABLE monthly_rollups;
+    DROP INDEX idx_transactions_type_date;
+    DROP INDEX idx_transactions_category_type_date;
+    
+    ALTER TABLE transactions ADD COLUMN amount_cents INTEGER;
+    ALTER TABLE transactions ADD COLUMN day INTEGER;
+    
+    UPDATE transactions SET
+        amount_cents = CAST(ROUND(amount * 100) AS INTEGER),
+        amount = CAST(ROUND(amount * 100) AS INTEGER) / 100.0,
+        day = CAST(julianday(date(date)) - 2440587.5 AS INTEGER);
+    
+    -- Covering indexes: totals by type and budget spend by category over
+    -- day ranges, answered without touching the table
+    CREATE INDEX idx_transactions_type_day
+        ON transactions (type, day, amount_cents);
+    CREATE INDEX idx_transactions_category_type_day
+        ON transactions (category, type, day, amount_cents);
+    
+    CREATE TABLE monthly_rollups (
+        month TEXT NOT NULL,
+        category TEXT NOT NULL,
+        type TEXT NOT NULL,
+        total_cents INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (month, category, type)
+    ) WITHOUT ROWID;
+    
+    INSERT INTO monthly_rollups (month, category, type, total_cents, count)
+    SELECT IIF(day IS NULL, '', substr(date, 1, 7)), category, type, SUM(amount_cents), COUNT(*)
+    FROM transactions
+    GROUP BY 1, 2, 3;
+    
+    CREATE TRIGGER monthly_rollups_insert AFTER INSERT ON transactions BEGIN
+        INSERT INTO monthly_rollups (month, category, type, total_cents, count)
+        VALUES (IIF(NEW.day IS NULL, '', substr(NEW.date, 1, 7)), NEW.category, NEW.type,
+                NEW.amount_cents, 1)
+        ON CONFLICT (month, category, type)
+        DO UPDATE SET total_cents = total_cents + excluded.total_cents, count = count + 1;
+    END;
+    
+    CREATE TRIGGER monthly_rollups_delete AFTER DELETE ON transactions BEGIN
+        UPDATE monthly_rollups SET total_cents = total_cents - OLD.amount_cents, count = count - 1
+        WHERE month = IIF(OLD.day IS NULL, '', substr(OLD.date, 1, 7))
+          AND category = OLD.category AND type = OLD.type;
+        DELETE FROM monthly_rollups
+        WHERE month = IIF(OLD.day IS NULL, '', substr(OLD.date, 1, 7))
+          AND category = OLD.category AND type = OLD.type AND count = 0;
+    END;
+    
+    CREATE TRIGGER monthly_rollups_update
+    AFTER UPDATE OF date, day, category, amount_cents, type ON transactions BEGIN
+        UPDATE monthly_rollups SET total_cents = total_cents - OLD.amount_cents, count = count - 1
+        WHERE month = IIF(OLD.day IS NULL, '', substr(OLD.date, 1, 7))
+          AND category = OLD.category AND type = OLD.type;
+        DELETE FROM monthly_rollups
+        WHERE month = IIF(OLD.day IS NULL, '', substr(OLD.date, 1, 7))
+          AND category = OLD.category AND type = OLD.type AND count = 0;
+        INSERT INTO monthly_rollups (month, category, type, total_cents, count)
+        VALUES (IIF(NEW.day IS NULL, '', substr(NEW.date, 1, 7)), NEW.category, NEW.type,
+                NEW.amount_cents, 1)
+        ON CONFLICT (month, category, type)
+        DO UPDATE SET total_cents = total_cents + excluded.total_cents, count = count + 1;
+    END;
+    
+    -- Write-time validation, mirrored by storage_row() in Python. Rows
+    -- with older unparseable dates can still be updated if the date is
+    -- left alone.
+    CREATE TRIGGER transactions_validate_insert BEFORE INSERT ON transactions BEGIN
+        SELECT RAISE(ABORT, 'date must be a valid YYYY-MM-DD date')
+        WHERE date(NEW.date) IS NOT NEW.date;
+        SELECT RAISE(ABORT, 'amount_cents and day must match amount and date')
+        WHERE NEW.amount_cents IS NULL OR NEW.amount IS NOT NEW.amount_cents / 100.0
+           OR NEW.day IS NOT CAST(julianday(date(NEW.date)) - 2440587.5 AS INTEGER);
+    END;
+    
+    CREATE TRIGGER transactions_validate_update
+    BEFORE UPDATE OF date, amount, amount_cents, day ON transactions BEGIN
+        SELECT RAISE(ABORT, 'date must be a valid YYYY-MM-DD date')
+        WHERE NEW.date IS NOT OLD.date AND date(NEW.date) IS NOT NEW.date;
+        SELECT RAISE(ABORT, 'amount_cents and day must match amount and date')
+        WHERE NEW.amount_cents IS NULL OR NEW.amount IS NOT NEW.amount_cents / 100.0
+           OR NEW.day IS NOT CAST(julianday(date(NEW.date)) - 2440587.5 AS INTEGER);
+    END;
+    ''',
+    
+    # 8: each day's net change in balance, for running balances. The
+    # balance at the end of a day is the sum over all days up to it;
+    # balances.BalanceIndex keeps those prefix sums. Undated transactions
+    # are left out.
+    f'''
+    CREATE TABLE daily_balances (
+        day INTEGER PRIMARY KEY,
+        net_cents INTEGER NOT NULL,
+        count INTEGER NOT NULL
+    );
+    
+    INSERT INTO daily_balances (day, net_cents, count)
+    SELECT day, SUM({_signed_cents_sql('transactions')}), COUNT(*)
+    FROM transactions
+    WHERE day IS NOT NULL
+    GROUP BY day;
+    
+    CREATE TRIGGER daily_balances_insert AFTER INSERT ON transactions
+    WHEN NEW.day IS NOT NULL BEGIN
+        INSERT INTO daily_balances (day, net_cents, count)
+        VALUES (NEW.day, {_signed_cents_sql('NEW')}, 1)
+        ON CONFLICT (day)
+        DO UPDATE SET net_cents = net_cents + excluded.net_cents, count = count + 1;
+    END;
+    
+    CREATE TRIGGER daily_balances_delete AFTER DELETE ON transactions
+    WHEN OLD.day IS NOT NULL BEGIN
+        UPDATE daily_balances SET net_cents = net_cents - {_signed_cents_sql('OLD')},
+                                  count = count - 1
+        WHERE day = OLD.day;
+        DELETE FROM daily_balances WHERE day = OLD.day AND count = 0;
+    END;
+    
+    CREATE TRIGGER daily_balances_update
+    AFTER UPDATE OF day, amount_cents, type ON transactions BEGIN
+        UPDATE daily_balances SET net_cents = net_cents - {_signed_cents_sql('OLD')},
+                                  count = count - 1
+        WHERE day = OLD.day;
+        DELETE FROM daily_balances WHERE day = OLD.day AND count = 0;
+        INSERT INTO daily_balances (day, net_cents, count)
+        SELECT NEW.day, {_signed_cents_sql('NEW')}, 1
+        WHERE NEW.day IS NOT NULL
+        ON CONFLICT (day)
+        DO UPDATE SET net_cents = net_cents + excluded.net_cents, count = count + 1;
+    END;
+    ''',
+    
+    # 9: closed years moved out to archive files (see archive.py), named
+    # relative to the database's directory
+    '''
+    CREATE TABLE archives (
+        year INTEGER PRIMARY KEY,
+        file TEXT NOT NULL,
+        count INTEGER NOT NULL
+    );
+    ''',
+    
+    # 10: (sort key, id) indexes for every sortable transactions column, so
+    # keyset pages in any sort order are index range scans. Expressions
+    # match TransactionPager.SORT_COLUMNS exactly; date is covered by
+    # idx_transactions_date, which carries the rowid.
+    '''
+    CREATE INDEX idx_transactions_category_id ON transactions (category, id);
+    CREATE INDEX idx_transactions_description_id
+        ON transactions (IFNULL(description, ''), id);
+    CREATE INDEX idx_transactions_amount_id ON transactions (amount, id);
+    CREATE INDEX idx_transactions_type_id ON transactions (type, id);
+    CREATE INDEX idx_transactions_tags_id ON transactions (IFNULL(tags, ''), id);
+    ''',
+]
+
+
+def migrate_database(conn):
+    """Bring the database schema up to the latest version"""
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    
+    for target in range(version + 1, len(MIGRATIONS) + 1):
+        # Each migration and its version bump commit atomically
+        try:
+            conn.executescript(f'''
+                BEGIN;
+                {MIGRATIONS[target - 1]}
+                PRAGMA user_version = {target};
+                COMMIT;
+            ''')
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+
+
+# Settings applied to every connection. WAL lets readers run alongside the
+# writer; with it, synchronous=NORMAL is still safe against corruption and
+# only risks the last commits on power loss.
+BUSY_TIMEOUT_MS = 5000
+CACHE_SIZE_KIB = 64 * 1024
+MMAP_SIZE = 256 * 1024 * 1024
+STATEMENT_CACHE_SIZE = 256
+
+
+def connect(database=DATABASE_FILE, readonly=False):
+    """Open a tuned connection; readonly ones refuse writes"""
+    conn = sqlite3.connect(database, timeout=BUSY_TIMEOUT_MS / 1000,
+                           cached_statements=STATEMENT_CACHE_SIZE,
+                           factory=perf.connection_factory())
+    if not readonly:
+        # Stored in the database file, so readers pick it up too
+        conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+    conn.execute(f'PRAGMA cache_size = -{CACHE_SIZE_KIB}')
+    conn.execute(f'PRAGMA mmap_size = {MMAP_SIZE}')
+    conn.execute('PRAGMA temp_store = MEMORY')
+    if readonly:
+        conn.execute('PRAGMA query_only = ON')
+    return conn
+
+
+class ConnectionManager:
+    """One writer connection plus a read-only connection per thread.
+    
+    The writer is opened (and the schema migrated) up front and belongs to
+    the creating thread. Background jobs that must write, like bulk
+    imports, open their own connection with connect(); SQLite serializes
+    them with the writer, waiting up to busy_timeout. Under WAL, readers
+    see the last committed state and never wait for a writer.
+    """
+    
+    def __init__(self, database=DATABASE_FILE):
+        self.database = database
+        self.writer = connect(database)
+        migrate_database(self.writer)
+        
+        self.local = threading.local()
+    
+    def reader(self):
+        """The calling thread's read-only connection, opened on first use"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = connect(self.database, readonly=True)
+            self.local.conn = conn
+        return conn
+    
+    def close_reader(self):
+        """Close the calling thread's read connection, if it has one"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None:
+            self.local.conn = None
+            conn.close()
+    
+    def close(self):
+        """Close the writer; reader threads must have closed theirs"""
+        self.writer.close()
@@ -0,0 +1,135 @@
+"""Streaming CSV, JSON and NDJSON export"""
+import csv
+import gzip
+import json
+from datetime import datetime
+
+from .archive import history, history_select
+from .db import connect
+from .transactions import TRANSACTION_COLUMNS
+
+
+def open_export(path):
+    """Open an export file for writing text, gzip-compressed when the
+    name ends in .gz"""
+    if path.lower().endswith('.gz'):
+        return gzip.open(path, 'wt', encoding='utf-8', newline='', compresslevel=6)
+    return open(path, 'w', encoding='utf-8', newline='')
+
+
+def iter_rows(cursor, query, params=(), size=1000):
+    """Yield query rows a fetchmany batch at a time"""
+    cursor.execute(query, params)
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        yield from rows
+
+
+# Record kind, field names and query for each exported table; {transactions}
+# is the history_select() of the transaction columns, archived years included
+EXPORT_SECTIONS = [
+    ('transaction', ('id', 'date', 'category', 'description', 'amount', 'type', 'tags'),
+     '{transactions} ORDER BY date DESC'),
+    ('budget', ('id', 'category', 'amount', 'period', 'anchor'),
+     'SELECT * FROM budgets'),
+]
+
+
+def export_csv_file(database, path, progress=None):
+    """Stream all transactions to a CSV file (.csv.gz for gzip)"""
+    conn = connect(database, readonly=True)
+    try:
+        # Archives are attached before the read transaction begins
+        source = history(conn)
+        select = history_select(conn, TRANSACTION_COLUMNS)
+        cursor = conn.cursor()
+        # One read transaction keeps the count and the rows in step
+        cursor.execute('BEGIN')
+        total = cursor.execute(f'SELECT COUNT(*) FROM {source}').fetchone()[0]
+        
+        written = 0
+        with open_export(path) as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(['ID', 'Date', 'Category', 'Description', 'Amount', 'Type', 'Tags'])
+            
+            cursor.execute(f'{select} ORDER BY date DESC')
+            while True:
+                rows = cursor.fetchmany(1000)
+                if not rows:
+                    break
+                writer.writerows(rows)
+                written += len(rows)
+                if progress is not None:
+                    progress(written, total)
+        
+        conn.rollback()
+    finally:
+        conn.close()
+    
+    return written
+
+
+def export_json_file(database, path, progress=None):
+    """Stream transactions and budgets to a JSON export document, or to
+    NDJSON for .ndjson/.jsonl names (either optionally ending in .gz).
+    
+    NDJSON lines carry a "record" field naming their kind, which is the
+    format import_file_parallel reads back.
+    """
+    name = path[:-3] if path.lower().endswith('.gz') else path
+    ndjson = name.lower().endswith(('.ndjson', '.jsonl'))
+    
+    conn = connect(database, readonly=True)
+    try:
+        # Archives are attached before the read transaction begins
+        source = history(conn)
+        select = history_select(conn, TRANSACTION_COLUMNS)
+        cursor = conn.cursor()
+        # One read transaction keeps both tables consistent with each other
+        cursor.execute('BEGIN')
+        total = cursor.execute(f'''
+            SELECT (SELECT COUNT(*) FROM {source}) + (SELECT COUNT(*) FROM budgets)
+        ''').fetchone()[0]
+        
+        written = 0
+        with open_export(path) as out:
+            if not ndjson:
+                # Written piecewise in the layout json.dump(indent=2) gives
+                out.write('{\n  "export_date": %s' % json.dumps(datetime.now().isoformat()))
+            
+            for kind, fields, query in EXPORT_SECTIONS:
+                if not ndjson:
+                    out.write(',\n  "%ss": [' % kind)
+                separator = '\n    '
+                closing = ']'
+                
+                for row in iter_rows(cursor, query.format(transactions=select)):
+                    record = dict(zip(fields, row))
+                    if ndjson:
+                        out.write(json.dumps({'record': kind, **record}, ensure_ascii=False))
+                        out.write('\n')
+                    else:
+                        out.write(separator)
+                        out.write(json.dumps(record, ensure_ascii=False))
+                        separator = ',\n    '
+                        closing = '\n  ]'
+                    
+                    written += 1
+                    if progress is not None and written % 10000 == 0:
+                        progress(written, total)
+                
+                if not ndjson:
+                    out.write(closing)
+            
+            if not ndjson:
+                out.write('\n}\n')
+        
+        conn.rollback()
+    finally:
+        conn.close()
+    
+    if progress is not None:
+        progress(written, total)
+    return written
@@ -0,0 +1,168 @@
+"""Spend forecasts per category from the monthly rollups.
+
+Expense totals form one category x month matrix, so every category is
+fitted at once with array operations. Each forecast is a linear trend
+over recent months plus a seasonal offset per calendar month.
+"""
+import calendar
+from datetime import date, timedelta
+
+import numpy as np
+
+
+# History the seasonal offsets are averaged over
+HISTORY_MONTHS = 120
+
+# Recent months the trend line is fitted to
+TREND_MONTHS = 24
+
+# Months forecast from the current one, enough for a yearly budget
+HORIZON_MONTHS = 13
+
+
+def month_index(year, month):
+    """Months since year 0, so consecutive months differ by one"""
+    return year * 12 + month - 1
+
+
+def moving_average(values, width):
+    """Centred moving average along the last axis; NaN where the window
+    does not fit. An even width averages two neighbouring windows."""
+    padded = np.concatenate([np.zeros(values.shape[:-1] + (1,)), np.cumsum(values, axis=-1)],
+                            axis=-1)
+    windows = (padded[..., width:] - padded[..., :-width]) / width
+    result = np.full(values.shape, np.nan)
+    if width % 2:
+        result[..., width // 2:width // 2 + windows.shape[-1]] = windows
+    elif windows.shape[-1] > 1:
+        result[..., width // 2:width // 2 + windows.shape[-1] - 1] = (windows[..., 1:] +
+                                                                        windows[..., :-1]) / 2
+    return result
+
+
+def seasonal_offsets(history, active, calendar_months):
+    """Average deviation of each calendar month from the 2x12 moving
+    average, per row of history, centred on zero. Only windows within a
+    row's active months count; rows with a calendar month never seen get
+    no offsets."""
+    deviations = history - moving_average(history, 12)
+    within = np.zeros_like(active)
+    within[:, 6:] = active[:, :-6]
+    seen = ~np.isnan(deviations) & within
+    
+    # (rows x months) @ (months x 12) one-hot sums per calendar month
+    one_hot = np.eye(12)[calendar_months]
+    sums = np.where(seen, deviations, 0) @ one_hot
+    counts = seen.astype(float) @ one_hot
+    
+    offsets = np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+    offsets -= offsets.mean(axis=1, keepdims=True)
+    offsets[(counts == 0).any(axis=1)] = 0
+    return offsets
+
+
+def linear_trend(values, active):
+    """Least-squares (intercept, slope) per row over its active months,
+    with months numbered from 0. Rows with fewer than two active months
+    get their mean and no slope."""
+    x = np.arange(values.shape[1], dtype=float)
+    weights = active.astype(float)
+    n = weights.sum(axis=1)
+    sx = weights @ x
+    sy = (weights * values).sum(axis=1)
+    sxx = weights @ (x * x)
+    sxy = (weights * values) @ x
+    
+    denominator = n * sxx - sx * sx
+    fitted = denominator > 0
+    slope = np.divide(n * sxy - sx * sy, denominator, out=np.zeros_like(n), where=fitted)
+    intercept = np.divide(sy - slope * sx, n, out=np.zeros_like(n), where=n > 0)
+    return intercept, slope
+
+
+class SpendForecast:
+    """Expected expense cents per category for the current month and the
+    HORIZON_MONTHS - 1 after it"""
+    
+    def __init__(self, categories, first_month, cents):
+        self.categories = categories
+        self.first_month = first_month
+        self.cents = cents
+        self.rows = {category: row for row, category in enumerate(categories)}
+    
+    def project(self, budgets, today):
+        """Expected spend of each BudgetStatus by the end of its period:
+        what is spent so far plus the forecast for the days left, each
+        month's forecast spread evenly over its days"""
+        if not budgets:
+            return []
+        
+        # Weight of each forecast month in the rest of each budget window
+        weights = np.zeros((len(budgets), self.cents.shape[1]))
+        for position, budget in enumerate(budgets):
+            start = max(date.fromisoformat(budget.start), today + timedelta(days=1))
+            end = date.fromisoformat(budget.end)
+            while start < end:
+                month_end = (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+                column = month_index(start.year, start.month) - self.first_month
+                if column >= weights.shape[1]:
+                    break
+                days = calendar.monthrange(start.year, start.month)[1]
+                weights[position, column] += (min(month_end, end) - start).days / days
+                start = month_end
+        
+        # Categories without history forecast nothing
+        rows = np.array([self.rows.get(budget.category, -1) for budget in budgets])
+        cents = np.vstack([self.cents, np.zeros((1, self.cents.shape[1]))])[rows]
+        remaining = (weights * cents).sum(axis=1) / 100
+        return [budget.spent + float(extra) for budget, extra in zip(budgets, remaining)]
+
+
+def forecast_spend(cursor, today=None):
+    """Forecast every category's expenses from complete months of history"""
+    today = today or date.today()
+    current = month_index(today.year, today.month)
+    first = current - HISTORY_MONTHS
+    
+    # Columns of the history matrix, numbered from the first month
+    cursor.execute('''
+        SELECT substr(month, 1, 4) * 12 + substr(month, 6, 2) - 1 - ?, category, total_cents
+        FROM monthly_rollups
+        WHERE type = 'Expense' AND month >= ? AND month < ?
+    ''', (first, f"{first // 12:04d}-{first % 12 + 1:02d}", today.strftime('%Y-%m')))
+    rows = cursor.fetchall()
+    
+    categories = {}
+    if rows:
+        columns, names, cents = zip(*rows)
+        for name in sorted(set(names)):
+            categories[name] = len(categories)
+        codes = np.fromiter(map(categories.__getitem__, names), np.int64, len(names))
+        
+        history = np.bincount(codes * HISTORY_MONTHS + np.array(columns),
+                              weights=np.array(cents, dtype=float),
+                              minlength=len(categories) * HISTORY_MONTHS)
+        history = history.reshape(len(categories), HISTORY_MONTHS)
+    else:
+        history = np.zeros((0, HISTORY_MONTHS))
+    
+    # A category counts from its first month with expenses
+    spent = history != 0
+    started = np.cumsum(spent, axis=1) > 0
+    
+    calendar_months = np.arange(first, current) % 12
+    offsets = seasonal_offsets(history, started, calendar_months)
+    adjusted = history - offsets[:, calendar_months]
+    
+    recent = np.arange(HISTORY_MONTHS) >= HISTORY_MONTHS - TREND_MONTHS
+    intercept, slope = linear_trend(adjusted, started & recent)
+    
+    ahead = np.arange(HISTORY_MONTHS, HISTORY_MONTHS + HORIZON_MONTHS)
+    cents = (intercept[:, None] + slope[:, None] * ahead +
+             offsets[:, np.arange(current, current + HORIZON_MONTHS) % 12])
+    cents = np.maximum(cents, 0)
+    
+    names = [None] * len(categories)
+    for name, code in categories.items():
+        names[code] = name
+    return SpendForecast(names, current, cents)
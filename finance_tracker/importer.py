@@ -0,0 +1,393 @@
+"""CSV, JSON and NDJSON import, serial and multi-process"""
+import csv
+import io
+import json
+import math
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from .db import CATEGORIES, TRANSACTION_TYPES, BUDGET_PERIODS, BUDGET_ANCHOR_LIMITS, connect
+from .transactions import storage_row
+
+
+class ImportReport:
+    """Outcome of an import: rows written and rows rejected"""
+    
+    # Rejected rows kept with their reason; the rest are only counted
+    MAX_ERRORS = 100
+    
+    def __init__(self):
+        self.imported = 0
+        self.budgets = 0
+        self.failed = 0
+        self.errors = []
+    
+    def reject(self, line, message):
+        """Record a row that could not be imported"""
+        self.failed += 1
+        if len(self.errors) < self.MAX_ERRORS:
+            self.errors.append((line, message))
+
+
+# Lower-cased spellings of the known categories and types
+_CATEGORY_NAMES = {category.lower(): category for category in CATEGORIES}
+_TYPE_NAMES = {trans_type.lower(): trans_type for trans_type in TRANSACTION_TYPES}
+
+
+def parse_transaction(date, category, description, amount, trans_type, tags):
+    """Validate one imported record, returning the row to insert"""
+    if not all([date, category, amount, trans_type]):
+        raise ValueError("missing date, category, amount or type")
+    
+    trans_type = _TYPE_NAMES.get(str(trans_type).strip().lower())
+    if trans_type is None:
+        raise ValueError("type must be Income or Expense")
+    
+    # Known categories are matched regardless of case and spacing
+    category = str(category).strip()
+    category = _CATEGORY_NAMES.get(category.lower(), category)
+    
+    return storage_row((str(date).strip(), category, description or '', amount,
+                        trans_type, tags or ''))
+
+
+def parse_budget(category, amount, period, anchor=None):
+    """Validate one imported budget, returning the row to upsert"""
+    if not all([category, amount, period]):
+        raise ValueError("missing budget category, amount or period")
+    
+    try:
+        amount = float(amount)
+        anchor = int(anchor) if anchor not in (None, '') else None
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid budget amount {amount!r} or start {anchor!r}")
+    
+    if not math.isfinite(amount) or amount <= 0:
+        raise ValueError(f"budget amount must be positive, not {amount!r}")
+    if period not in BUDGET_PERIODS:
+        raise ValueError(f"unknown budget period {period!r}")
+    if anchor is not None and not 1 <= anchor <= BUDGET_ANCHOR_LIMITS[period]:
+        raise ValueError(f"budget start {anchor} out of range for a {period} budget "
+                         f"(1-{BUDGET_ANCHOR_LIMITS[period]})")
+    
+    return (str(category).strip(), amount, period, anchor)
+
+
+def insert_batch(conn, batch):
+    """Insert parsed rows in a single transaction"""
+    with conn:
+        conn.executemany('''
+            INSERT INTO transactions (date, category, description, amount, type, tags,
+                                      amount_cents, day)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', batch)
+
+
+def upsert_budgets(conn, budgets):
+    """Insert or update parsed budgets, keyed by category"""
+    with conn:
+        conn.executemany('''
+            INSERT INTO budgets (category, amount, period, anchor)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (category) DO UPDATE SET
+                amount = excluded.amount, period = excluded.period,
+                anchor = excluded.anchor
+        ''', budgets)
+
+
+def import_csv_file(database, path, progress=None, batch_size=5000):
+    """Stream a CSV file into the transactions table.
+    
+    Rows are parsed as they are read and written with executemany, one
+    transaction per batch, on a dedicated connection with synchronous
+    turned off for the duration. Invalid rows are skipped and recorded in
+    the returned ImportReport. progress, if given, is called after every
+    batch with (bytes read, total bytes, rows imported, rows failed).
+    """
+    report = ImportReport()
+    total = os.path.getsize(path)
+    
+    conn = connect(database)
+    synchronous = conn.execute('PRAGMA synchronous').fetchone()[0]
+    conn.execute('PRAGMA synchronous = OFF')
+    
+    try:
+        # utf-8-sig drops the byte order mark spreadsheet exports often add
+        with open(path, 'r', encoding='utf-8-sig', newline='') as csvfile:
+            reader = csv.DictReader(csvfile)
+            batch = []
+            
+            for row in reader:
+                try:
+                    batch.append(parse_transaction(
+                        row.get('Date'), row.get('Category'), row.get('Description'),
+                        row.get('Amount'), row.get('Type'), row.get('Tags')
+                    ))
+                except ValueError as e:
+                    report.reject(reader.line_num, str(e))
+                    continue
+                
+                if len(batch) >= batch_size:
+                    insert_batch(conn, batch)
+                    report.imported += len(batch)
+                    batch = []
+                    if progress is not None:
+                        progress(csvfile.buffer.tell(), total, report.imported, report.failed)
+            
+            if batch:
+                insert_batch(conn, batch)
+                report.imported += len(batch)
+        
+        if progress is not None:
+            progress(total, total, report.imported, report.failed)
+    finally:
+        conn.execute(f'PRAGMA synchronous = {synchronous}')
+        conn.close()
+    
+    return report
+
+
+def import_json_file(database, path, progress=None, batch_size=5000):
+    """Import transactions and budgets from a JSON export document.
+    
+    The document has to be loaded whole; rows are then validated and
+    written in batches like import_csv_file, with invalid ones recorded
+    (by their position in the document) instead of stopping the import.
+    """
+    report = ImportReport()
+    with open(path, 'r', encoding='utf-8') as jsonfile:
+        data = json.load(jsonfile)
+    
+    transactions = data.get('transactions', [])
+    conn = connect(database)
+    
+    try:
+        batch = []
+        for index, trans in enumerate(transactions, 1):
+            try:
+                batch.append(parse_transaction(
+                    trans.get('date'), trans.get('category'), trans.get('description'),
+                    trans.get('amount'), trans.get('type'), trans.get('tags')
+                ))
+            except (AttributeError, ValueError) as e:
+                report.reject(f"transaction {index}", str(e))
+                continue
+            
+            if len(batch) >= batch_size:
+                insert_batch(conn, batch)
+                report.imported += len(batch)
+                batch = []
+                if progress is not None:
+                    progress(index, len(transactions), report.imported, report.failed)
+        
+        if batch:
+            insert_batch(conn, batch)
+            report.imported += len(batch)
+        
+        budgets = []
+        for index, budget in enumerate(data.get('budgets', []), 1):
+            try:
+                budgets.append(parse_budget(
+                    budget.get('category'), budget.get('amount'),
+                    budget.get('period'), budget.get('anchor')
+                ))
+            except (AttributeError, ValueError) as e:
+                report.reject(f"budget {index}", str(e))
+        
+        upsert_budgets(conn, budgets)
+        report.budgets = len(budgets)
+    finally:
+        conn.close()
+    
+    if progress is not None:
+        progress(len(transactions), len(transactions), report.imported, report.failed)
+    return report
+
+
+# Files at least this large are parsed in parallel by import_file_parallel
+PARALLEL_IMPORT_MIN_BYTES = 32 * 1024 * 1024
+
+
+def find_record_ranges(path, start, chunk_size):
+    """Split a file from start into byte ranges of about chunk_size that
+    each begin at the start of a line"""
+    size = os.path.getsize(path)
+    ranges = []
+    
+    with open(path, 'rb') as f:
+        while start < size:
+            end = min(start + chunk_size, size)
+            if end < size:
+                # Extend the range to the end of the line it cuts through
+                f.seek(end)
+                f.readline()
+                end = f.tell()
+            ranges.append((start, end))
+            start = end
+    
+    return ranges
+
+
+def has_multiline_fields(path, start, block_size=8 * 1024 * 1024):
+    """Check whether a CSV file holds a quoted field with a line break in
+    it from start on. Quotes inside fields are doubled, so that is the
+    case exactly when some line has an odd number of quote characters."""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        partial = b''
+        for block in iter(lambda: f.read(block_size), b''):
+            lines = (partial + block).split(b'\n')
+            partial = lines.pop()
+            if any(line.count(b'"') % 2 for line in lines):
+                return True
+    return partial.count(b'"') % 2 == 1
+
+
+def read_range(path, start, end):
+    """Read and decode the bytes in [start, end) of a file"""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        return f.read(end - start).decode('utf-8')
+
+
+def parse_csv_range(path, start, end, fieldnames):
+    """Parse one byte range of a CSV file in a worker process.
+    Returns (rows, budgets, errors, lines), with error line numbers
+    relative to the start of the range."""
+    reader = csv.DictReader(io.StringIO(read_range(path, start, end), newline=''),
+                            fieldnames=fieldnames)
+    rows = []
+    errors = []
+    
+    for row in reader:
+        try:
+            rows.append(parse_transaction(
+                row.get('Date'), row.get('Category'), row.get('Description'),
+                row.get('Amount'), row.get('Type'), row.get('Tags')
+            ))
+        except ValueError as e:
+            errors.append((reader.line_num, str(e)))
+    
+    return rows, [], errors, reader.line_num
+
+
+def parse_ndjson_range(path, start, end):
+    """Parse one byte range of an NDJSON file in a worker process. Lines
+    with "record": "budget" are budgets; all others are transactions."""
+    rows = []
+    budgets = []
+    errors = []
+    lines = 0
+    
+    for lines, line in enumerate(read_range(path, start, end).splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            if record.get('record') == 'budget':
+                budgets.append(parse_budget(
+                    record.get('category'), record.get('amount'),
+                    record.get('period'), record.get('anchor')
+                ))
+            else:
+                rows.append(parse_transaction(
+                    record.get('date'), record.get('category'), record.get('description'),
+                    record.get('amount'), record.get('type'), record.get('tags')
+                ))
+        except (AttributeError, ValueError) as e:
+            errors.append((lines, str(e)))
+    
+    return rows, budgets, errors, lines
+
+
+def import_file_parallel(database, path, progress=None, workers=None,
+                         chunk_size=8 * 1024 * 1024):
+    """Import a CSV or NDJSON (.ndjson/.jsonl) file, parsing it in parallel.
+    
+    The file is split into byte ranges aligned to line starts, so every
+    record must sit on a single line; CSV files with quoted line breaks
+    are handed to import_csv_file instead. A process pool parses and
+    validates the ranges while this thread, the only writer, inserts each
+    range's rows in file order, one transaction per range. workers=1
+    parses in this process instead.
+    """
+    report = ImportReport()
+    size = os.path.getsize(path)
+    workers = workers or os.cpu_count() or 1
+    
+    if path.lower().endswith(('.ndjson', '.jsonl')):
+        ranges = find_record_ranges(path, 0, chunk_size)
+        parse, extra = parse_ndjson_range, ()
+        line = 0
+    else:
+        with open(path, 'rb') as f:
+            header = f.readline()
+        if has_multiline_fields(path, len(header)):
+            return import_csv_file(database, path, progress=progress)
+        fieldnames = next(csv.reader([header.decode('utf-8-sig')]))
+        ranges = find_record_ranges(path, len(header), chunk_size)
+        parse, extra = parse_csv_range, (fieldnames,)
+        line = 1
+    
+    conn = connect(database)
+    synchronous = conn.execute('PRAGMA synchronous').fetchone()[0]
+    conn.execute('PRAGMA synchronous = OFF')
+    
+    # Spawned workers start clean instead of inheriting Tk and threads
+    pool = None
+    if workers > 1 and len(ranges) > 1:
+        pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+    
+    try:
+        if pool is None:
+            results = (parse(path, start, end, *extra) for start, end in ranges)
+        else:
+            results = _ordered_results(pool, parse, path, ranges, extra, workers * 2)
+        
+        budgets = []
+        for (start, end), (rows, range_budgets, errors, lines) in zip(ranges, results):
+            for error_line, message in errors:
+                report.reject(line + error_line, message)
+            line += lines
+            
+            if rows:
+                insert_batch(conn, rows)
+                report.imported += len(rows)
+            budgets.extend(range_budgets)
+            
+            if progress is not None:
+                progress(end, size, report.imported, report.failed)
+        
+        if budgets:
+            upsert_budgets(conn, budgets)
+            report.budgets = len(budgets)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        conn.execute(f'PRAGMA synchronous = {synchronous}')
+        conn.close()
+    
+    if progress is not None:
+        progress(size, size, report.imported, report.failed)
+    return report
+
+
+def _ordered_results(pool, parse, path, ranges, extra, window):
+    """Yield parse results in range order, keeping at most window ranges
+    in flight so parsed rows never pile up faster than they are written"""
+    pending = deque()
+    ranges = iter(ranges)
+    
+    for start, end in ranges:
+        pending.append(pool.submit(parse, path, start, end, *extra))
+        if len(pending) >= window:
+            break
+    
+    while pending:
+        result = pending.popleft().result()
+        for start, end in ranges:
+            pending.append(pool.submit(parse, path, start, end, *extra))
+            break
+        yield result
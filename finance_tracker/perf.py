@@ -0,0 +1,373 @@
+"""Opt-in timing of SQL statements and refresh paths.
+
+Nothing is measured until enable() installs a PerfRecorder. From then on
+connections opened by db.connect() time every statement they run, with
+its row count, and span() times any block of code. Per operation the
+recorder keeps a rolling window of timings for p50/p95 figures and a
+bounded trace, exportable as Chrome trace JSON (chrome://tracing or
+https://ui.perfetto.dev). Statements slower than a threshold are logged
+with their EXPLAIN QUERY PLAN.
+"""
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+
+
+# Timings per operation the percentiles are taken over
+ROLLING_WINDOW = 500
+
+# Events kept for trace export; the oldest are dropped first
+TRACE_LIMIT = 50000
+
+# Statements at least this slow are logged with their query plan
+SLOW_QUERY_MS = 100
+SLOW_QUERY_LIMIT = 50
+
+# Operation names of SQL statements are their text, cut to this length
+SQL_NAME_LENGTH = 120
+
+recorder = None
+
+
+def percentile(ordered, fraction):
+    """Linearly interpolated percentile of sorted values"""
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class PerfRecorder:
+    """Timings of named operations, safe to share between threads.
+    
+    slow_log, if given, is a text stream each slow statement is written
+    to as it happens, besides being kept in slow_queries.
+    """
+    
+    def __init__(self, slow_query_ms=SLOW_QUERY_MS, slow_log=None):
+        self.slow_query_ms = slow_query_ms
+        self.slow_log = slow_log
+        self.lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        """Forget everything recorded so far"""
+        with self.lock:
+            self.began = time.perf_counter()
+            # Operation -> [count, deque of (ms, rows)]
+            self.operations = {}
+            self.trace = deque(maxlen=TRACE_LIMIT)
+            self.slow_queries = deque(maxlen=SLOW_QUERY_LIMIT)
+    
+    def record(self, name, start, seconds, rows=None, category='code', thread=None):
+        """Record one operation that began at perf_counter() time start"""
+        ms = seconds * 1000
+        thread = thread or threading.current_thread().name
+        with self.lock:
+            operation = self.operations.get(name)
+            if operation is None:
+                operation = self.operations[name] = [0, deque(maxlen=ROLLING_WINDOW)]
+            operation[0] += 1
+            operation[1].append((ms, rows))
+            self.trace.append((name, category, start, seconds, rows, thread))
+    
+    def record_slow_query(self, sql, ms, rows, plan):
+        """Keep (and log) a slow statement with its query plan lines"""
+        entry = {'sql': sql, 'ms': round(ms, 3), 'rows': rows, 'plan': plan,
+                 'time': time.time()}
+        with self.lock:
+            self.slow_queries.append(entry)
+        if self.slow_log is not None:
+            lines = [f"Slow query ({ms:.1f} ms, {rows} rows): {sql}"]
+            lines.extend('    ' + line for line in plan)
+            print('\n'.join(lines), file=self.slow_log, flush=True)
+    
+    def summary(self):
+        """Per operation figures over its rolling window, slowest total first"""
+        with self.lock:
+            operations = [(name, count, list(samples))
+                          for name, (count, samples) in self.operations.items()]
+        
+        summary = []
+        for name, count, samples in operations:
+            ordered = sorted(ms for ms, _ in samples)
+            rows = [rows for _, rows in samples if rows is not None]
+            summary.append({
+                'operation': name,
+                'count': count,
+                'p50_ms': round(percentile(ordered, 0.50), 3),
+                'p95_ms': round(percentile(ordered, 0.95), 3),
+                'max_ms': round(ordered[-1], 3),
+                'mean_rows': round(sum(rows) / len(rows), 1) if rows else None,
+                'window_ms': round(sum(ordered), 3),
+            })
+        summary.sort(key=lambda entry: entry['window_ms'], reverse=True)
+        return summary
+    
+    def export_trace(self, path):
+        """Write the trace as Chrome trace event JSON, with the summary and
+        slow queries under otherData"""
+        with self.lock:
+            trace = list(self.trace)
+            slow_queries = list(self.slow_queries)
+        
+        pid = os.getpid()
+        threads = {}
+        events = []
+        for name, category, start, seconds, rows, thread in trace:
+            tid = threads.setdefault(thread, len(threads) + 1)
+            event = {'name': name, 'cat': category, 'ph': 'X', 'pid': pid, 'tid': tid,
+                     'ts': round((start - self.began) * 1e6, 1),
+                     'dur': round(seconds * 1e6, 1)}
+            if rows is not None:
+                event['args'] = {'rows': rows}
+            events.append(event)
+        for thread, tid in threads.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                           'args': {'name': thread}})
+        
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms',
+                       'otherData': {'summary': self.summary(), 'slow_queries': slow_queries}}, f)
+        return len(trace)
+
+
+class Span:
+    """Times a with block; set rows inside it to record a row count"""
+    
+    __slots__ = ('name', 'rows', 'start')
+    
+    def __init__(self, name):
+        self.name = name
+        self.rows = None
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc_info):
+        if recorder is not None:
+            recorder.record(self.name, self.start, time.perf_counter() - self.start, self.rows)
+
+
+class _NullSpan:
+    """Stands in for Span while recording is off"""
+    
+    __slots__ = ('rows',)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name):
+    """Time a with block under name, if recording is on"""
+    return _NULL_SPAN if recorder is None else Span(name)
+
+
+def timed(name):
+    """Decorator timing each call of a function under name"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if recorder is None:
+                return func(*args, **kwargs)
+            with Span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def enable(slow_query_ms=SLOW_QUERY_MS, slow_log=None):
+    """Start recording; only connections opened from now on are timed"""
+    global recorder
+    if recorder is None:
+        recorder = PerfRecorder(slow_query_ms, slow_log)
+    return recorder
+
+
+def sql_name(sql):
+    """Operation name of a statement: its text on one line, shortened"""
+    name = ' '.join(sql.split())
+    return name if len(name) <= SQL_NAME_LENGTH else name[:SQL_NAME_LENGTH - 3] + '...'
+
+
+def query_plan(conn, sql, parameters):
+    """EXPLAIN QUERY PLAN lines for a statement, indented as a tree"""
+    try:
+        # A plain cursor, so explaining is not itself recorded
+        rows = sqlite3.Cursor(conn).execute('EXPLAIN QUERY PLAN ' + sql, parameters).fetchall()
+    except sqlite3.Error as e:
+        return [f"(no plan: {e})"]
+    
+    depths = {0: -1}
+    lines = []
+    for node, parent, _, detail in rows:
+        depths[node] = depths.get(parent, -1) + 1
+        lines.append('  ' * depths[node] + detail)
+    return lines
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """A cursor recording each statement's time and row count.
+    
+    A query counts as running until its rows are exhausted, it is
+    re-executed or the cursor is closed or dropped; its time is that
+    spent inside SQLite over those calls, not the wall time between.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._query = None
+    
+    def _finish(self, error=None):
+        """Record the pending query"""
+        sql, parameters, start, seconds, rows = self._query
+        self._query = None
+        name = sql_name(sql)
+        if error is not None:
+            name = f"{name} [{type(error).__name__}]"
+        recorder.record(name, start, seconds, rows, category='sql')
+        
+        ms = seconds * 1000
+        if error is None and ms >= recorder.slow_query_ms:
+            recorder.record_slow_query(sql_name(sql), ms, rows,
+                                       query_plan(self.connection, sql, parameters))
+    
+    def _fetched(self, start, rows, done, error=None):
+        """Add a fetch call to the pending query"""
+        query = self._query
+        if query is None:
+            return
+        query[3] += time.perf_counter() - start
+        query[4] += rows
+        if done or error is not None:
+            self._finish(error)
+    
+    def execute(self, sql, parameters=()):
+        if self._query is not None:
+            self._finish()
+        
+        start = time.perf_counter()
+        self._query = [sql, parameters, start, 0.0, 0]
+        try:
+            super().execute(sql, parameters)
+        except Exception as e:
+            self._fetched(start, 0, True, e)
+            raise
+        # Other statements are done; queries are timed until exhausted
+        done = self.description is None
+        self._fetched(start, max(self.rowcount, 0) if done else 0, done)
+        return self
+    
+    def executemany(self, sql, seq_of_parameters):
+        if self._query is not None:
+            self._finish()
+        
+        start = time.perf_counter()
+        try:
+            super().executemany(sql, seq_of_parameters)
+        finally:
+            recorder.record(sql_name(sql), start, time.perf_counter() - start,
+                            max(self.rowcount, 0), category='sql')
+        return self
+    
+    def executescript(self, sql_script):
+        if self._query is not None:
+            self._finish()
+        
+        start = time.perf_counter()
+        try:
+            super().executescript(sql_script)
+        finally:
+            recorder.record(sql_name(sql_script), start, time.perf_counter() - start,
+                            category='sql')
+        return self
+    
+    def fetchone(self):
+        start = time.perf_counter()
+        try:
+            row = super().fetchone()
+        except Exception as e:
+            self._fetched(start, 0, True, e)
+            raise
+        self._fetched(start, row is not None, row is None)
+        return row
+    
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        start = time.perf_counter()
+        try:
+            rows = super().fetchmany(size)
+        except Exception as e:
+            self._fetched(start, 0, True, e)
+            raise
+        self._fetched(start, len(rows), len(rows) < size)
+        return rows
+    
+    def fetchall(self):
+        start = time.perf_counter()
+        try:
+            rows = super().fetchall()
+        except Exception as e:
+            self._fetched(start, 0, True, e)
+            raise
+        self._fetched(start, len(rows), True)
+        return rows
+    
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(start, 0, True)
+            raise
+        except Exception as e:
+            self._fetched(start, 0, True, e)
+            raise
+        self._fetched(start, 1, False)
+        return row
+    
+    def close(self):
+        if self._query is not None:
+            self._finish()
+        super().close()
+    
+    def __del__(self):
+        # Most queries read one row and drop the cursor
+        if getattr(self, '_query', None) is not None:
+            try:
+                self._finish()
+            except Exception:
+                pass
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """A connection whose cursors, including those behind its execute
+    shortcuts, are InstrumentedCursors"""
+    
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+    
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+    
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+
+def connection_factory():
+    """The connection class db.connect() should use"""
+    return sqlite3.Connection if recorder is None else InstrumentedConnection
@@ -0,0 +1,193 @@
+"""Monthly rollups and the dashboard figures read from them"""
+from datetime import datetime, timedelta
+
+from .archive import history
+from .db import _TAG_NAME_SQL, _tags_json_sql
+from .transactions import TRANSACTION_COLUMNS, to_cents
+
+
+def rebuild_rollups(conn):
+    """Recompute monthly_rollups from scratch, repairing any drift;
+    archived years are read back from their files"""
+    source = history(conn)
+    with conn:
+        conn.execute('DELETE FROM monthly_rollups')
+        conn.execute(f'''
+            INSERT INTO monthly_rollups (month, category, type, total_cents, count)
+            SELECT IIF(day IS NULL, '', substr(date, 1, 7)), category, type,
+                   SUM(amount_cents), COUNT(*)
+            FROM {source}
+            GROUP BY 1, 2, 3
+        ''')
+
+
+def month_range(day):
+    """Return the [start, end) ISO date range of the month containing day"""
+    start = day.replace(day=1)
+    end = (start + timedelta(days=32)).replace(day=1)
+    return start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')
+
+
+def fetch_balance_cents(cursor):
+    """Total balance in cents: all income less all expenses"""
+    cursor.execute('''
+        SELECT IFNULL(SUM(IIF(type = 'Income', total_cents,
+                              IIF(type = 'Expense', -total_cents, 0))), 0)
+        FROM monthly_rollups
+    ''')
+    return cursor.fetchone()[0]
+
+
+def fetch_dashboard_stats(cursor):
+    """Compute dashboard totals, in cents, and the latest transactions"""
+    balance = fetch_balance_cents(cursor)
+    
+    # Monthly income and expenses
+    now = datetime.now()
+    cursor.execute('''
+        SELECT type, SUM(total_cents) FROM monthly_rollups 
+        WHERE month = ? 
+        GROUP BY type
+    ''', (now.strftime('%Y-%m'),))
+    monthly = dict(cursor.fetchall())
+    monthly_income = monthly.get('Income') or 0
+    monthly_expenses = monthly.get('Expense') or 0
+    
+    # Date range the monthly figures cover, for patching them later
+    month_start, month_end = month_range(now)
+    
+    return {
+        'balance_cents': balance,
+        'monthly_income_cents': monthly_income,
+        'monthly_expenses_cents': monthly_expenses,
+        'month': (month_start, month_end),
+        'recent': fetch_recent_transactions(cursor),
+    }
+
+
+def fetch_recent_transactions(cursor, limit=10):
+    """Return the latest transactions, newest first"""
+    cursor.execute(f'SELECT {TRANSACTION_COLUMNS} FROM transactions '
+                   'ORDER BY date DESC, id DESC LIMIT ?', (limit,))
+    return cursor.fetchall()
+
+
+def patch_dashboard_stats(stats, delta, limit=10):
+    """Apply a transaction delta to fetch_dashboard_stats() results in place.
+    Returns False if the recent list lost rows it cannot refill itself."""
+    month_start, month_end = stats['month']
+    
+    for row, sign in ((delta.old, -1), (delta.new, 1)):
+        if row is None:
+            continue
+        date, cents, trans_type = row[1], sign * to_cents(row[4]), row[5]
+        
+        if trans_type == 'Income':
+            stats['balance_cents'] += cents
+            if month_start <= date < month_end:
+                stats['monthly_income_cents'] += cents
+        elif trans_type == 'Expense':
+            stats['balance_cents'] -= cents
+            if month_start <= date < month_end:
+                stats['monthly_expenses_cents'] += cents
+    
+    # Recent list is ordered by (date, id) descending. When it is full,
+    # rows older than its last entry may exist but are not loaded.
+    recent = stats['recent']
+    was_full = len(recent) >= limit
+    cutoff = (recent[-1][1], recent[-1][0]) if was_full else None
+    if delta.old is not None:
+        recent[:] = [trans for trans in recent if trans[0] != delta.old[0]]
+    if delta.new is not None:
+        key = (delta.new[1], delta.new[0])
+        if cutoff is None or key > cutoff:
+            index = next((i for i, trans in enumerate(recent) if key > (trans[1], trans[0])), len(recent))
+            recent.insert(index, delta.new)
+            del recent[limit:]
+    
+    return not was_full or len(recent) >= limit
+
+
+def fetch_expense_by_category(cursor):
+    """Return (category, total) expense rows"""
+    cursor.execute('''
+        SELECT category, SUM(total_cents) / 100.0 FROM monthly_rollups 
+        WHERE type = 'Expense' 
+        GROUP BY category
+    ''')
+    return cursor.fetchall()
+
+
+def fetch_totals_by_type(cursor):
+    """Return (type, total) rows"""
+    cursor.execute('''
+        SELECT type, SUM(total_cents) / 100.0 FROM monthly_rollups 
+        GROUP BY type
+    ''')
+    return cursor.fetchall()
+
+
+def fetch_monthly_trends(cursor):
+    """Return (month, type, total) rows ordered by month"""
+    cursor.execute('''
+        SELECT month, type, SUM(total_cents) / 100.0 
+        FROM monthly_rollups 
+        WHERE month != ''
+        GROUP BY month, type
+        ORDER BY month
+    ''')
+    return cursor.fetchall()
+
+
+def fetch_spending_by_tag(cursor):
+    """Return (tag, total) expense rows, largest first, archived years
+    included"""
+    source = history(cursor.connection)
+    if source != 'transactions':
+        # Archives have no tag index, so every tags field is split here
+        # as the index triggers split it
+        cursor.execute(f'''
+            SELECT name, SUM(amount_cents) / 100.0
+            FROM (SELECT DISTINCT t.id, t.amount_cents, {_TAG_NAME_SQL} AS name
+                  FROM {source} t, json_each({_tags_json_sql('t.tags')})
+                  WHERE t.type = 'Expense' AND t.tags != '')
+            WHERE name != ''
+            GROUP BY name
+            ORDER BY 2 DESC
+        ''')
+        return cursor.fetchall()
+    
+    # Walks the transaction_tags index tag by tag, looking each
+    # transaction up by id
+    cursor.execute('''
+        SELECT tags.name, SUM(t.amount_cents) / 100.0
+        FROM tags
+        JOIN transaction_tags tt ON tt.tag_id = tags.id
+        JOIN transactions t ON t.id = tt.transaction_id
+        WHERE t.type = 'Expense'
+        GROUP BY tags.id
+        ORDER BY 2 DESC
+    ''')
+    return cursor.fetchall()
+
+
+def fetch_balance_series(cursor):
+    """Return (date, balance) at the end of every day with transactions"""
+    # One pass over the per-day net changes
+    cursor.execute('''
+        SELECT date(day * 86400, 'unixepoch'), SUM(net_cents) OVER (ORDER BY day) / 100.0
+        FROM daily_balances
+        ORDER BY day
+    ''')
+    return cursor.fetchall()
+
+
+# Chart type -> rollup query producing the data it plots. Cheaper than
+# building TransactionColumns for a one-off report.
+CHART_QUERIES = {
+    'Expense by Category': fetch_expense_by_category,
+    'Income vs Expenses': fetch_totals_by_type,
+    'Monthly Trends': fetch_monthly_trends,
+    'Spending by Tag': fetch_spending_by_tag,
+    'Balance Over Time': fetch_balance_series,
+}
@@ -0,0 +1,277 @@
+"""Transaction writes, search and keyset pagination"""
+import copy
+import math
+import re
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+
+# Columns of a transaction row as the app, deltas and exports see it;
+# amount_cents and day are storage details kept in step with amount and date
+TRANSACTION_COLUMNS = 'id, date, category, description, amount, type, tags'
+
+_EPOCH_ORDINAL = datetime(1970, 1, 1).toordinal()
+
+
+def to_cents(amount):
+    """Whole cents in an amount, rounding halves away from zero like
+    SQLite's ROUND so both sides agree"""
+    try:
+        cents = float(amount) * 100
+    except (TypeError, ValueError):
+        cents = math.nan
+    if not math.isfinite(cents):
+        raise ValueError(f"invalid amount {amount!r}")
+    return int(cents + 0.5) if cents >= 0 else int(cents - 0.5)
+
+
+def to_day(date):
+    """Days since 1970-01-01 for a YYYY-MM-DD date"""
+    try:
+        parsed = datetime.strptime(date, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        parsed = None
+    if parsed is None or parsed.strftime('%Y-%m-%d') != date:
+        raise ValueError(f"invalid date {date!r}; use YYYY-MM-DD")
+    return parsed.toordinal() - _EPOCH_ORDINAL
+
+
+def from_day(day):
+    """YYYY-MM-DD date of a day number from to_day()"""
+    return datetime.fromordinal(day + _EPOCH_ORDINAL).strftime('%Y-%m-%d')
+
+
+def storage_row(values):
+    """Validate (date, category, description, amount, type, tags) for
+    writing, returning it with the amount rounded to cents and
+    (amount_cents, day) appended"""
+    date, category, description, amount, trans_type, tags = values
+    cents = to_cents(amount)
+    return (date, category, description, cents / 100, trans_type, tags, cents, to_day(date))
+
+
+def fts_query(search_term):
+    """Turn free-form search text into an FTS5 prefix query, or None"""
+    # Every word must match (implicit AND); quoting each token keeps FTS5
+    # operators typed by the user from being interpreted
+    tokens = re.findall(r'\w+', search_term)
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def fetch_tag_names(cursor):
+    """Return the names of all tags in use, archived years included,
+    alphabetically"""
+    from .archive import history_schemas
+    
+    cursor.execute(' UNION '.join(f'SELECT name FROM {schema}.tags'
+                                  for schema in history_schemas(cursor.connection)) +
+                   ' ORDER BY name COLLATE NOCASE')
+    return [name for (name,) in cursor.fetchall()]
+
+
+class TransactionPager:
+    """Keyset pagination over the transactions table and its archives.
+    
+    Pages are one UNION ALL over the live table and every archive, each
+    part filtered the same way through its own search, tag and sort
+    indexes; the ORDER BY ... LIMIT on the whole merges their index
+    orders, so a page reads about a page of rows from each file.
+    """
+    
+    # Treeview column -> SQL sort expression. NULLs are folded to '' so that
+    # row-value comparisons on (sort key, id) never drop rows; each
+    # expression has a (sort key, id) index (migration 10, and in every
+    # archive), so pages in any order are range scans. Relevance is only available while
+    # searching and orders by FTS5 bm25 rank.
+    SORT_COLUMNS = {
+        'Relevance': 'fts.rank',
+        'ID': 'id',
+        'Date': 'date',
+        'Category': 'category',
+        'Description': "IFNULL(description, '')",
+        'Amount': 'amount',
+        'Type': 'type',
+        'Tags': "IFNULL(tags, '')",
+    }
+    
+    def __init__(self, page_size=200):
+        self.page_size = page_size
+        self.sort_column = 'Date'
+        self.descending = True
+        self.search_term = ''
+        self.category = None
+        self.tag = None
+    
+    def set_filters(self, search_term='', category=None, tag=None):
+        """Set the search term, category and tag filters applied to every page"""
+        match = fts_query(search_term)
+        
+        # A new search starts out ranked by relevance; clearing it falls
+        # back to the default date order
+        if match and not self.search_term:
+            self.set_sort('Relevance', False)
+        elif not match and self.sort_column == 'Relevance':
+            self.set_sort('Date', True)
+        
+        self.search_term = match or ''
+        self.category = category if category and category != 'All' else None
+        self.tag = tag if tag and tag != 'All' else None
+    
+    def set_sort(self, column, descending):
+        """Set the sort column (a Treeview heading) and direction"""
+        if column not in self.SORT_COLUMNS:
+            raise ValueError(f"Cannot sort by {column}")
+        self.sort_column = column
+        self.descending = descending
+    
+    def _where(self, schema):
+        """Build the filter clauses and their parameters"""
+        clauses = []
+        params = []
+        
+        if self.category:
+            clauses.append('category = ?')
+            params.append(self.category)
+        
+        if self.tag:
+            # One range of the transaction_tags primary key
+            clauses.append(f'id IN (SELECT transaction_id FROM {schema}.transaction_tags '
+                           f'WHERE tag_id = (SELECT id FROM {schema}.tags WHERE name = ?))')
+            params.append(self.tag)
+        
+        return clauses, params
+    
+    def _select(self, schema, clauses, params):
+        """Build the filtered SELECT of one schema's transactions returning
+        each row plus its sort key"""
+        sort_expr = self.SORT_COLUMNS[self.sort_column]
+        where, where_params = self._where(schema)
+        clauses = where + clauses
+        params = where_params + params
+        
+        query = f'SELECT {TRANSACTION_COLUMNS}, {sort_expr} AS sort_key FROM {schema}.transactions'
+        if self.search_term:
+            # Resolve matches through the full-text index, then join back
+            query += f'''
+                JOIN (SELECT rowid AS id, rank FROM {schema}.transactions_fts
+                      WHERE transactions_fts MATCH ?) AS fts USING (id)
+            '''
+            params.insert(0, self.search_term)
+        
+        if clauses:
+            query += ' WHERE ' + ' AND '.join(clauses)
+        return query, params
+    
+    def page_query(self, key=None, forward=True):
+        """Describe the page after (forward) or before a sort key, for
+        fetch_page to run; later filter or sort changes do not affect it"""
+        return copy.copy(self), key, forward
+    
+    def _page_sql(self, schemas, key, forward):
+        """Build a page query over the given schemas' transactions"""
+        from .archive import not_live
+        
+        sort_expr = self.SORT_COLUMNS[self.sort_column]
+        
+        # Walking forward through a descending list means smaller keys
+        descending = self.descending == forward
+        parts = []
+        params = []
+        for schema in schemas:
+            clauses = [not_live(schema)] if schema != 'main' else []
+            bounds = []
+            if key is not None:
+                # The plain bound lets SQLite seek expression indexes, which it
+                # does not do for the row-value comparison alone
+                operator = '<' if descending else '>'
+                clauses.append(f"{sort_expr} {operator}= ? AND ({sort_expr}, id) {operator} (?, ?)")
+                bounds = [key[0], *key]
+            query, part_params = self._select(schema, clauses, bounds)
+            parts.append(query)
+            params.extend(part_params)
+        
+        direction = 'DESC' if descending else 'ASC'
+        query = (' UNION ALL '.join(parts) +
+                 f' ORDER BY sort_key {direction}, id {direction} LIMIT ?')
+        params.append(self.page_size)
+        return query, params
+    
+    def row_query(self, trans_id):
+        """Build the query returning one live transaction and its sort key,
+        or nothing when it does not pass the current filters"""
+        return self._select('main', ['transactions.id = ?'], [trans_id])
+    
+    def precedes(self, key, other):
+        """Check whether a row with sort key comes before other in the list"""
+        return key > other if self.descending else key < other
+    
+    @staticmethod
+    def fetch_page(cursor, page_query):
+        """Run a page query, returning (transaction, sort key) rows in
+        order. Archives are attached to the cursor's connection, which must
+        not be inside a transaction."""
+        from .archive import history_schemas
+        
+        pager, key, forward = page_query
+        cursor.execute(*pager._page_sql(history_schemas(cursor.connection), key, forward))
+        rows = cursor.fetchall()
+        if not forward:
+            rows.reverse()
+        
+        return [TransactionPager.split_row(row) for row in rows]
+    
+    @staticmethod
+    def split_row(row):
+        """Split a query row into (transaction, sort key)"""
+        return row[:-1], (row[-1], row[0])
+
+
+class TransactionDelta(NamedTuple):
+    """A single change to the transactions table"""
+    kind: str               # 'insert', 'update' or 'delete'
+    old: Optional[tuple]    # full row before the change, None on insert
+    new: Optional[tuple]    # full row after the change, None on delete
+
+
+def add_transaction_row(conn, values):
+    """Insert (date, category, description, amount, type, tags) and commit"""
+    row = storage_row(values)
+    cursor = conn.execute('''
+        INSERT INTO transactions (date, category, description, amount, type, tags,
+                                  amount_cents, day)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', row)
+    conn.commit()
+    return TransactionDelta('insert', None, (cursor.lastrowid,) + row[:6])
+
+
+def update_transaction_row(conn, trans_id, values):
+    """Replace a transaction's fields and commit"""
+    row = storage_row(values)
+    old = conn.execute(f'SELECT {TRANSACTION_COLUMNS} FROM transactions WHERE id = ?',
+                       (trans_id,)).fetchone()
+    if old is None:
+        raise ValueError(f"Transaction {trans_id} no longer exists")
+    
+    conn.execute('''
+        UPDATE transactions 
+        SET date=?, category=?, description=?, amount=?, type=?, tags=?,
+            amount_cents=?, day=?
+        WHERE id=?
+    ''', row + (trans_id,))
+    conn.commit()
+    return TransactionDelta('update', old, (trans_id,) + row[:6])
+
+
+def delete_transaction_row(conn, trans_id):
+    """Delete a transaction and commit"""
+    old = conn.execute(f'SELECT {TRANSACTION_COLUMNS} FROM transactions WHERE id = ?',
+                       (trans_id,)).fetchone()
+    if old is None:
+        raise ValueError(f"Transaction {trans_id} no longer exists")
+    
+    conn.execute('DELETE FROM transactions WHERE id = ?', (trans_id,))
+    conn.commit()
+    return TransactionDelta('delete', old, None)